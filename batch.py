@@ -0,0 +1,199 @@
+import io
+import os
+import sys
+import time
+import argparse
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from statement_evaluator import StatementEvaluator
+from constants import (
+    single_len_symbols,
+    boolean_symbols,
+    double_len_symbols,
+    op_equals_symbols,
+    bool_equals_symbols,
+    assign_symbols,
+    keywords,
+    disj_symbols,
+    conj_symbols,
+    power_symbols,
+    neg_symbols,
+    incr_or_decr_symbols,
+    relational_symbols,
+)
+
+
+def run_script(path, engine='closure', optimize=False, exact=False, parse_first=False):
+    """
+    Runs one script through its own StatementEvaluator and returns
+    (path, stdout, error). "parse error" and "divide by zero" are program
+    output like anything else; error is only set when the script could not
+    be read or evaluation crashed, and holds the traceback.
+    """
+    stdout = io.StringIO()
+    error = ''
+    try:
+        with open(path) as f:
+            statements = [line.strip() for line in f]
+        evaluator = StatementEvaluator(
+            statements, engine=engine, optimize=optimize, exact=exact,
+            out=stdout, flush='end'
+        )
+        if parse_first:
+            evaluator.execute()
+        else:
+            evaluator.execute_streaming()
+    except Exception:
+        error = traceback.format_exc()
+    return path, stdout.getvalue(), error
+
+
+def find_scripts(sources, manifest=None):
+    """
+    Every *.bc file under the given directories, in sorted order, plus the
+    given files and the paths listed in the manifest, in the order given.
+    Manifest paths are relative to the manifest.
+    """
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            found = []
+            for root, dirs, files in os.walk(source):
+                found.extend(os.path.join(root, name) for name in files if name.endswith('.bc'))
+            paths.extend(sorted(found))
+        else:
+            paths.append(source)
+
+    if manifest:
+        base = os.path.dirname(manifest)
+        with open(manifest) as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    paths.append(os.path.join(base, line))
+    return paths
+
+
+def output_names(paths):
+    """
+    A name for each path's output that no other path shares: the path
+    relative to the deepest directory holding them all.
+
+    >>> output_names(['a/x.bc', 'c/x.bc', 'c/d/y.bc'])
+    ['a/x.bc', 'c/x.bc', 'c/d/y.bc']
+    >>> output_names(['/scripts/a.bc', '/scripts/b.bc'])
+    ['a.bc', 'b.bc']
+    """
+    if not paths:
+        return []
+    absolute = [os.path.abspath(path) for path in paths]
+    root = os.path.commonpath([os.path.dirname(path) for path in absolute])
+    return [os.path.relpath(path, root) for path in absolute]
+
+
+def run_batch(paths, workers=None, chunksize=16, **options):
+    """
+    Results for every path, in the order of paths. workers=1 runs the
+    scripts in this process instead of starting a pool.
+    """
+    run = partial(run_script, **options)
+    if workers == 1:
+        return list(map(run, paths))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run, paths, chunksize=chunksize))
+
+
+def main(argv=None):
+    """
+    >>> import tempfile, contextlib
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     for name, text in [('a/x.bc', 'print 1'), ('c/x.bc', 'print 2')]:
+    ...         os.makedirs(os.path.join(directory, os.path.dirname(name)), exist_ok=True)
+    ...         with open(os.path.join(directory, name), 'w') as f:
+    ...             _ = f.write(text)
+    ...     output = os.path.join(directory, 'out', 'new')
+    ...     with contextlib.redirect_stderr(io.StringIO()):
+    ...         main([directory, '--workers', '1', '--output-dir', output])
+    ...     for name in ['a/x.bc.out', 'c/x.bc.out']:
+    ...         with open(os.path.join(output, name)) as f:
+    ...             print(name, f.read(), end='')
+    0
+    a/x.bc.out 1.0
+    c/x.bc.out 2.0
+    """
+    argparser = argparse.ArgumentParser(
+        description='Run many independent scripts in a pool of worker processes'
+    )
+    argparser.add_argument(
+        'sources', nargs='*',
+        help='scripts, or directories to search for *.bc scripts'
+    )
+    argparser.add_argument(
+        '--manifest', help='file listing one script path per line'
+    )
+    argparser.add_argument(
+        '--workers', type=int, default=os.cpu_count(),
+        help='worker processes; 1 runs everything in this process'
+    )
+    argparser.add_argument(
+        '--chunksize', type=int, default=16,
+        help='scripts handed to a worker at a time'
+    )
+    argparser.add_argument(
+        '--output-dir',
+        help='write each script\'s output to NAME.out, and any error to '
+             'NAME.err, here instead of printing them; NAME is the script\'s '
+             'path relative to the directory holding every script'
+    )
+    argparser.add_argument(
+        '--engine', choices=StatementEvaluator.engines, default='closure'
+    )
+    argparser.add_argument('-O', '--optimize', action='store_true')
+    argparser.add_argument('--exact', action='store_true')
+    argparser.add_argument('--parse-first', action='store_true')
+    args = argparser.parse_args(argv)
+
+    paths = find_scripts(args.sources, args.manifest)
+    if args.output_dir:
+        # Before any work, so a bad directory fails fast
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    results = run_batch(
+        paths, workers=args.workers, chunksize=args.chunksize,
+        engine=args.engine, optimize=args.optimize, exact=args.exact,
+        parse_first=args.parse_first
+    )
+    elapsed = time.perf_counter() - start
+
+    failed = 0
+    names = output_names(paths)
+    for (path, stdout, error), name in zip(results, names):
+        failed += bool(error)
+        if args.output_dir:
+            name = os.path.join(args.output_dir, name)
+            os.makedirs(os.path.dirname(name), exist_ok=True)
+            with open(name + '.out', 'w') as f:
+                f.write(stdout)
+            if error:
+                with open(name + '.err', 'w') as f:
+                    f.write(error)
+        else:
+            print(f'==> {path} <==')
+            sys.stdout.write(stdout)
+            if error:
+                sys.stderr.write(f'==> {path} <==\n{error}')
+
+    rate = len(results) / elapsed if elapsed else 0.0
+    print(
+        f'{len(results)} scripts in {elapsed:.2f}s ({rate:.1f} scripts/sec), '
+        f'{failed} failed',
+        file=sys.stderr
+    )
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,6 @@
+"""
+Benchmarks for the calculator. Run them from the repository root, e.g.
+
+    python -m benchmarks.ast_memory --statements 100000
+    python -m benchmarks.suite --workload flat --output results.json
+"""
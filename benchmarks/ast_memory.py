@@ -0,0 +1,58 @@
+import argparse
+import gc
+import time
+import tracemalloc
+from array import array
+from parsor import Parsor
+from compact_ast import CompactAst, CompactParsor
+from benchmarks.workloads import assignments
+
+
+def expressions(n: int):
+    for statement in assignments(n):
+        yield statement.split('=', 1)[1]
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    kept = build()
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return kept, current, elapsed
+
+
+def build_objects(n: int):
+    return [Parsor(expression).execute() for expression in expressions(n)]
+
+
+def build_compact(n: int):
+    tree = CompactAst()
+    roots = array('i', (
+        CompactParsor(expression, tree).execute()
+        for expression in expressions(n)
+    ))
+    return tree, roots
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(
+        description='Compare memory held by ast objects and CompactAst'
+    )
+    argparser.add_argument('--statements', type=int, default=1_000_000)
+    args = argparser.parse_args(argv)
+
+    results = {}
+    for name, build in (('objects', build_objects), ('compact', build_compact)):
+        kept, size, elapsed = measure(lambda: build(args.statements))
+        results[name] = size
+        print(f'{name:>8}: {size / 2**20:8.1f} MiB  parsed in {elapsed:.1f}s')
+        del kept
+
+    print(f'   ratio: {results["objects"] / results["compact"]:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
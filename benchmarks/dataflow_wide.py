@@ -0,0 +1,54 @@
+import argparse
+import contextlib
+import io
+import time
+from statement_evaluator import StatementEvaluator
+from dataflow import DataflowScheduler
+
+
+def wide_script(width: int, exponent: int = 200_000):
+    """
+    A wide block of independent, expensive exact powers followed by prints
+    that read them back.
+
+    >>> wide_script(2, 10)
+    ['p0 = (3 + 0) ^ 10 % 1000003', 'p1 = (3 + 1) ^ 10 % 1000003', 'print p0, p1']
+    """
+    script = [f'p{i} = (3 + {i}) ^ {exponent} % 1000003' for i in range(width)]
+    script.append('print ' + ', '.join(f'p{i}' for i in range(width)))
+    return script
+
+
+def run(script, workers):
+    evaluator = StatementEvaluator(script, exact=True)
+    if workers:
+        evaluator.scheduler = DataflowScheduler(workers=workers)
+
+    output = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        evaluator.execute()
+    return time.perf_counter() - start, output.getvalue()
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(
+        description='Compare sequential and dataflow evaluation of a wide script'
+    )
+    argparser.add_argument('--width', type=int, default=16)
+    argparser.add_argument('--exponent', type=int, default=200_000)
+    argparser.add_argument('--workers', type=int, default=4)
+    args = argparser.parse_args(argv)
+
+    script = wide_script(args.width, args.exponent)
+    sequential, expected = run(script, None)
+    parallel, output = run(script, args.workers)
+    assert output == expected, 'dataflow output differs from sequential'
+    print(
+        f'sequential {sequential:.2f}s  dataflow ({args.workers} workers) '
+        f'{parallel:.2f}s  speedup {sequential / parallel:.2f}x'
+    )
+
+
+if __name__ == '__main__':
+    main()
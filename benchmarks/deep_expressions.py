@@ -0,0 +1,45 @@
+import sys
+import time
+import argparse
+from statement_evaluator import StatementEvaluator
+from benchmarks.workloads import nested_parens, plus_chain, prefix_chain
+
+
+shapes = {
+    'nested': nested_parens,
+    'plus_chain': plus_chain,
+    'prefix_chain': prefix_chain,
+}
+
+
+def run(script, engine: str, optimize: bool) -> float:
+    evaluator = StatementEvaluator(script, engine=engine, optimize=optimize)
+    start = time.perf_counter()
+    evaluator.execute()
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(
+        description='Parse and evaluate single expressions far deeper than '
+                    'the recursion limit, to check the time per term stays flat'
+    )
+    argparser.add_argument('--shape', action='append', choices=list(shapes))
+    argparser.add_argument(
+        '--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000, 1_000_000]
+    )
+    argparser.add_argument(
+        '--engine', choices=StatementEvaluator.engines, default='closure'
+    )
+    argparser.add_argument('-O', dest='optimize', action='store_true')
+    args = argparser.parse_args(argv)
+
+    print(f'recursion limit {sys.getrecursionlimit()}')
+    for name in args.shape or list(shapes):
+        for size in args.sizes:
+            seconds = run(shapes[name](size, 1), args.engine, args.optimize)
+            print(f'{name:>12} {size:>9}: {seconds:8.3f}s  {seconds / size * 1e6:6.2f}us/term')
+
+
+if __name__ == '__main__':
+    main()
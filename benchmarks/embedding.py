@@ -0,0 +1,58 @@
+import argparse
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from statement_evaluator import StatementEvaluator
+from program import Program
+from benchmarks.workloads import assignments
+
+
+def script(statements: int):
+    lines = list(assignments(statements))
+    lines.append('print x0, x1, x2')
+    return lines
+
+
+def per_call(lines, runs: int):
+    """
+    Seconds to evaluate the script runs times the old way, parsing and
+    compiling it again for every call.
+    """
+    start = time.perf_counter()
+    for _ in range(runs):
+        StatementEvaluator(lines, out=io.StringIO()).execute()
+    return time.perf_counter() - start
+
+
+def compiled(lines, runs: int, threads: int):
+    """
+    Seconds to run one Program runs times from a pool of threads.
+    """
+    program = Program(lines)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(lambda i: program.run({'x49': float(i)}), range(runs)))
+    elapsed = time.perf_counter() - start
+    assert all(result.error is None for result in results)
+    return elapsed
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(
+        description='Runs per second of a compiled Program against evaluating from source'
+    )
+    argparser.add_argument('--statements', type=int, default=200)
+    argparser.add_argument('--runs', type=int, default=2000)
+    argparser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = argparser.parse_args(argv)
+
+    lines = script(args.statements)
+    elapsed = per_call(lines, args.runs)
+    print(f'evaluate from source     {args.runs / elapsed:10.0f} runs/s')
+    for threads in args.threads:
+        elapsed = compiled(lines, args.runs, threads)
+        print(f'Program, {threads:2d} thread(s)    {args.runs / elapsed:10.0f} runs/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+import argparse
+import io
+import time
+from statement_evaluator import StatementEvaluator
+from functions import FunctionTable
+from benchmarks.workloads import recursive_fibonacci
+
+
+def run(n: int, cache_size: int):
+    """
+    Seconds to run fib(n), and the output. A cache_size of 0 turns the
+    cache of pure function results off.
+    """
+    original = FunctionTable.cache_size
+    FunctionTable.cache_size = cache_size
+    try:
+        out = io.StringIO()
+        evaluator = StatementEvaluator(recursive_fibonacci(n), out=out)
+        start = time.perf_counter()
+        evaluator.execute()
+        return time.perf_counter() - start, out.getvalue().strip()
+    finally:
+        FunctionTable.cache_size = original
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(
+        description='Time recursive Fibonacci with and without caching pure function results'
+    )
+    argparser.add_argument('--sizes', type=int, nargs='+', default=[15, 20, 25])
+    args = argparser.parse_args(argv)
+
+    for n in args.sizes:
+        plain, expected = run(n, 0)
+        cached, value = run(n, FunctionTable.cache_size)
+        assert value == expected
+        print(
+            f'fib({n}) = {value}  uncached {plain:.4f}s  cached {cached:.4f}s  '
+            f'speedup {plain / cached:.1f}x'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+import argparse
+import contextlib
+import io
+import random
+import time
+from statement_evaluator import StatementEvaluator
+
+
+def integer_script(n: int, seed: int = 0, variables: int = 20):
+    """
+    Yields n statements that only ever see integral values, mostly hash
+    style mod chains, the kind of script exact mode is for.
+
+    >>> list(integer_script(2))
+    ['x12 = (x13 * 31 + x1) % 1009', 'x8 = x16 % 53 * 2 ^ 5 % 1009']
+    """
+    rng = random.Random(seed)
+    for i in range(n):
+        target, a, b = (rng.randrange(variables) for _ in range(3))
+        if i % 2:
+            yield f'x{target} = x{a} % {rng.randint(2, 99)} * 2 ^ {rng.randint(1, 9)} % 1009'
+        else:
+            yield f'x{target} = (x{a} * 31 + x{b}) % 1009'
+
+
+def run(statements, exact: bool, rounds: int):
+    """
+    Best time for one pass over already compiled statements, so the
+    comparison is arithmetic and not parsing or compiling.
+    """
+    evaluator = StatementEvaluator(statements, exact=exact)
+    evaluator.parse()
+    environment = evaluator.environment
+    environment.resolve(evaluator.parsed_statements)
+    compiled = [
+        (environment.slot(statement['variable']), evaluator.compiler.compile(statement['value']))
+        for statement in evaluator.parsed_statements
+    ]
+
+    values = environment.values
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for slot, value in compiled:
+            values[slot] = value(values)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(
+        description='Compare float and exact integer evaluation'
+    )
+    argparser.add_argument('--statements', type=int, default=100_000)
+    argparser.add_argument('--rounds', type=int, default=5)
+    args = argparser.parse_args(argv)
+
+    statements = list(integer_script(args.statements))
+    times = {exact: run(statements, exact, args.rounds) for exact in (False, True)}
+    print(
+        f'float {times[False]:.3f}s  exact {times[True]:.3f}s  '
+        f'speedup {times[False] / times[True]:.2f}x'
+    )
+
+    for exact in (False, True):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            StatementEvaluator(['print 3 ^ 41 % 1000'], exact=exact).execute()
+        print(f'{"exact" if exact else "float":>8}: 3 ^ 41 % 1000 = {output.getvalue().strip()}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+import argparse
+import io
+import time
+from statement_evaluator import StatementEvaluator
+from benchmarks.workloads import repeated_subexpressions
+
+
+def run(script, memoize: bool):
+    """
+    Seconds to parse the script and seconds to evaluate it, timed apart
+    since memoizing only pays off in evaluation.
+    """
+    evaluator = StatementEvaluator(script, memoize=memoize, out=io.StringIO())
+    start = time.perf_counter()
+    evaluator.parse()
+    parsed = time.perf_counter()
+    evaluator.environment.resolve(evaluator.parsed_statements)
+    evaluator.evaluate()
+    return parsed - start, time.perf_counter() - parsed, evaluator
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(
+        description='Compare evaluation with and without memoized subexpressions'
+    )
+    argparser.add_argument('--statements', type=int, default=100_000)
+    argparser.add_argument('--shared', type=int, default=20)
+    args = argparser.parse_args(argv)
+
+    script = repeated_subexpressions(args.statements, shared=args.shared)
+    plain_parse, plain, _ = run(script, False)
+    memoized_parse, memoized, evaluator = run(script, True)
+    memo = evaluator.memo
+    print(f'parse     plain {plain_parse:.3f}s  interned {memoized_parse:.3f}s')
+    print(
+        f'evaluate  plain {plain:.3f}s  memoized {memoized:.3f}s  '
+        f'speedup {plain / memoized:.2f}x'
+    )
+    print(
+        f'{memo.hits} hits, {memo.misses} misses, '
+        f'{len(evaluator.table.nodes)} distinct nodes'
+    )
+
+
+if __name__ == '__main__':
+    main()
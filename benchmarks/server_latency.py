@@ -0,0 +1,75 @@
+import time
+import asyncio
+import argparse
+import statistics
+from server import EvaluationServer, read_answer
+from benchmarks.workloads import assignments
+
+
+async def client(host, port, statements, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    for statement in statements:
+        start = time.perf_counter()
+        writer.write(statement.encode() + b'\n')
+        await writer.drain()
+        await read_answer(reader)
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+    await writer.wait_closed()
+
+
+def percentile(values, p: float) -> float:
+    """
+    >>> percentile([3, 1, 2, 4], 0.5), percentile(list(range(100)), 0.99)
+    (3, 99)
+    """
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def measure(clients: int, statements: int, concurrency: int):
+    server = EvaluationServer(concurrency=concurrency)
+    listener = await server.start('127.0.0.1', 0)
+    host, port = listener.sockets[0].getsockname()[:2]
+
+    script = []
+    for i, statement in enumerate(assignments(statements)):
+        script.append(statement)
+        if i % 10 == 9:
+            script.append('print ' + statement.split(' ', 1)[0])
+
+    latencies = []
+    start = time.perf_counter()
+    async with listener:
+        await asyncio.gather(*[
+            client(host, port, script, latencies) for _ in range(clients)
+        ])
+    elapsed = time.perf_counter() - start
+    return latencies, elapsed
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(
+        description='Latency of the evaluation server under concurrent clients'
+    )
+    argparser.add_argument('--clients', type=int, default=100)
+    argparser.add_argument('--statements', type=int, default=200)
+    argparser.add_argument('--concurrency', type=int, default=4)
+    args = argparser.parse_args(argv)
+
+    latencies, elapsed = asyncio.run(
+        measure(args.clients, args.statements, args.concurrency)
+    )
+    print(
+        f'{len(latencies)} requests from {args.clients} clients in {elapsed:.2f}s '
+        f'({len(latencies) / elapsed:.0f}/s)'
+    )
+    print(
+        f'latency p50 {percentile(latencies, 0.5) * 1000:.2f}ms  '
+        f'p99 {percentile(latencies, 0.99) * 1000:.2f}ms  '
+        f'mean {statistics.mean(latencies) * 1000:.2f}ms'
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+import argparse
+import time
+from session import Session
+from benchmarks.workloads import assignments
+
+
+def model(n: int, inputs: int = 20, print_every: int = 100):
+    """
+    A spreadsheet-like model: input assignments, then n formulas over
+    them with a print every `print_every` lines.
+
+    >>> model(2, inputs=2, print_every=2)
+    ['in0 = 1', 'in1 = 2', 'x24 = x48 * 6 + (x26 - 34) / 66', 'x31 = x25 * 62 + (x19 - 46) / 75', 'print x31']
+    """
+    script = [f'in{i} = {i + 1}' for i in range(inputs)]
+    for i, statement in enumerate(assignments(n)):
+        # Each formula also depends on one input
+        if i % 1000 == 999:
+            statement += f' + in{i // 1000 % inputs}'
+        script.append(statement)
+        if i % print_every == print_every - 1:
+            script.append('print ' + statement.split(' ', 1)[0])
+    return script
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(
+        description='Time a one-line edit against a full run of a large model'
+    )
+    argparser.add_argument('--lines', type=int, default=50_000)
+    args = argparser.parse_args(argv)
+
+    script = model(args.lines)
+
+    start = time.perf_counter()
+    session = Session(script)
+    print(f'parse and run {len(script)} lines: {time.perf_counter() - start:.3f}s')
+
+    for line, text in ((3, 'in2 = 30'), (len(script) // 2, 'x7 = 5'), (len(script), 'print 1')):
+        start = time.perf_counter()
+        changes = session.edit(line, text)
+        elapsed = time.perf_counter() - start
+        print(
+            f'edit line {line}: {elapsed * 1000:.1f}ms, {session.reevaluated} '
+            f'statements evaluated, {len(changes)} prints changed'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+import argparse
+import contextlib
+import io
+import json
+import math
+import platform
+import subprocess
+import time
+from lexer import Lexer
+from parsor import Parsor
+from statement_parser import StatementParser
+from interpreter import Interpreter
+from statement_evaluator import StatementEvaluator
+from benchmarks.workloads import (
+    flat_script,
+    nested_parens,
+    plus_chain,
+    compound_assignments,
+    comment_heavy,
+    long_comment,
+    inline_comments,
+    print_heavy,
+    expressions,
+)
+
+
+# Workload name -> (script generator, default sizes). Sizes double so the
+# slope of a scaling curve reads directly as its growth exponent.
+workloads = {
+    'flat': (flat_script, [1000, 2000, 4000, 8000]),
+    'compound': (compound_assignments, [1000, 2000, 4000, 8000]),
+    'nested': (nested_parens, [10, 20, 40, 80]),
+    'plus_chain': (plus_chain, [25, 50, 100, 200]),
+    'comments': (comment_heavy, [1000, 2000, 4000, 8000]),
+    'long_comment': (long_comment, [5000, 10000, 20000, 40000]),
+    'inline_comments': (inline_comments, [250, 500, 1000, 2000]),
+    'print': (print_heavy, [1000, 2000, 4000, 8000]),
+}
+
+
+def lexer_stage(script, engine):
+    texts = list(expressions(script))
+
+    def run():
+        for text in texts:
+            Lexer(text).execute()
+    return run
+
+
+def parsor_stage(script, engine):
+    texts = list(expressions(script))
+
+    def run():
+        for text in texts:
+            Parsor(text).execute()
+    return run
+
+
+def statement_parser_stage(script, engine):
+    lines = [line.strip() for line in script if line.strip()]
+
+    def run():
+        block_comment = False
+        for line in lines:
+            parsed = StatementParser(line, block_comment).parse()
+            if parsed is not None and 'block_comment' in parsed:
+                block_comment = parsed['block_comment']
+    return run
+
+
+def interpreter_stage(script, engine):
+    trees = [Parsor(text).execute() for text in expressions(script)]
+
+    def run():
+        variables = {}
+        for a in trees:
+            Interpreter(a, variables).execute()
+    return run
+
+
+def evaluator_stage(script, engine):
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            StatementEvaluator(script, engine=engine).execute()
+    return run
+
+
+stages = {
+    'lexer': lexer_stage,
+    'parsor': parsor_stage,
+    'statement_parser': statement_parser_stage,
+    'interpreter': interpreter_stage,
+    'evaluator': evaluator_stage,
+}
+
+
+def best_of(run, repeat: int) -> float:
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def slope(curve) -> float:
+    """
+    Growth exponent between the smallest and largest size: 1.0 is linear,
+    2.0 quadratic.
+
+    >>> slope({100: 0.5, 200: 1.0, 400: 2.0})
+    1.0
+    """
+    sizes = sorted(curve)
+    first, last = sizes[0], sizes[-1]
+    if first == last or curve[first] <= 0:
+        return math.nan
+    return math.log(curve[last] / curve[first]) / math.log(last / first)
+
+
+def commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(name, curves):
+    sizes = sorted(next(iter(curves.values())))
+    print(f'{name}')
+    print(f'  {"stage":<18}' + ''.join(f'{size:>10}' for size in sizes) + '     slope')
+    for stage, curve in curves.items():
+        times = ''.join(f'{curve[size] * 1000:>8.1f}ms' for size in sizes)
+        print(f'  {stage:<18}{times}{slope(curve):>10.2f}')
+
+
+def main(argv=None):
+    """
+    Every workload through every stage, here at a tiny size:
+
+    >>> import os, tempfile
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     output = os.path.join(directory, 'results.json')
+    ...     with contextlib.redirect_stdout(io.StringIO()):
+    ...         main(['--scale', '0.002', '--repeat', '1', '--output', output])
+    ...     with open(output) as f:
+    ...         results = json.load(f)['results']
+    >>> list(results) == list(workloads), all(list(curves) == list(stages) for curves in results.values())
+    (True, True)
+    """
+    argparser = argparse.ArgumentParser(
+        description='Time each stage of the calculator against input size'
+    )
+    argparser.add_argument(
+        '--workload', action='append', choices=list(workloads),
+        help='workload to run, may be repeated (default: all)'
+    )
+    argparser.add_argument(
+        '--stage', action='append', choices=list(stages),
+        help='stage to time, may be repeated (default: all)'
+    )
+    argparser.add_argument('--repeat', type=int, default=3)
+    argparser.add_argument(
+        '--scale', type=float, default=1.0,
+        help='multiply every workload size by this factor'
+    )
+    argparser.add_argument(
+        '--engine', choices=StatementEvaluator.engines, default='closure'
+    )
+    argparser.add_argument(
+        '--output', default='benchmark-results.json',
+        help='where to write the results as JSON'
+    )
+    args = argparser.parse_args(argv)
+
+    results = {}
+    for name in args.workload or list(workloads):
+        generate, sizes = workloads[name]
+        curves = results[name] = {}
+        for stage in args.stage or list(stages):
+            curve = curves[stage] = {}
+            for size in sizes:
+                size = max(1, int(size * args.scale))
+                run = stages[stage](generate(size), args.engine)
+                curve[size] = best_of(run, args.repeat)
+        report(name, curves)
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'commit': commit(),
+            'python': platform.python_version(),
+            'engine': args.engine,
+            'repeat': args.repeat,
+            'results': {
+                name: {
+                    stage: {str(size): seconds for size, seconds in curve.items()}
+                    for stage, curve in curves.items()
+                }
+                for name, curves in results.items()
+            },
+        }, f, indent=2)
+    print(f'results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
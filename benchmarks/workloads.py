@@ -0,0 +1,201 @@
+import re
+import random
+from parsor import assignment_symbols
+
+
+# The target and operator of any assignment, so x *= 2 leaves 2
+assignment = re.compile(
+    r'^\w+\s*(?:'
+    + '|'.join(map(re.escape, sorted(assignment_symbols, key=len, reverse=True)))
+    + r')(?!=)\s*'
+)
+
+
+def assignments(n: int, seed: int = 0, variables: int = 50):
+    """
+    Yields n assignment statements over a fixed pool of variables, the shape
+    of our machine-generated scripts.
+
+    >>> list(assignments(2))
+    ['x24 = x48 * 6 + (x26 - 34) / 66', 'x31 = x25 * 62 + (x19 - 46) / 75']
+    """
+    rng = random.Random(seed)
+    for _ in range(n):
+        target, a, b = (rng.randrange(variables) for _ in range(3))
+        c, d, e = (rng.randint(1, 99) for _ in range(3))
+        yield f'x{target} = x{a} * {c} + (x{b} - {d}) / {e}'
+
+
+def flat_script(n: int, seed: int = 0):
+    """
+    A long script of independent assignments.
+    """
+    return list(assignments(n, seed))
+
+
+def compound_assignments(n: int, seed: int = 0, variables: int = 50):
+    """
+    Compound assignments of every operator over a fixed pool of variables.
+
+    >>> compound_assignments(2)
+    ['x24 *= 54 + x48 % 6', 'x32 /= 52 + x31 % 39']
+    """
+    rng = random.Random(seed)
+    operators = ['+=', '-=', '*=', '/=', '%=', '&&=', '||=']
+    script = []
+    for _ in range(n):
+        target, a = (rng.randrange(variables) for _ in range(2))
+        c, d = (rng.randint(1, 99) for _ in range(2))
+        script.append(f'x{target} {rng.choice(operators)} {c} + x{a} % {d}')
+    return script
+
+
+def nested_parens(depth: int, lines: int = 100):
+    """
+    Assignments whose right hand side nests parentheses `depth` deep.
+
+    >>> nested_parens(3, 1)
+    ['x = (((x0 + 1) * 2 + 2) * 2 + 3) * 2']
+    """
+    expression = 'x0'
+    for i in range(1, depth + 1):
+        expression = f'({expression} + {i}) * 2'
+    return [f'x = {expression}'] * lines
+
+
+def plus_chain(length: int, lines: int = 100):
+    """
+    Assignments that add up `length` variables.
+
+    >>> plus_chain(3, 1)
+    ['x = x0 + x1 + x2']
+    """
+    expression = ' + '.join(f'x{i % 50}' for i in range(length))
+    return [f'x = {expression}'] * lines
+
+
+def prefix_chain(length: int, lines: int = 100):
+    """
+    Assignments that negate a variable `length` times.
+
+    >>> prefix_chain(3, 1)
+    ['x = - - - x0']
+    """
+    return ['x = ' + '- ' * length + 'x0'] * lines
+
+
+def comment_heavy(n: int, seed: int = 0):
+    """
+    Assignments separated by /* */ comments that span several lines.
+
+    >>> comment_heavy(1)
+    ['/* step 0', ' * computes x24', ' */', 'x24 = x48 * 6 + (x26 - 34) / 66']
+    """
+    script = []
+    for i, statement in enumerate(assignments(n, seed)):
+        target = statement.split(' ', 1)[0]
+        script.extend([f'/* step {i}', f' * computes {target}', ' */', statement])
+    return script
+
+
+def long_comment(lines: int):
+    """
+    One assignment split by a block comment `lines` lines long.
+
+    >>> long_comment(2)
+    ['x = 1 /* spans', ' * line 0 # not a comment end', ' * line 1 # not a comment end', ' */ + 2', 'print x']
+    """
+    body = [f' * line {i} # not a comment end' for i in range(lines)]
+    return ['x = 1 /* spans'] + body + [' */ + 2', 'print x']
+
+
+def inline_comments(n: int, lines: int = 10):
+    """
+    Assignments with n short block comments on the same line.
+
+    >>> inline_comments(2, 1)
+    ['x = 1 /* c */ /* c */ + 2']
+    """
+    return ['x = 1' + ' /* c */' * n + ' + 2'] * lines
+
+
+def print_heavy(n: int, seed: int = 0, variables: int = 50):
+    """
+    Print statements with several expressions and strings each.
+
+    >>> print_heavy(1)
+    ['print x24 * 6, x48 + 0.5, x26 / 3']
+    """
+    rng = random.Random(seed)
+    script = []
+    for _ in range(n):
+        a, b, c = (rng.randrange(variables) for _ in range(3))
+        script.append(f'print x{a} * 6, x{b} + 0.5, x{c} / 3')
+    return script
+
+
+def repeated_subexpressions(n: int, seed: int = 0, variables: int = 50, shared: int = 20):
+    """
+    Assignments that each add a variable to one of a few expensive
+    subexpressions of parameters p0-p4, which are themselves reassigned
+    now and then, as in generated scripts.
+
+    >>> repeated_subexpressions(2, shared=2)
+    ['x25 = (p2 * p4 + p3) ^ 3 % 97 + x19', 'x22 = (p3 * p3 + p0) ^ 3 % 97 + x37']
+    """
+    rng = random.Random(seed)
+    pool = []
+    for _ in range(shared):
+        a, b, c = (rng.randrange(5) for _ in range(3))
+        pool.append(f'(p{a} * p{b} + p{c}) ^ 3 % 97')
+
+    script = []
+    for i in range(n):
+        if i % 100 == 99:
+            script.append(f'p{rng.randrange(5)} = {rng.randint(1, 9)}')
+        else:
+            target, a = (rng.randrange(variables) for _ in range(2))
+            script.append(f'x{target} = {rng.choice(pool)} + x{a}')
+    return script
+
+
+def recursive_fibonacci(n: int):
+    """
+    The textbook doubly recursive Fibonacci, called once.
+
+    >>> recursive_fibonacci(10)[-1]
+    'print fib(10)'
+    """
+    return [
+        'define fib(n) {',
+        '  if (n < 2) return n',
+        '  return fib(n - 1) + fib(n - 2)',
+        '}',
+        f'print fib({n})',
+    ]
+
+
+def expressions(script):
+    """
+    The expressions a script hands to Parsor, for timing the lexer and
+    parser on their own: right hand sides, print items and bare
+    expressions, with comment lines left out.
+
+    >>> list(expressions(comment_heavy(1) + ['print x, y + 1']))
+    ['x48 * 6 + (x26 - 34) / 66', 'x', 'y + 1']
+    >>> list(expressions(compound_assignments(2) + ['x ^= 2', 'y ||= z', 'x == y']))
+    ['54 + x48 % 6', '52 + x31 % 39', '2', 'z', 'x == y']
+    """
+    in_block_comment = False
+    for line in script:
+        if in_block_comment or '/*' in line:
+            in_block_comment = '*/' not in line
+            continue
+        line = line.split('#', 1)[0].strip()
+        if line.startswith('print '):
+            yield from (item.strip() for item in line[6:].split(','))
+        elif assignment.match(line):
+            yield assignment.sub('', line, count=1)
+        elif line:
+            yield line
+
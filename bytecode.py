@@ -0,0 +1,555 @@
+from parsor import ast, Parsor
+from statement_parser import StatementParser
+from environment import Environment
+from numeric import exact_divide, exact_mod, exact_power
+from constants import (
+    single_len_symbols,
+    boolean_symbols,
+    double_len_symbols,
+    op_equals_symbols,
+    bool_equals_symbols,
+    assign_symbols,
+    keywords,
+    disj_symbols,
+    conj_symbols,
+    power_symbols,
+    neg_symbols,
+    incr_or_decr_symbols,
+    relational_symbols,
+)
+
+
+# Instruction set. Every instruction is an opcode followed by `arity[opcode]`
+# integer arguments, all stored inline in one flat list.
+opnames = [
+    'PUSH_CONST',
+    'LOAD_VAR',
+    'STORE_VAR',
+    'POP_TOP',
+    'BINARY_ADD',
+    'BINARY_SUB',
+    'BINARY_MUL',
+    'BINARY_DIV',
+    'BINARY_MOD',
+    'BINARY_POW',
+    'UNARY_NEG',
+    'UNARY_NOT',
+    'TO_BOOL',
+    'COMPARE_EQ',
+    'COMPARE_NE',
+    'COMPARE_GT',
+    'COMPARE_LT',
+    'COMPARE_GE',
+    'COMPARE_LE',
+    'JUMP',
+    'JUMP_IF_FALSE',
+    'JUMP_IF_TRUE',
+    'INCR_PRE',
+    'DECR_PRE',
+    'INCR_POST',
+    'DECR_POST',
+    'PRINT_ITEM',
+    'PRINT_END',
+    'CALL',
+    'CHECK_DIVISOR',
+    # Superinstructions
+    'BINARY_ADD_CONST',
+    'BINARY_SUB_CONST',
+    'BINARY_MUL_CONST',
+    'INPLACE_ADD_CONST',
+    'INPLACE_SUB_CONST',
+    'INPLACE_MUL_CONST',
+    'INCR_VAR',
+    'DECR_VAR',
+]
+
+(
+    PUSH_CONST,
+    LOAD_VAR,
+    STORE_VAR,
+    POP_TOP,
+    BINARY_ADD,
+    BINARY_SUB,
+    BINARY_MUL,
+    BINARY_DIV,
+    BINARY_MOD,
+    BINARY_POW,
+    UNARY_NEG,
+    UNARY_NOT,
+    TO_BOOL,
+    COMPARE_EQ,
+    COMPARE_NE,
+    COMPARE_GT,
+    COMPARE_LT,
+    COMPARE_GE,
+    COMPARE_LE,
+    JUMP,
+    JUMP_IF_FALSE,
+    JUMP_IF_TRUE,
+    INCR_PRE,
+    DECR_PRE,
+    INCR_POST,
+    DECR_POST,
+    PRINT_ITEM,
+    PRINT_END,
+    CALL,
+    CHECK_DIVISOR,
+    BINARY_ADD_CONST,
+    BINARY_SUB_CONST,
+    BINARY_MUL_CONST,
+    INPLACE_ADD_CONST,
+    INPLACE_SUB_CONST,
+    INPLACE_MUL_CONST,
+    INCR_VAR,
+    DECR_VAR,
+) = range(len(opnames))
+
+arity = [0] * len(opnames)
+for op in (PUSH_CONST, LOAD_VAR, STORE_VAR, JUMP, JUMP_IF_FALSE, JUMP_IF_TRUE,
+           INCR_PRE, DECR_PRE, INCR_POST, DECR_POST, BINARY_ADD_CONST,
+           BINARY_SUB_CONST, BINARY_MUL_CONST, INCR_VAR, DECR_VAR):
+    arity[op] = 1
+for op in (INPLACE_ADD_CONST, INPLACE_SUB_CONST, INPLACE_MUL_CONST, CALL):
+    arity[op] = 2
+
+const_args = {PUSH_CONST, BINARY_ADD_CONST, BINARY_SUB_CONST, BINARY_MUL_CONST}
+jump_args = {JUMP, JUMP_IF_FALSE, JUMP_IF_TRUE}
+
+
+class Code(object):
+    def __init__(self, environment: Environment):
+        self.code = []
+        self.consts = []
+        self.environment = environment
+        # Variable arguments are environment slots
+        self.names = environment.names
+        self.const_index = {}
+
+    def emit(self, op, *args):
+        self.code.append(op)
+        self.code.extend(args)
+        return len(self.code) - len(args) - 1
+
+    def const(self, value):
+        # 0 == 0.0 == -0.0 as dict keys, but they print differently
+        key = (type(value), repr(value))
+        if key not in self.const_index:
+            self.const_index[key] = len(self.consts)
+            self.consts.append(value)
+        return self.const_index[key]
+
+    def name(self, name):
+        return self.environment.slot(name)
+
+    def label(self):
+        return len(self.code)
+
+    def patch(self, at, target):
+        self.code[at + 1] = target
+
+
+class Assembler(object):
+    """
+    Compiles parsed statements into flat bytecode for the VM.
+
+    >>> assembler = Assembler(Environment())
+    >>> print(disassemble(assembler.compile(StatementParser('x += 2', False).parse())))
+       0 INPLACE_ADD_CONST    0 (x), 0 (2.0)
+    >>> print(disassemble(assembler.compile(StatementParser('print x && y', False).parse())))
+       0 LOAD_VAR             0 (x)
+       2 JUMP_IF_FALSE        9
+       4 LOAD_VAR             1 (y)
+       6 TO_BOOL
+       7 JUMP                 11
+       9 PUSH_CONST           0 (0)
+      11 PRINT_ITEM
+      12 PRINT_END
+    """
+
+    binary_ops = {
+        '+': BINARY_ADD,
+        '-': BINARY_SUB,
+        '*': BINARY_MUL,
+        '^': BINARY_POW,
+        '==': COMPARE_EQ,
+        '!=': COMPARE_NE,
+        '>': COMPARE_GT,
+        '<': COMPARE_LT,
+        '>=': COMPARE_GE,
+        '<=': COMPARE_LE,
+    }
+    # Divisor is evaluated and checked before the dividend, as in the Interpreter
+    divide_ops = {
+        '/': BINARY_DIV,
+        '%': BINARY_MOD,
+    }
+    const_ops = {
+        '+': BINARY_ADD_CONST,
+        '-': BINARY_SUB_CONST,
+        '*': BINARY_MUL_CONST,
+    }
+    inplace_ops = {
+        '+': INPLACE_ADD_CONST,
+        '-': INPLACE_SUB_CONST,
+        '*': INPLACE_MUL_CONST,
+    }
+
+    def __init__(self, environment: Environment):
+        self.environment = environment
+
+    def compile(self, statement):
+        code = Code(self.environment)
+
+        if statement['type'] == 'print':
+            for item in statement['value']:
+                if isinstance(item, str):
+                    code.emit(PUSH_CONST, code.const(item))
+                else:
+                    self.emit(code, item)
+                code.emit(PRINT_ITEM)
+            code.emit(PRINT_END)
+        elif statement['type'] == 'assign':
+            self.emit_assign(code, statement['variable'], statement['value'])
+        else:
+            self.emit_eval(code, statement['value'])
+
+        return code
+
+    def emit_assign(self, code, variable, a):
+        # x = x op c
+        if (
+            a.typ in self.inplace_ops
+            and len(a.children) == 2
+            and a.children[0].typ == 'var'
+            and a.children[0].children[0] == variable
+            and not a.children[0].post_op
+            and a.children[1].typ == 'fl'
+        ):
+            code.emit(
+                self.inplace_ops[a.typ],
+                code.name(variable),
+                code.const(a.children[1].children[0])
+            )
+            return
+
+        self.emit(code, a)
+        code.emit(STORE_VAR, code.name(variable))
+
+    def emit_eval(self, code, a):
+        # x++, x--, ++x and --x on their own only need the side effect
+        if a.typ == 'var' and a.post_op:
+            op = INCR_VAR if a.post_op.typ == '++' else DECR_VAR
+            code.emit(op, code.name(a.children[0]))
+            return
+        if a.typ in incr_or_decr_symbols and a.children[0].typ == 'var':
+            op = INCR_VAR if a.typ == '++' else DECR_VAR
+            code.emit(op, code.name(a.children[0].children[0]))
+            return
+
+        self.emit(code, a)
+        code.emit(POP_TOP)
+
+    def emit(self, code, a: ast):
+        """
+        Emits code that leaves the value of a on the stack. Nodes wait on
+        an explicit stack together with the instructions that follow their
+        operands, so deep trees never recurse.
+
+        >>> code = Code(Environment())
+        >>> Assembler(code.environment).emit(code, Parsor('- ' * 10000 + 'x').execute())
+        >>> len(code.code)
+        10002
+        """
+        pending = [a]
+        while pending:
+            a = pending.pop()
+
+            if type(a) is tuple:
+                if a[0] == 'jump':
+                    _, jump, marks = a
+                    marks.append(code.emit(jump, -1))
+                elif a[0] == 'short_circuit':
+                    _, short_circuit, marks = a
+                    to_end = code.emit(JUMP, -1)
+                    code.patch(marks[0], code.label())
+                    code.emit(PUSH_CONST, code.const(short_circuit))
+                    code.patch(to_end, code.label())
+                else:
+                    code.emit(*a)
+                continue
+
+            if a.typ in ['fl', 'bool']:
+                code.emit(PUSH_CONST, code.const(a.children[0]))
+            elif a.typ == 'var':
+                name = code.name(a.children[0])
+                if not a.post_op:
+                    code.emit(LOAD_VAR, name)
+                elif a.post_op.typ == '++':
+                    code.emit(INCR_POST, name)
+                else:
+                    code.emit(DECR_POST, name)
+            elif a.typ == '-' and len(a.children) == 1:
+                pending.append((UNARY_NEG,))
+                pending.append(a.children[0])
+            elif a.typ == '!':
+                pending.append((UNARY_NOT,))
+                pending.append(a.children[0])
+            elif a.typ in self.const_ops and a.children[1].typ == 'fl':
+                pending.append((
+                    self.const_ops[a.typ], code.const(a.children[1].children[0])
+                ))
+                pending.append(a.children[0])
+            elif a.typ in self.binary_ops:
+                pending.append((self.binary_ops[a.typ],))
+                pending.append(a.children[1])
+                pending.append(a.children[0])
+            elif a.typ in self.divide_ops:
+                # The divisor is checked before the dividend runs, since
+                # the dividend can print or change variables
+                pending.append((self.divide_ops[a.typ],))
+                pending.append(a.children[0])
+                pending.append((CHECK_DIVISOR,))
+                pending.append(a.children[1])
+            elif a.typ in ['&&', '||']:
+                self.emit_and_or(pending, a)
+            elif a.typ == 'call':
+                # The name, then how many arguments to take off the stack
+                pending.append((CALL, code.const(a.children[0]), len(a.children) - 1))
+                pending.extend(reversed(a.children[1:]))
+            elif a.typ in incr_or_decr_symbols:
+                if len(a.children) != 1 or a.children[0].typ != 'var':
+                    raise SyntaxError(f'expected variable, got {a.children[0].typ}')
+                op = INCR_PRE if a.typ == '++' else DECR_PRE
+                code.emit(op, code.name(a.children[0].children[0]))
+            else:
+                raise SyntaxError(f'unknown operation {a.typ}')
+
+    def emit_and_or(self, pending, a):
+        if a.typ == '&&':
+            jump, short_circuit = JUMP_IF_FALSE, 0
+        else:
+            jump, short_circuit = JUMP_IF_TRUE, 1
+
+        # Where the jump to the short circuit value was emitted
+        marks = []
+        pending.append(('short_circuit', short_circuit, marks))
+        pending.append((TO_BOOL,))
+        pending.append(a.children[1])
+        pending.append(('jump', jump, marks))
+        pending.append(a.children[0])
+
+
+class VM(object):
+    """
+    >>> environment = Environment()
+    >>> assembler = Assembler(environment)
+    >>> vm = VM()
+    >>> for line in ['x = 2', 'x++', 'y = x ^ 2 % 5', 'print x, y, -x < y']:
+    ...     vm.run(assembler.compile(StatementParser(line, False).parse()), environment.values, [])
+    3.0 4.0 1
+
+    An exact VM runs code compiled from an exact parse:
+
+    >>> environment = Environment(zero=0)
+    >>> code = Assembler(environment).compile(StatementParser('print 2 ^ 70 / 2, 7 / 2', False, exact=True).parse())
+    >>> VM(exact=True).run(code, environment.values, [])
+    590295810358705651712 3.5
+
+    As in the closures, a divisor of zero stops a / or % before its
+    dividend runs, so the x++ below never happens:
+
+    >>> environment = Environment()
+    >>> environment.update({'x': 1.0})
+    >>> code = Assembler(environment).compile(StatementParser('x++ / y', False).parse())
+    >>> print(disassemble(code))
+       0 LOAD_VAR             1 (y)
+       2 CHECK_DIVISOR
+       3 INCR_POST            0 (x)
+       5 BINARY_DIV
+       6 POP_TOP
+    >>> VM().run(code, environment.values, [])
+    Traceback (most recent call last):
+    ...
+    ZeroDivisionError: divide by zero
+    >>> environment.as_dict()
+    {'x': 1.0, 'y': 0.0}
+    """
+
+    def __init__(self, exact=False, functions=None):
+        self.exact = exact
+        # A functions.FunctionTable, whose bodies run as closures
+        self.functions = functions
+
+    def run(self, code, values, printlist, out=None):
+        exact = self.exact
+        ops = code.code
+        consts = code.consts
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        pc = 0
+        end = len(ops)
+
+        while pc < end:
+            op = ops[pc]
+
+            if op == LOAD_VAR:
+                push(values[ops[pc + 1]])
+                pc += 2
+            elif op == PUSH_CONST:
+                push(consts[ops[pc + 1]])
+                pc += 2
+            elif op == BINARY_ADD:
+                right = pop()
+                stack[-1] = stack[-1] + right
+                pc += 1
+            elif op == BINARY_ADD_CONST:
+                stack[-1] = stack[-1] + consts[ops[pc + 1]]
+                pc += 2
+            elif op == BINARY_MUL:
+                right = pop()
+                stack[-1] = stack[-1] * right
+                pc += 1
+            elif op == BINARY_MUL_CONST:
+                stack[-1] = stack[-1] * consts[ops[pc + 1]]
+                pc += 2
+            elif op == BINARY_SUB:
+                right = pop()
+                stack[-1] = stack[-1] - right
+                pc += 1
+            elif op == BINARY_SUB_CONST:
+                stack[-1] = stack[-1] - consts[ops[pc + 1]]
+                pc += 2
+            elif op == STORE_VAR:
+                values[ops[pc + 1]] = pop()
+                pc += 2
+            elif op == PRINT_ITEM:
+                printlist.append(pop())
+                pc += 1
+            elif op == PRINT_END:
+                if out is None:
+                    print(*printlist, sep=' ')
+                else:
+                    out.line(printlist)
+                printlist.clear()
+                pc += 1
+            elif op == INPLACE_ADD_CONST or op == INPLACE_SUB_CONST or op == INPLACE_MUL_CONST:
+                slot = ops[pc + 1]
+                if op == INPLACE_ADD_CONST:
+                    values[slot] = values[slot] + consts[ops[pc + 2]]
+                elif op == INPLACE_SUB_CONST:
+                    values[slot] = values[slot] - consts[ops[pc + 2]]
+                else:
+                    values[slot] = values[slot] * consts[ops[pc + 2]]
+                pc += 3
+            elif op == BINARY_DIV or op == BINARY_MOD:
+                # CHECK_DIVISOR has already ruled out zero
+                left = pop()
+                right = pop()
+                if exact:
+                    push(exact_divide(left, right) if op == BINARY_DIV else exact_mod(left, right))
+                elif op == BINARY_DIV:
+                    push(left / right)
+                else:
+                    push(left - (right * int(left/right)))
+                pc += 1
+            elif op == BINARY_POW:
+                right = pop()
+                if exact:
+                    stack[-1] = exact_power(stack[-1], right)
+                else:
+                    stack[-1] = stack[-1] ** right
+                pc += 1
+            elif op == UNARY_NEG:
+                stack[-1] = -stack[-1]
+                pc += 1
+            elif op == UNARY_NOT:
+                stack[-1] = 0 if stack[-1] else 1
+                pc += 1
+            elif op == TO_BOOL:
+                stack[-1] = 1 if stack[-1] else 0
+                pc += 1
+            elif COMPARE_EQ <= op <= COMPARE_LE:
+                right = pop()
+                left = stack[-1]
+                if op == COMPARE_EQ:
+                    result = left == right
+                elif op == COMPARE_NE:
+                    result = left != right
+                elif op == COMPARE_GT:
+                    result = left > right
+                elif op == COMPARE_LT:
+                    result = left < right
+                elif op == COMPARE_GE:
+                    result = left >= right
+                else:
+                    result = left <= right
+                stack[-1] = 1 if result else 0
+                pc += 1
+            elif op == JUMP_IF_FALSE:
+                pc = pc + 2 if pop() else ops[pc + 1]
+            elif op == JUMP_IF_TRUE:
+                pc = ops[pc + 1] if pop() else pc + 2
+            elif op == JUMP:
+                pc = ops[pc + 1]
+            elif INCR_PRE <= op <= DECR_POST or op == INCR_VAR or op == DECR_VAR:
+                slot = ops[pc + 1]
+                value = values[slot]
+                if op == INCR_PRE or op == INCR_POST or op == INCR_VAR:
+                    values[slot] = value + 1
+                else:
+                    values[slot] = value - 1
+                if op == INCR_PRE or op == DECR_PRE:
+                    push(values[slot])
+                elif op == INCR_POST or op == DECR_POST:
+                    push(value)
+                pc += 2
+            elif op == POP_TOP:
+                pop()
+                pc += 1
+            elif op == CHECK_DIVISOR:
+                if stack[-1] in [0, None, 0.0]:
+                    raise ZeroDivisionError('divide by zero')
+                pc += 1
+            elif op == CALL:
+                name = consts[ops[pc + 1]]
+                if self.functions is None:
+                    raise RuntimeError(f'function {name} not defined')
+                start = len(stack) - ops[pc + 2]
+                args = stack[start:]
+                del stack[start:]
+                push(self.functions.call(name, args, values))
+                pc += 3
+            else:
+                raise SyntaxError(f'unknown opcode {op}')
+
+        # Code for a bare expression leaves its value behind
+        if stack:
+            return stack[-1]
+
+
+def disassemble(code):
+    lines = []
+    pc = 0
+    while pc < len(code.code):
+        op = code.code[pc]
+        args = code.code[pc + 1:pc + 1 + arity[op]]
+
+        if op in const_args:
+            described = [f'{args[0]} ({code.consts[args[0]]!r})']
+        elif op in jump_args:
+            described = [str(args[0])]
+        elif op == CALL:
+            described = [f'{args[0]} ({code.consts[args[0]]})', str(args[1])]
+        elif arity[op] == 2:
+            described = [
+                f'{args[0]} ({code.names[args[0]]})',
+                f'{args[1]} ({code.consts[args[1]]!r})',
+            ]
+        else:
+            described = [f'{arg} ({code.names[arg]})' for arg in args]
+
+        lines.append(f'{pc:4} {opnames[op]:<20} {", ".join(described)}'.rstrip())
+        pc += 1 + arity[op]
+
+    return '\n'.join(lines)
@@ -0,0 +1,181 @@
+import os
+import pickle
+import hashlib
+import tempfile
+from constants import (
+    single_len_symbols,
+    boolean_symbols,
+    double_len_symbols,
+    op_equals_symbols,
+    bool_equals_symbols,
+    assign_symbols,
+    keywords,
+    disj_symbols,
+    conj_symbols,
+    power_symbols,
+    neg_symbols,
+    incr_or_decr_symbols,
+    relational_symbols,
+)
+
+
+# Bump whenever the parsed statement format (ast, statement dicts) changes,
+# so entries written by an older version are never loaded.
+FORMAT = 3
+
+# The modules whose code decides what a script parses to. Their source is
+# part of every key, so an entry is never reused after an edit to the
+# parser or the optimizer that left FORMAT alone.
+parse_modules = [
+    'constants',
+    'lexer',
+    'numeric',
+    'variable_name_checker',
+    'parsor',
+    'comments',
+    'mapped_file',
+    'statement_parser',
+    'statement_evaluator',
+    'compiler',
+    'functions',
+    'liveness',
+    'optimizer',
+    'interning',
+]
+
+
+def source_digest() -> str:
+    digest = hashlib.sha256()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name in parse_modules:
+        with open(os.path.join(directory, name + '.py'), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def default_directory():
+    return os.environ.get('BC_CACHE_DIR') or os.path.join(
+        os.path.expanduser('~'), '.cache', 'bc'
+    )
+
+
+class ParseCache(object):
+    """
+    On-disk cache of parsed scripts, keyed by a hash of the script text,
+    the parse options, FORMAT and the source of the parsing modules.
+    Entries are pickles written atomically, so a reader never sees a
+    partial file, and any entry that fails to load is deleted and treated
+    as a miss. Once the directory holds more than max_bytes, the least
+    recently used entries are evicted.
+
+    The cache directory must only be writable by its owner, since
+    entries are unpickled.
+
+    >>> directory = tempfile.mkdtemp()
+    >>> cache = ParseCache(directory)
+    >>> key = cache.key(['x = 1', 'print x'], exact=False, optimize=False)
+    >>> cache.load(key) is None
+    True
+    >>> cache.store(key, ['parsed'])
+    >>> cache.load(key), cache.hits, cache.misses
+    (['parsed'], 1, 1)
+    >>> with open(cache.path(key), 'wb') as f:
+    ...     _ = f.write(b'truncated')
+    >>> cache.load(key), os.path.exists(cache.path(key))
+    (None, False)
+    >>> cache.code = 'edited'
+    >>> cache.key(['x = 1', 'print x'], exact=False, optimize=False) == key
+    False
+    """
+
+    def __init__(self, directory=None, max_bytes: int = 64 * 2**20):
+        self.directory = directory or default_directory()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.code = source_digest()
+
+    def key(self, statements, **options) -> str:
+        digest = hashlib.sha256()
+        header = ','.join(f'{name}={value!r}' for name, value in sorted(options.items()))
+        digest.update(f'{FORMAT}:{self.code}:{header}\n'.encode())
+        for statement in statements:
+            # Lines of a mapped file are hashed as they are, without a copy
+            digest.update(statement.encode() if isinstance(statement, str) else statement)
+            digest.update(b'\n')
+        return digest.hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.pickle')
+
+    def load(self, key: str):
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                version, value = pickle.load(f)
+            if version != FORMAT:
+                raise ValueError(f'cache format {version}')
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception:
+            # Corrupt, truncated or from another version
+            self.misses += 1
+            self.remove(path)
+            return None
+
+        self.hits += 1
+        try:
+            # Mark as recently used for eviction
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def store(self, key: str, value):
+        try:
+            data = pickle.dumps((FORMAT, value), protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, RecursionError):
+            return
+
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            fd, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(temporary, self.path(key))
+            except BaseException:
+                self.remove(temporary)
+                raise
+        except OSError:
+            # A cache that cannot be written is just a slower run
+            return
+
+        self.evict()
+
+    def evict(self):
+        entries = []
+        total = 0
+        try:
+            with os.scandir(self.directory) as scan:
+                for entry in scan:
+                    if entry.name.endswith('.pickle'):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+                        total += stat.st_size
+        except OSError:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self.remove(path)
+            total -= size
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
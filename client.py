@@ -0,0 +1,53 @@
+import sys
+import asyncio
+import argparse
+from server import read_answer
+
+
+async def run(reader, writer, lines, out):
+    """
+    Sends lines one at a time and writes each answer to out, stopping when
+    the server ends the program.
+    """
+    try:
+        for line in lines:
+            writer.write(line.rstrip('\n').encode() + b'\n')
+            await writer.drain()
+            answer = await read_answer(reader)
+            if answer is None:
+                return
+            out.write(answer)
+            out.flush()
+    except ConnectionError:
+        # The server ended the program while we were still sending
+        pass
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+async def connect(args):
+    if args.unix:
+        reader, writer = await asyncio.open_unix_connection(args.unix)
+    else:
+        reader, writer = await asyncio.open_connection(args.host, args.port)
+    await run(reader, writer, sys.stdin, sys.stdout)
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(
+        description='Run a program from stdin on an evaluation server, '
+                    'printing what main.py would print'
+    )
+    argparser.add_argument('--host', default='127.0.0.1')
+    argparser.add_argument('--port', type=int, default=7070)
+    argparser.add_argument('--unix', metavar='PATH', help='connect to a Unix socket instead')
+    args = argparser.parse_args(argv)
+    asyncio.run(connect(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+import re
+from constants import (
+    single_len_symbols,
+    boolean_symbols,
+    double_len_symbols,
+    op_equals_symbols,
+    bool_equals_symbols,
+    assign_symbols,
+    keywords,
+    disj_symbols,
+    conj_symbols,
+    power_symbols,
+    neg_symbols,
+    incr_or_decr_symbols,
+    relational_symbols,
+)
+
+
+# Outside a comment the leftmost of these wins, inside one only its end
+markers = re.compile(r'(?P<line>#)|(?P<open>/\*)|(?P<close>\*/)')
+block_comment_end = re.compile(r'\*/')
+# The same for bytes-like lines, such as slices of a mapped file
+byte_markers = re.compile(markers.pattern.encode())
+byte_block_comment_end = re.compile(block_comment_end.pattern.encode())
+
+
+class CommentStripper(object):
+    """
+    Removes # and /* */ comments from a stream of lines in a single pass.
+    Text on either side of a block comment is joined, even across lines,
+    and a statement is handed back once the line it ends on is read.
+
+    Each character is looked at a bounded number of times: the scanner
+    searches forward from where it stopped, and text waiting for a block
+    comment to close is kept as a list of pieces rather than re-joined.
+
+    As with the text on a single line, the characters that meet where a
+    comment was removed can themselves open a comment ('8/' then '*...'),
+    and the '*' of '/*' can also begin its '*/'.
+
+    Lines may also be bytes-like, such as memoryview slices of a mapped
+    file. A statement that was not split by a comment then comes back as a
+    slice of its line, and only text joined around a comment is copied.
+
+    >>> stripper = CommentStripper()
+    >>> stripper.strip('x = 1 /* spans'), stripper.in_block_comment
+    (None, True)
+    >>> stripper.strip('several # lines'), stripper.pending
+    (None, 'x = 1 ')
+    >>> stripper.strip('*/ + 2 /* a */ * 3 # done')
+    'x = 1  + 2  * 3 '
+    >>> stripper.strip('print 1 */ 2')
+    Traceback (most recent call last):
+    ...
+    SyntaxError: Unexpected */
+    >>> list(CommentStripper().feed(['a/**/b', '/*/ c', '/* d', '*/e', '', 'f /* g */']))
+    ['ab', ' c', 'e', '', 'f ']
+    >>> stripper = CommentStripper()
+    >>> stripper.strip(b'x = 1 /* a'), stripper.strip(b'b */ + 2 # c')
+    (None, b'x = 1  + 2 ')
+    >>> bytes(stripper.strip(memoryview(b'print x # one')))
+    b'print x '
+    """
+
+    def __init__(self, in_block_comment: bool = False):
+        self.in_block_comment = in_block_comment
+        # Text kept from the current statement, while a block comment is open
+        self.pieces = []
+
+    @property
+    def pending(self):
+        if self.pieces and not isinstance(self.pieces[0], str):
+            return b''.join(self.pieces)
+        return ''.join(self.pieces)
+
+    def feed(self, lines):
+        """
+        Yields the statements in lines with comments removed.
+        """
+        strip = self.strip
+        for line in lines:
+            statement = strip(line)
+            if statement is not None:
+                yield statement
+
+    def strip(self, line: str):
+        """
+        Returns the line's statement without comments, or None while the
+        statement continues into a block comment on a later line.
+        """
+        if isinstance(line, str):
+            marks, ends, join = markers, block_comment_end, ''.join
+        else:
+            marks, ends, join = byte_markers, byte_block_comment_end, b''.join
+
+        pieces = self.pieces
+        position = 0
+        # Where the next block comment end may start
+        end_from = 0
+        while True:
+            if self.in_block_comment:
+                match = ends.search(line, end_from)
+                if match is None:
+                    return None
+                self.in_block_comment = False
+                position = match.end()
+
+                # The kept text now touches what follows the comment
+                if pieces and position < len(line):
+                    joint = marks.fullmatch(
+                        join([pieces[-1][-1:], line[position:position + 1]])
+                    )
+                    joined = joint.lastgroup if joint else None
+                    if joined == 'close':
+                        self.pieces = []
+                        raise SyntaxError('Unexpected */')
+                    if joined == 'open':
+                        pieces[-1] = pieces[-1][:-1]
+                        if not pieces[-1]:
+                            pieces.pop()
+                        self.in_block_comment = True
+                        end_from = position
+                        continue
+
+            match = marks.search(line, position)
+            end = len(line) if match is None else match.start()
+            if end > position:
+                pieces.append(line[position:end])
+            if match is None or match.lastgroup == 'line':
+                break
+
+            if match.lastgroup == 'close':
+                self.pieces = []
+                raise SyntaxError('Unexpected */')
+
+            self.in_block_comment = True
+            end_from = end + 1
+
+        self.pieces = []
+        if len(pieces) == 1:
+            # Nothing was removed from the middle, so nothing to copy
+            return pieces[0]
+        return join(pieces)
@@ -0,0 +1,307 @@
+from array import array
+from parsor import ast, Parsor
+from constants import (
+    single_len_symbols,
+    boolean_symbols,
+    double_len_symbols,
+    op_equals_symbols,
+    bool_equals_symbols,
+    assign_symbols,
+    keywords,
+    disj_symbols,
+    conj_symbols,
+    power_symbols,
+    neg_symbols,
+    incr_or_decr_symbols,
+    relational_symbols,
+)
+
+
+# Node opcodes. Leaves keep their pool index in `left`; unary nodes have
+# right == -1.
+opnames = [
+    'fl',
+    'var',
+    'var++',
+    'var--',
+    '++',
+    '--',
+    '+',
+    '-',
+    '*',
+    '/',
+    '%',
+    '^',
+    '==',
+    '!=',
+    '>',
+    '<',
+    '>=',
+    '<=',
+    '!',
+    '&&',
+    '||',
+]
+opcodes = {name: code for code, name in enumerate(opnames)}
+
+(
+    CONST,
+    VAR,
+    VAR_POST_INCR,
+    VAR_POST_DECR,
+    PRE_INCR,
+    PRE_DECR,
+    PLUS,
+    MINUS,
+    TIMES,
+    DIVIDE,
+    MOD,
+    POW,
+    EQ,
+    NEQ,
+    GT,
+    LT,
+    GTE,
+    LTE,
+    NOT,
+    AND,
+    OR,
+) = range(len(opnames))
+
+
+class CompactAst(object):
+    """
+    Struct-of-arrays ast shared by any number of expressions: parallel
+    array('i') columns for opcode and child indices, plus pools for
+    constants and variable names. Constant and plain variable leaves are
+    stored once and shared by every expression that uses them.
+
+    >>> tree = CompactAst()
+    >>> root = CompactParsor('x++ * 2 + x * 2', tree).execute()
+    >>> tree.to_ast(root)
+    ast('+', ast('*', ast('var', 'x'), ast('fl', 2.0)), ast('*', ast('var', 'x'), ast('fl', 2.0)))
+    >>> len(tree), tree.consts, tree.names
+    (6, [2.0], ['x'])
+    >>> variables = {'x': 1.0}
+    >>> tree.evaluate(root, variables), variables
+    (6.0, {'x': 2.0})
+    """
+
+    def __init__(self):
+        self.op = array('i')
+        self.left = array('i')
+        self.right = array('i')
+        self.consts = []
+        self.names = []
+        self.const_nodes = {}
+        self.var_nodes = {}
+        self.name_index = {}
+
+    def __len__(self):
+        return len(self.op)
+
+    def add(self, op: int, left: int, right: int = -1) -> int:
+        self.op.append(op)
+        self.left.append(left)
+        self.right.append(right)
+        return len(self.op) - 1
+
+    def name(self, name: str) -> int:
+        index = self.name_index.get(name)
+        if index is None:
+            index = self.name_index[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+    def const(self, value) -> int:
+        # 0 == 0.0 == -0.0 as dict keys, but they print differently
+        key = (type(value), repr(value))
+        node = self.const_nodes.get(key)
+        if node is None:
+            self.consts.append(value)
+            node = self.const_nodes[key] = self.add(CONST, len(self.consts) - 1)
+        return node
+
+    def var(self, name: str) -> int:
+        node = self.var_nodes.get(name)
+        if node is None:
+            node = self.var_nodes[name] = self.add(VAR, self.name(name))
+        return node
+
+    def to_ast(self, i: int) -> ast:
+        """
+        The tree under node i as ast objects, built children first from
+        an explicit stack so any depth converts.
+        """
+        results = []
+        tasks = [i]
+        while tasks:
+            i = tasks.pop()
+            if type(i) is tuple:
+                _, i = i
+                if self.right[i] == -1:
+                    results[-1] = ast(opnames[self.op[i]], results[-1])
+                else:
+                    right = results.pop()
+                    results[-1] = ast(opnames[self.op[i]], results[-1], right)
+                continue
+
+            op = self.op[i]
+            left = self.left[i]
+            right = self.right[i]
+            if op == CONST:
+                results.append(ast('fl', self.consts[left]))
+            elif op == VAR:
+                results.append(ast('var', self.names[left]))
+            elif op == VAR_POST_INCR or op == VAR_POST_DECR:
+                node = ast('var', self.names[left])
+                node.add_post_op(
+                    ast(opnames[op][3:], ast('var', self.names[left]))
+                )
+                results.append(node)
+            else:
+                tasks.append(('build', i))
+                if right != -1:
+                    tasks.append(right)
+                tasks.append(left)
+        return results[0]
+
+    binary = {
+        PLUS: lambda lhs, rhs: lhs + rhs,
+        MINUS: lambda lhs, rhs: lhs - rhs,
+        TIMES: lambda lhs, rhs: lhs * rhs,
+        DIVIDE: lambda dividend, divisor: dividend / divisor,
+        MOD: lambda dividend, divisor: dividend - (divisor * int(dividend/divisor)),
+        POW: lambda lhs, rhs: lhs ** rhs,
+        EQ: lambda lhs, rhs: 1 if lhs == rhs else 0,
+        NEQ: lambda lhs, rhs: 1 if lhs != rhs else 0,
+        GT: lambda lhs, rhs: 1 if lhs > rhs else 0,
+        LT: lambda lhs, rhs: 1 if lhs < rhs else 0,
+        GTE: lambda lhs, rhs: 1 if lhs >= rhs else 0,
+        LTE: lambda lhs, rhs: 1 if lhs <= rhs else 0,
+    }
+
+    def evaluate(self, i: int, variables):
+        """
+        Walks the tree under node i with an explicit stack of pending
+        work, like Interpreter.execute, so any depth evaluates. Items on
+        the stack are node indices to evaluate, or (step, node) pairs to
+        run once the operands they need are on `results`.
+
+        >>> tree = CompactAst()
+        >>> root = CompactParsor('1' + ' - 1' * 5000, tree).execute()
+        >>> tree.evaluate(root, {}), tree.to_ast(root).children[1]
+        (-4999.0, ast('fl', 1.0))
+        >>> tree.evaluate(CompactParsor('x++ / 0 || 1', tree).execute(), {})
+        Traceback (most recent call last):
+        ...
+        ZeroDivisionError: divide by zero
+        """
+        results = []
+        push = results.append
+        pop = results.pop
+        tasks = [i]
+
+        while tasks:
+            i = tasks.pop()
+
+            if type(i) is tuple:
+                step, i = i
+                op = self.op[i]
+                if step == 'apply':
+                    # For / and % the divisor is below the dividend
+                    second = pop()
+                    if op == DIVIDE or op == MOD:
+                        results[-1] = self.binary[op](second, results[-1])
+                    else:
+                        results[-1] = self.binary[op](results[-1], second)
+                elif step == 'divisor':
+                    if results[-1] in [0, None, 0.0]:
+                        raise ZeroDivisionError('divide by zero')
+                elif step == 'neg':
+                    results[-1] = -results[-1]
+                elif step == 'not':
+                    results[-1] = 0 if results[-1] else 1
+                elif step == 'bool':
+                    results[-1] = 1 if results[-1] else 0
+                else:
+                    # && and ||, once the left operand is known
+                    if (op == AND) != bool(pop()):
+                        push(0 if op == AND else 1)
+                    else:
+                        tasks.append(('bool', i))
+                        tasks.append(self.right[i])
+                continue
+
+            op = self.op[i]
+            left = self.left[i]
+            right = self.right[i]
+
+            if op == CONST:
+                push(self.consts[left])
+            elif op == VAR or op == VAR_POST_INCR or op == VAR_POST_DECR:
+                name = self.names[left]
+                if name not in variables:
+                    variables[name] = float(0)
+                push(variables[name])
+                if op == VAR_POST_INCR:
+                    variables[name] += 1
+                elif op == VAR_POST_DECR:
+                    variables[name] -= 1
+            elif op == PRE_INCR or op == PRE_DECR:
+                name = self.names[self.left[left]]
+                if name not in variables:
+                    variables[name] = float(0)
+                variables[name] += 1 if op == PRE_INCR else -1
+                push(variables[name])
+            elif op == MINUS and right == -1:
+                tasks.append(('neg', i))
+                tasks.append(left)
+            elif op == NOT:
+                tasks.append(('not', i))
+                tasks.append(left)
+            elif op == AND or op == OR:
+                tasks.append(('short_circuit', i))
+                tasks.append(left)
+            elif op == DIVIDE or op == MOD:
+                # The divisor is evaluated, and checked for zero, first
+                tasks.append(('apply', i))
+                tasks.append(left)
+                tasks.append(('divisor', i))
+                tasks.append(right)
+            elif op in self.binary:
+                tasks.append(('apply', i))
+                tasks.append(right)
+                tasks.append(left)
+            else:
+                raise SyntaxError(f'unknown operation {opnames[op]}')
+
+        return results[0]
+
+
+class CompactParsor(Parsor):
+    """
+    Parsor that emits nodes straight into a shared CompactAst and returns
+    node indices instead of ast objects.
+    """
+
+    def __init__(self, s, tree: CompactAst) -> None:
+        super().__init__(s)
+        self.tree = tree
+
+    def make_node(self, typ: str, *children):
+        if len(children) == 1:
+            return self.tree.add(opcodes[typ], children[0])
+        return self.tree.add(opcodes[typ], children[0], children[1])
+
+    def make_var(self, name: str):
+        return self.tree.var(name)
+
+    def make_const(self, literal: str):
+        return self.tree.const(float(literal))
+
+    def make_post_op(self, name: str, op: str):
+        return self.tree.add(opcodes['var' + op], self.tree.name(name))
+
+    def make_call(self, name: str, args: list):
+        raise SyntaxError(f'function calls are not supported in a CompactAst: {name}')
@@ -0,0 +1,395 @@
+from parsor import ast, Parsor
+from environment import Environment
+from bytecode import Code, Assembler, VM
+from numeric import int_divide, int_mod, int_power
+from constants import (
+    single_len_symbols,
+    boolean_symbols,
+    double_len_symbols,
+    op_equals_symbols,
+    bool_equals_symbols,
+    assign_symbols,
+    keywords,
+    disj_symbols,
+    conj_symbols,
+    power_symbols,
+    neg_symbols,
+    incr_or_decr_symbols,
+    relational_symbols,
+)
+
+
+class Compiler(object):
+    """
+    Turns an ast into nested closures once, so evaluating it again does not
+    have to dispatch on node types or allocate an Interpreter per node.
+    Variables are resolved to slots of the environment at compile time, and
+    the closures take the environment's values list.
+
+    >>> environment = Environment()
+    >>> environment.update({'y': 2, 'z': 3})
+    >>> Compiler(environment).compile(Parsor('x + y * z').execute())(environment.values)
+    6.0
+    >>> Compiler(environment).compile(Parsor('z / x * y').execute())(environment.values)
+    Traceback (most recent call last):
+    ...
+    ZeroDivisionError: divide by zero
+    >>> environment.update({'x': 1.0})
+    >>> Compiler(environment).compile(Parsor('x++ + x').execute())(environment.values)
+    3.0
+    >>> environment.as_dict()
+    {'y': 2, 'z': 3, 'x': 2.0}
+    >>> Compiler(environment).compile(Parsor('!(x < 2) || 7 % 4 == 3').execute())(environment.values)
+    1
+
+    With a memo.Memo, the values of repeated pure subexpressions are reused
+    until a variable they read is assigned. Calls go through a
+    functions.FunctionTable, looked up by name when they run.
+
+    In exact mode integral values stay ints through /, % and ^:
+
+    >>> Compiler(environment, exact=True).compile(Parsor('2 ^ 64 / 4 % 10', exact=True).execute())([])
+    4
+    """
+
+    handlers = {
+        'fl': 'const',
+        'bool': 'const',
+        'var': 'var',
+        '=': 'assign',
+        '+': 'plus',
+        '-': 'minus',
+        '*': 'times',
+        '/': 'divide',
+        '%': 'mod',
+        '^': 'pow',
+        '==': 'eq',
+        '!=': 'neq',
+        '>': 'gt',
+        '<': 'lt',
+        '>=': 'gte',
+        '<=': 'lte',
+        '!': 'not',
+        '&&': 'and',
+        '||': 'or',
+        '--': 'incr_or_decr',
+        '++': 'incr_or_decr',
+        'call': 'call',
+    }
+
+    # Calling nested closures takes a Python frame per level, so trees
+    # deeper than this run as bytecode on the VM's explicit stack instead
+    max_depth = 200
+
+    def __init__(self, environment: Environment, exact=False, memo=None, functions=None):
+        self.environment = environment
+        self.exact = exact
+        self.memo = memo
+        # A functions.FunctionTable, for trees that call functions
+        self.functions = functions
+        self.depth = 0
+        self.dispatch = {
+            typ: getattr(self, 'compile_' + name)
+            for typ, name in self.handlers.items()
+        }
+
+    def compile(self, a: ast):
+        """
+        >>> environment = Environment()
+        >>> Compiler(environment).compile(Parsor('x' + ' - 1' * 10000).execute())(environment.values)
+        -10000.0
+        """
+        if self.memo is not None:
+            closure = self.memo.closures.get(id(a))
+            if closure is not None:
+                return closure
+
+        try:
+            handler = self.dispatch[a.typ]
+        except KeyError:
+            raise SyntaxError(f'unknown operation {a.typ}')
+
+        if not self.depth:
+            self.depth = 1
+            try:
+                closure = handler(a)
+            except RecursionError:
+                return self.compile_flat(a)
+            finally:
+                self.depth = 0
+        else:
+            if self.depth >= self.max_depth:
+                raise RecursionError('tree too deep for closures')
+            self.depth += 1
+            try:
+                closure = handler(a)
+            finally:
+                self.depth -= 1
+
+        if self.memo is not None:
+            return self.memo.memoize(a, closure)
+        return closure
+
+    def compile_flat(self, a: ast):
+        code = Code(self.environment)
+        Assembler(self.environment).emit(code, a)
+        run = VM(self.exact, self.functions).run
+
+        def flat(values):
+            return run(code, values, None)
+        return flat
+
+    def compile_operands(self, a: ast):
+        left, right = a.children
+        return self.compile(left), self.compile(right)
+
+    def compile_const(self, a):
+        value = a.children[0]
+
+        def const(values):
+            return value
+        return const
+
+    def compile_var(self, a):
+        slot = self.environment.slot(a.children[0])
+
+        if not a.post_op:
+            def var(values):
+                return values[slot]
+            return var
+
+        post_op = self.compile(a.post_op)
+
+        def var_post_op(values):
+            value = values[slot]
+            post_op(values)
+            return value
+        return var_post_op
+
+    def compile_plus(self, a):
+        left, right = self.compile_operands(a)
+
+        def plus(values):
+            return left(values) + right(values)
+        return plus
+
+    def compile_minus(self, a):
+        if len(a.children) == 1:
+            operand = self.compile(a.children[0])
+
+            def negate(values):
+                return -operand(values)
+            return negate
+
+        left, right = self.compile_operands(a)
+
+        def minus(values):
+            return left(values) - right(values)
+        return minus
+
+    def compile_times(self, a):
+        left, right = self.compile_operands(a)
+
+        def times(values):
+            return left(values) * right(values)
+        return times
+
+    def compile_divide(self, a):
+        left, right = self.compile_operands(a)
+
+        if self.exact:
+            def exact_divide(values):
+                divisor = right(values)
+                if divisor in [0, None, 0.0]:
+                    raise ZeroDivisionError('divide by zero')
+                dividend = left(values)
+                if type(dividend) is int and type(divisor) is int:
+                    return int_divide(dividend, divisor)
+                return dividend / divisor
+            return exact_divide
+
+        def divide(values):
+            divisor = right(values)
+            if divisor in [0, None, 0.0]:
+                raise ZeroDivisionError('divide by zero')
+            return left(values) / divisor
+        return divide
+
+    def compile_mod(self, a):
+        left, right = self.compile_operands(a)
+
+        if self.exact and a.children[1].typ == 'fl':
+            modulus = a.children[1].children[0]
+            if type(modulus) is int and modulus > 0:
+                # The common x % 97: no divisor to evaluate or check
+                def mod_by_const(values):
+                    dividend = left(values)
+                    if type(dividend) is int:
+                        if dividend >= 0:
+                            return dividend % modulus
+                        return int_mod(dividend, modulus)
+                    return dividend - (modulus * int(dividend/modulus))
+                return mod_by_const
+
+        if self.exact:
+            def exact_mod(values):
+                divisor = right(values)
+                if divisor in [0, None, 0.0]:
+                    raise ZeroDivisionError('divide by zero')
+                dividend = left(values)
+                if type(dividend) is int and type(divisor) is int:
+                    if dividend >= 0 and divisor > 0:
+                        return dividend % divisor
+                    return int_mod(dividend, divisor)
+                return dividend - (divisor * int(dividend/divisor))
+            return exact_mod
+
+        def mod(values):
+            divisor = right(values)
+            if divisor in [0, None, 0.0]:
+                raise ZeroDivisionError('divide by zero')
+            dividend = left(values)
+            return dividend - (divisor * int(dividend/divisor))
+        return mod
+
+    def compile_pow(self, a):
+        left, right = self.compile_operands(a)
+
+        if self.exact:
+            def exact_pow(values):
+                base = left(values)
+                exponent = right(values)
+                if type(base) is int and type(exponent) is int:
+                    if 0 <= exponent <= 64 and -256 <= base <= 256:
+                        return base ** exponent
+                    return int_power(base, exponent)
+                return base ** exponent
+            return exact_pow
+
+        def pow(values):
+            return left(values) ** right(values)
+        return pow
+
+    def compile_not(self, a):
+        operand = self.compile(a.children[0])
+
+        def not_(values):
+            return 0 if operand(values) else 1
+        return not_
+
+    def compile_and(self, a):
+        left, right = self.compile_operands(a)
+
+        def and_(values):
+            return 1 if left(values) and right(values) else 0
+        return and_
+
+    def compile_or(self, a):
+        left, right = self.compile_operands(a)
+
+        def or_(values):
+            return 1 if left(values) or right(values) else 0
+        return or_
+
+    def compile_incr_or_decr(self, a):
+        if len(a.children) != 1:
+            raise SyntaxError(f'expected 1 child, got {len(a.children)}')
+
+        if a.children[0].typ != 'var':
+            raise SyntaxError(
+                f'expected variable, got {a.children[0].typ}'
+            )
+
+        slot = self.environment.slot(a.children[0].children[0])
+        step = 1 if a.typ == '++' else -1
+
+        if self.memo is not None:
+            versions = self.environment.versions
+
+            def counted_incr_or_decr(values):
+                values[slot] += step
+                versions[slot] += 1
+                return values[slot]
+            return counted_incr_or_decr
+
+        def incr_or_decr(values):
+            values[slot] += step
+            return values[slot]
+        return incr_or_decr
+
+    def compile_eq(self, a):
+        left, right = self.compile_operands(a)
+
+        def eq(values):
+            return 1 if left(values) == right(values) else 0
+        return eq
+
+    def compile_neq(self, a):
+        left, right = self.compile_operands(a)
+
+        def neq(values):
+            return 1 if left(values) != right(values) else 0
+        return neq
+
+    def compile_gt(self, a):
+        left, right = self.compile_operands(a)
+
+        def gt(values):
+            return 1 if left(values) > right(values) else 0
+        return gt
+
+    def compile_lt(self, a):
+        left, right = self.compile_operands(a)
+
+        def lt(values):
+            return 1 if left(values) < right(values) else 0
+        return lt
+
+    def compile_gte(self, a):
+        left, right = self.compile_operands(a)
+
+        def gte(values):
+            return 1 if left(values) >= right(values) else 0
+        return gte
+
+    def compile_lte(self, a):
+        left, right = self.compile_operands(a)
+
+        def lte(values):
+            return 1 if left(values) <= right(values) else 0
+        return lte
+
+    def compile_assign(self, a):
+        if len(a.children) != 2 or a.children[0].typ != 'var':
+            raise SyntaxError('Invalid assignment syntax')
+
+        slot = self.environment.slot(a.children[0].children[0])
+        value = self.compile(a.children[1])
+
+        if self.memo is not None:
+            versions = self.environment.versions
+
+            def counted_assign(values):
+                result = value(values)
+                values[slot] = result
+                versions[slot] += 1
+                return result
+            return counted_assign
+
+        def assign(values):
+            result = value(values)
+            values[slot] = result
+            return result
+        return assign
+
+    def compile_call(self, a):
+        name = a.children[0]
+        if self.functions is None:
+            raise SyntaxError(f'function {name} not defined')
+
+        args = [self.compile(arg) for arg in a.children[1:]]
+        call = self.functions.call
+
+        def call_(values):
+            return call(name, [arg(values) for arg in args], values)
+        return call_
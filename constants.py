@@ -1,14 +1,14 @@
-single_len_symbols = ["-", "+", "*", "/", "%", "^", "(", ")", "<", ">"]
-boolean_symbols = ["&&", "||", "!"]
-double_len_symbols = ["++", "--", "==", "!=", "<=", ">="]
-op_equals_symbols = ["+=", "-=", "*=", "/=", "%=", "^=", "!="]
-bool_equals_symbols = ["&&=", "||="]
-assign_symbols = ["="]
-keywords = ["print"]
+single_len_symbols = frozenset(["-", "+", "*", "/", "%", "^", "(", ")", "<", ">"])
+boolean_symbols = frozenset(["&&", "||", "!"])
+double_len_symbols = frozenset(["++", "--", "==", "!=", "<=", ">="])
+op_equals_symbols = frozenset(["+=", "-=", "*=", "/=", "%=", "^=", "!="])
+bool_equals_symbols = frozenset(["&&=", "||="])
+assign_symbols = frozenset(["="])
+keywords = frozenset(["print", "define", "return", "auto", "if"])
 
-disj_symbols = ["+", "-"]
-conj_symbols = ["*", "/", "%"]
-power_symbols = ["^"]
-neg_symbols = ["-"]
-incr_or_decr_symbols = ["--", "++"]
-relational_symbols = ["<", ">", "<=", ">=", "==", "!="]
+disj_symbols = frozenset(["+", "-"])
+conj_symbols = frozenset(["*", "/", "%"])
+power_symbols = frozenset(["^"])
+neg_symbols = frozenset(["-"])
+incr_or_decr_symbols = frozenset(["--", "++"])
+relational_symbols = frozenset(["<", ">", "<=", ">=", "==", "!="])
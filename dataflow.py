@@ -0,0 +1,288 @@
+from concurrent.futures import ProcessPoolExecutor
+from parsor import ast
+from compiler import Compiler
+from environment import Environment
+from statement_parser import StatementParser
+from functions import calls
+from constants import (
+    single_len_symbols,
+    boolean_symbols,
+    double_len_symbols,
+    op_equals_symbols,
+    bool_equals_symbols,
+    assign_symbols,
+    keywords,
+    disj_symbols,
+    conj_symbols,
+    power_symbols,
+    neg_symbols,
+    incr_or_decr_symbols,
+    relational_symbols,
+)
+
+
+def trees(statement):
+    if statement['type'] == 'print':
+        return [item for item in statement['value'] if isinstance(item, ast)]
+    if statement['type'] == 'define':
+        return []
+    return [statement['value']]
+
+
+def barrier(statement) -> bool:
+    """
+    Whether a statement defines or calls a function. What a call reads
+    and writes is only known once it runs, so such a statement runs after
+    everything before it and before everything after it.
+    """
+    return statement['type'] == 'define' or bool(calls(trees(statement)))
+
+
+def accesses(statement):
+    """
+    The variables a statement reads and the ones it writes. ++ and --,
+    prefix or postfix, both read and write their variable.
+
+    >>> reads, writes = accesses(StatementParser('x = y++ + --z * y', False).parse())
+    >>> sorted(reads), sorted(writes)
+    (['y', 'z'], ['x', 'y', 'z'])
+    >>> reads, writes = accesses(StatementParser('print a, c ^ 2', False).parse())
+    >>> sorted(reads), sorted(writes)
+    (['a', 'c'], [])
+    """
+    reads = set()
+    writes = set()
+    if statement['type'] == 'assign':
+        writes.add(statement['variable'])
+
+    stack = trees(statement)
+    while stack:
+        a = stack.pop()
+        if a.typ == 'var':
+            reads.add(a.children[0])
+            if a.post_op:
+                writes.add(a.children[0])
+        elif a.typ in incr_or_decr_symbols:
+            reads.add(a.children[0].children[0])
+            writes.add(a.children[0].children[0])
+        elif a.typ == 'call':
+            stack.extend(a.children[1:])
+        elif a.typ not in ['fl', 'bool']:
+            stack.extend(a.children)
+    return reads, writes
+
+
+def dependencies(statements):
+    """
+    For each statement, the earlier statements it must run after: the last
+    writer of anything it reads or writes, and every reader since that
+    write of anything it writes. Prints also depend on the print before
+    them, since output order is part of the result. A barrier depends on
+    every statement since the barrier before it, and everything after it
+    on the barrier.
+
+    >>> dependencies([
+    ...     StatementParser(line, False).parse()
+    ...     for line in ['x = 2 ^ 3', 'y = 3 ^ 2', 'print x', 'z = x + y', 'x = 1', 'print z']
+    ... ])
+    [set(), set(), {0}, {0, 1}, {0, 2, 3}, {2, 3}]
+    >>> dependencies([
+    ...     StatementParser(line, False).parse()
+    ...     for line in ['x = 2 ^ 3', 'y = 3 ^ 2', 'z = f(1)', 'w = 2 ^ 5']
+    ... ])
+    [set(), set(), {0, 1}, {2}]
+    """
+    last_writer = {}
+    readers = {}
+    last_print = None
+    last_barrier = None
+    # Statements since the last barrier
+    since = []
+    graph = []
+    for i, statement in enumerate(statements):
+        reads, writes = accesses(statement)
+        deps = set()
+        if last_barrier is not None:
+            deps.add(last_barrier)
+        if barrier(statement):
+            deps.update(since)
+            last_barrier = i
+            since = []
+        else:
+            since.append(i)
+        for name in reads | writes:
+            if name in last_writer:
+                deps.add(last_writer[name])
+        for name in writes:
+            deps.update(readers.get(name, ()))
+        if statement['type'] == 'print':
+            if last_print is not None:
+                deps.add(last_print)
+            last_print = i
+        deps.discard(i)
+        graph.append(deps)
+
+        for name in reads:
+            readers.setdefault(name, set()).add(i)
+        for name in writes:
+            last_writer[name] = i
+            readers[name] = set()
+    return graph
+
+
+def cost(a: ast, power_cost: int = 25) -> int:
+    """
+    A rough estimate of the work in a tree: one per node, with ^ weighted
+    up because that is where big scripts spend their time.
+    """
+    total = 0
+    stack = [a]
+    while stack:
+        a = stack.pop()
+        total += power_cost if a.typ == '^' else 1
+        if a.typ not in ['fl', 'bool', 'var']:
+            stack.extend(a.children)
+    return total
+
+
+def depth(a: ast) -> int:
+    """
+    >>> depth(StatementParser('x = -(y + 1) * 2', False).parse()['value'])
+    4
+    """
+    deepest = 0
+    stack = [(a, 1)]
+    while stack:
+        a, level = stack.pop()
+        deepest = max(deepest, level)
+        if a.typ not in ['fl', 'bool', 'var']:
+            stack.extend((child, level + 1) for child in a.children)
+    return deepest
+
+
+def evaluate_remote(statement, reads, zero, exact):
+    """
+    Runs an assign or eval statement in a worker, against a private
+    environment holding the values it reads and writes. Returns the assigned value,
+    every variable the statement wrote and the exception it raised, if
+    any: a ++ that ran before a divide by zero still counts.
+    """
+    environment = Environment(zero)
+    environment.update(reads)
+    value = error = None
+    try:
+        value = Compiler(environment, exact).compile(statement['value'])(environment.values)
+    except Exception as e:
+        error = e
+    _, writes = accesses(statement)
+    return value, {name: environment.values[environment.slot(name)] for name in writes}, error
+
+
+class DataflowScheduler(object):
+    """
+    Evaluates a StatementEvaluator's parsed statements with expensive,
+    independent assignments running concurrently in worker processes.
+
+    Everything commits in program order. A statement is only sent to a
+    worker once every statement it depends on has committed, so it sees
+    exactly the values it would have seen sequentially. Its result, or its
+    exception, is applied when its turn comes, and nothing after a divide
+    by zero is applied. Prints and cheap statements run in this process
+    at their turn. The result is the same output, variable values and
+    abort point as sequential evaluation.
+
+    >>> from statement_evaluator import StatementEvaluator
+    >>> evaluator = StatementEvaluator(
+    ...     ['a = 3 ^ 2 ^ 2', 'b = 2 ^ 3 ^ 2', 'print a, b', 'c = b / (a - 81)', 'print c'],
+    ...     exact=True
+    ... )
+    >>> evaluator.scheduler = DataflowScheduler(workers=2)
+    >>> evaluator.execute()
+    81 512
+    divide by zero
+    >>> evaluator.variables
+    {'a': 81, 'b': 512, 'c': 0}
+    """
+
+    # Pickling a tree recurses once per level, so deeper ones stay local
+    max_depth = 200
+
+    def __init__(self, workers=None, threshold: int = 50, window: int = 64):
+        self.workers = workers
+        self.threshold = threshold
+        self.window = window
+        self.offloaded = 0
+
+    def offloadable(self, statement) -> bool:
+        return (
+            statement['type'] != 'print'
+            and not barrier(statement)
+            and cost(statement['value']) >= self.threshold
+            and depth(statement['value']) <= self.max_depth
+        )
+
+    def evaluate(self, evaluator):
+        statements = evaluator.parsed_statements
+        graph = dependencies(statements)
+        waiting = [len(deps) for deps in graph]
+        dependents = [[] for _ in statements]
+        for i, deps in enumerate(graph):
+            for j in deps:
+                dependents[j].append(i)
+
+        offloadable = [self.offloadable(statement) for statement in statements]
+        if not any(offloadable):
+            for statement in statements:
+                evaluator.evaluate_statement(statement)
+            return
+
+        environment = evaluator.environment
+        futures = {}
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            def submit(i):
+                reads, writes = accesses(statements[i])
+                futures[i] = pool.submit(
+                    evaluate_remote,
+                    statements[i],
+                    {
+                        name: environment.values[environment.slot(name)]
+                        for name in reads | writes
+                    },
+                    environment.zero,
+                    evaluator.exact,
+                )
+                self.offloaded += 1
+
+            for i in range(min(self.window, len(statements))):
+                if offloadable[i] and not waiting[i]:
+                    submit(i)
+
+            try:
+                for i, statement in enumerate(statements):
+                    future = futures.pop(i, None)
+                    if future is None:
+                        evaluator.evaluate_statement(statement)
+                    else:
+                        self.commit(evaluator, statement, future.result())
+
+                    for j in dependents[i]:
+                        waiting[j] -= 1
+                        if not waiting[j] and offloadable[j] and j - i <= self.window:
+                            submit(j)
+                    # Statements that became ready before they entered the window
+                    j = i + self.window
+                    if j < len(statements) and offloadable[j] and not waiting[j] and j not in futures:
+                        submit(j)
+            finally:
+                for future in futures.values():
+                    future.cancel()
+
+    def commit(self, evaluator, statement, result):
+        value, writes, error = result
+        environment = evaluator.environment
+        environment.update(writes)
+        if error is not None:
+            raise error
+        if statement['type'] == 'assign':
+            environment.update({statement['variable']: value})
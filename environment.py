@@ -0,0 +1,100 @@
+from parsor import ast
+from constants import (
+    single_len_symbols,
+    boolean_symbols,
+    double_len_symbols,
+    op_equals_symbols,
+    bool_equals_symbols,
+    assign_symbols,
+    keywords,
+    disj_symbols,
+    conj_symbols,
+    power_symbols,
+    neg_symbols,
+    incr_or_decr_symbols,
+    relational_symbols,
+)
+
+
+class Environment(object):
+    """
+    Variable store addressed by integer slots. Names are resolved to slots
+    once, when statements are compiled, and evaluation indexes `values`
+    directly. A new slot starts out as `zero`, which is how variables are
+    auto-zeroed. Values stay a plain list because they are not always
+    floats: comparisons store ints. `versions` counts the assignments to
+    each slot, for a memo.Memo to tell when a remembered value is stale.
+
+    >>> environment = Environment()
+    >>> environment.resolve([{'type': 'assign', 'variable': 'x', 'value': ast('var', 'y')}])
+    >>> environment.slots, environment.values
+    ({'x': 0, 'y': 1}, [0.0, 0.0])
+    >>> environment.update({'y': 2.0, 'z': 1})
+    >>> environment.as_dict()
+    {'x': 0.0, 'y': 2.0, 'z': 1}
+    """
+
+    def __init__(self, zero=0.0):
+        self.zero = zero
+        self.slots = {}
+        self.names = []
+        self.values = []
+        self.versions = []
+
+    def slot(self, name: str) -> int:
+        slot = self.slots.get(name)
+        if slot is None:
+            slot = self.slots[name] = len(self.names)
+            self.names.append(name)
+            self.values.append(self.zero)
+            self.versions.append(0)
+        return slot
+
+    def resolve(self, statements):
+        """
+        Gives every variable a parsed program mentions a slot up front,
+        including the locals and bodies of its functions, so the values
+        list never has to grow during evaluation.
+        """
+        for statement in statements:
+            if statement['type'] == 'define':
+                for name in statement['params'] + statement['autos']:
+                    self.slot(name)
+                self.resolve(statement['body'])
+                continue
+
+            if statement['type'] == 'assign':
+                self.slot(statement['variable'])
+
+            if statement['type'] == 'print':
+                trees = statement['value']
+            elif statement['type'] == 'if':
+                trees = [statement['condition']]
+            else:
+                trees = [statement['value']]
+
+            stack = [a for a in trees if isinstance(a, ast)]
+            while stack:
+                a = stack.pop()
+                if a.typ == 'var':
+                    self.slot(a.children[0])
+                elif a.typ == 'call':
+                    stack.extend(a.children[1:])
+                elif a.typ not in ['fl', 'bool']:
+                    stack.extend(a.children)
+
+            if statement['type'] == 'if':
+                self.resolve(statement['body'])
+
+    def update(self, variables):
+        for name, value in variables.items():
+            slot = self.slot(name)
+            self.values[slot] = value
+            self.versions[slot] += 1
+
+    def as_dict(self):
+        """
+        Every variable that has a slot, including ones the program only
+        mentioned, which read as zero.
+        """
+        return dict(zip(self.names, self.values))
@@ -0,0 +1,391 @@
+import sys
+import threading
+from collections import OrderedDict
+from parsor import ast
+from environment import Environment
+from constants import (
+    single_len_symbols,
+    boolean_symbols,
+    double_len_symbols,
+    op_equals_symbols,
+    bool_equals_symbols,
+    assign_symbols,
+    keywords,
+    disj_symbols,
+    conj_symbols,
+    power_symbols,
+    neg_symbols,
+    incr_or_decr_symbols,
+    relational_symbols,
+)
+
+
+def statement_trees(statement):
+    """
+    The trees a statement evaluates itself, not counting the statements
+    in the body of an if or a define.
+    """
+    if statement['type'] == 'print':
+        return [item for item in statement['value'] if isinstance(item, ast)]
+    if statement['type'] == 'if':
+        return [statement['condition']]
+    if statement['type'] in ['define', 'auto', 'end']:
+        return []
+    return [statement['value']]
+
+
+def calls(trees) -> set:
+    """
+    The names of the functions called anywhere in trees.
+
+    >>> from parsor import Parsor
+    >>> sorted(calls([Parsor('f(x) + 2 * g(f(1))').execute()]))
+    ['f', 'g']
+    """
+    names = set()
+    stack = list(trees)
+    while stack:
+        a = stack.pop()
+        if a.typ == 'call':
+            names.add(a.children[0])
+            stack.extend(a.children[1:])
+        elif a.typ not in ['fl', 'bool', 'var']:
+            stack.extend(a.children)
+    return names
+
+
+class Function(object):
+    """
+    A define'd function: its parameters, its auto variables and the
+    statements of its body, and once a FunctionTable has prepared it, the
+    compiled body and the slots of its locals. It does not change after
+    that, so one Function can be installed in many tables.
+    """
+
+    def __init__(self, name: str, params: list, autos: list, body: list):
+        self.name = name
+        self.params = params
+        self.autos = autos
+        self.body = body
+        self.names, self.called, self.prints = self.summary()
+        self.run = None
+        self.slots = None
+        # environment.versions, when a memo.Memo needs writes counted
+        self.versions = None
+
+    def key(self, args) -> tuple:
+        # 1 and 1.0 are equal, and so are 0.0 and -0.0, but they print
+        # differently
+        return tuple((type(arg), arg if arg else repr(arg)) for arg in args)
+
+    def summary(self):
+        """
+        The variables the body uses, the functions it calls and whether
+        it prints anything.
+        """
+        names = set()
+        called = set()
+        prints = False
+        pending = list(self.body)
+        while pending:
+            statement = pending.pop()
+            if statement['type'] == 'print':
+                prints = True
+            elif statement['type'] == 'assign':
+                names.add(statement['variable'])
+            elif statement['type'] == 'if':
+                pending.extend(statement['body'])
+
+            stack = statement_trees(statement)
+            while stack:
+                a = stack.pop()
+                if a.typ == 'var':
+                    names.add(a.children[0])
+                elif a.typ == 'call':
+                    called.add(a.children[0])
+                    stack.extend(a.children[1:])
+                elif a.typ not in ['fl', 'bool']:
+                    stack.extend(a.children)
+        return names, called, prints
+
+
+class RecursionLimit(object):
+    """
+    Raises the interpreter's recursion limit to at least `limit` while
+    any holder is inside it, and puts it back once the last one leaves.
+    The limit is shared by every thread, so holders are counted rather
+    than each restoring what it found.
+    """
+
+    lock = threading.Lock()
+    holders = 0
+    saved = None
+
+    def __init__(self, limit: int):
+        self.limit = limit
+
+    def __enter__(self):
+        with RecursionLimit.lock:
+            if not RecursionLimit.holders:
+                RecursionLimit.saved = sys.getrecursionlimit()
+                sys.setrecursionlimit(max(RecursionLimit.saved, self.limit))
+            RecursionLimit.holders += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with RecursionLimit.lock:
+            RecursionLimit.holders -= 1
+            if not RecursionLimit.holders:
+                sys.setrecursionlimit(RecursionLimit.saved)
+
+
+class FunctionTable(object):
+    """
+    The functions a program has defined so far, and how to call them.
+
+    Variables are dynamically scoped, as in bc: a call saves the values of
+    the function's parameters and auto variables, binds the arguments to
+    the parameters and zero to the autos, runs the body and restores the
+    saved values on the way out. A function therefore sees the locals of
+    whoever called it, and every level of a recursion has its own. Calls
+    take the values list they run against, like compiled closures do.
+
+    A function is pure when its body touches no variable but its own
+    parameters and autos, prints nothing and calls only pure functions,
+    itself included, so that its result depends on its arguments alone.
+    The results of a pure function are kept in an LRU cache of cache_size
+    entries, keyed on the types and values of the arguments, and a
+    recursive definition like Fibonacci then computes each value once.
+    Defining a function clears every cache, since it can change what the
+    functions already defined end up calling.
+
+    Bodies are compiled to closures by `compiler` on their first call,
+    whichever engine runs the statements that call them. Each level of a
+    recursion takes a handful of Python frames, so while a call runs the
+    recursion limit is raised to recursion_limit. That is safe because
+    the closures call each other without using the C stack; the limit is
+    put back before anything that does, like pickling a deep tree, runs.
+
+    >>> from compiler import Compiler
+    >>> from statement_parser import StatementParser, BlockCollector
+    >>> environment = Environment()
+    >>> functions = FunctionTable(environment)
+    >>> functions.compiler = Compiler(environment, functions=functions)
+    >>> blocks = BlockCollector()
+    >>> for line in ['define fib(n) {', 'if (n < 2) return n', 'return fib(n - 1) + fib(n - 2)', '}']:
+    ...     statement = blocks.add(StatementParser(line, False).parse())
+    >>> functions.define(statement)
+    >>> functions.call('fib', [90.0], environment.values)
+    2.880067194370816e+18
+    >>> functions.pure, functions.misses, functions.hits
+    ({'fib'}, 91, 88)
+    >>> functions.call('fib', [1.0, 2.0], environment.values)
+    Traceback (most recent call last):
+    ...
+    RuntimeError: fib takes 1 argument, got 2
+    """
+
+    cache_size = 4096
+    recursion_limit = 50000
+
+    def __init__(self, environment: Environment, output=None):
+        self.environment = environment
+        # Where prints in a body go, an OutputWriter; None is print()
+        self.output = output
+        self.compiler = None
+        self.functions = {}
+        # The names of the pure functions, and their caches of results
+        self.pure = set()
+        self.caches = {}
+        self.hits = 0
+        self.misses = 0
+        # Whether a call is running, and the recursion limit is raised
+        self.running = False
+
+    def define(self, statement):
+        self.install(Function(
+            statement['name'], statement['params'], statement['autos'], statement['body']
+        ))
+
+    def install(self, function: Function):
+        self.functions[function.name] = function
+        self.analyze()
+
+    def analyze(self):
+        """
+        Decides which functions are pure: start from the ones whose own
+        body qualifies, then drop every one that calls a function outside
+        the set until nothing changes.
+        """
+        pure = {
+            function.name
+            for function in self.functions.values()
+            if not function.prints and function.names <= {*function.params, *function.autos}
+        }
+        changed = True
+        while changed:
+            impure = {name for name in pure if not self.functions[name].called <= pure}
+            pure -= impure
+            changed = bool(impure)
+
+        self.pure = pure
+        self.caches = {name: OrderedDict() for name in pure}
+
+    def function(self, name: str, count: int) -> Function:
+        function = self.functions.get(name)
+        if function is None:
+            raise RuntimeError(f'function {name} not defined')
+        if len(function.params) != count:
+            expected = len(function.params)
+            raise RuntimeError(
+                f'{name} takes {expected} argument{"" if expected == 1 else "s"}, got {count}'
+            )
+        return function
+
+    def call(self, name: str, args: list, values: list):
+        if not self.running:
+            return self.call_outermost(name, args, values)
+
+        function = self.function(name, len(args))
+        if name not in self.pure:
+            return self.invoke(function, args, values)
+
+        key = function.key(args)
+        cache = self.caches[name]
+        if key in cache:
+            self.hits += 1
+            cache.move_to_end(key)
+            return cache[key]
+
+        self.misses += 1
+        value = self.invoke(function, args, values)
+        self.remember(name, key, value)
+        return value
+
+    def remember(self, name: str, key: tuple, value):
+        cache = self.caches[name]
+        cache[key] = value
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+    def call_outermost(self, name: str, args: list, values: list):
+        self.running = True
+        try:
+            with RecursionLimit(self.recursion_limit):
+                return self.call(name, args, values)
+        finally:
+            self.running = False
+
+    def invoke(self, function: Function, args: list, values: list):
+        if function.run is None:
+            self.prepare(function)
+
+        versions = function.versions
+        slots = function.slots
+        saved = [values[slot] for slot in slots]
+        zero = self.environment.zero
+        for i, slot in enumerate(slots):
+            values[slot] = args[i] if i < len(args) else zero
+            if versions is not None:
+                versions[slot] += 1
+        try:
+            return function.run(values)
+        finally:
+            for slot, value in zip(slots, saved):
+                values[slot] = value
+                if versions is not None:
+                    versions[slot] += 1
+
+    def prepare(self, function: Function):
+        """
+        Compiles the function's body, once, and gives its locals slots.
+        """
+        function.slots = [
+            self.environment.slot(name) for name in function.params + function.autos
+        ]
+        if self.compiler.memo is not None:
+            function.versions = self.environment.versions
+        function.run = self.compile(function.body)
+
+    def write(self, printed: list):
+        if self.output is None:
+            print(*printed)
+        else:
+            self.output.line(printed)
+
+    def compile(self, body: list):
+        """
+        A closure running the body that returns what its return statement
+        returned, or zero when it finishes without one.
+        """
+        steps = self.compile_block(body)
+        zero = self.environment.zero
+
+        def run(values):
+            for step in steps:
+                returned = step(values)
+                if returned is not None:
+                    return returned[0]
+            return zero
+        return run
+
+    def compile_block(self, statements: list) -> list:
+        # Every step returns None, or (value,) once a return has run
+        return [self.compile_statement(statement) for statement in statements]
+
+    def compile_statement(self, statement):
+        compile = self.compiler.compile
+        typ = statement['type']
+
+        if typ == 'return':
+            value = compile(statement['value'])
+
+            def return_(values):
+                return (value(values),)
+            return return_
+
+        if typ == 'if':
+            condition = compile(statement['condition'])
+            steps = self.compile_block(statement['body'])
+
+            def if_(values):
+                if condition(values):
+                    for step in steps:
+                        returned = step(values)
+                        if returned is not None:
+                            return returned
+                return None
+            return if_
+
+        if typ == 'assign':
+            value = compile(statement['value'])
+            slot = self.environment.slot(statement['variable'])
+            if self.compiler.memo is None:
+                def assign(values):
+                    values[slot] = value(values)
+                return assign
+
+            versions = self.environment.versions
+
+            def counted_assign(values):
+                values[slot] = value(values)
+                versions[slot] += 1
+            return counted_assign
+
+        if typ == 'print':
+            items = [
+                item if isinstance(item, str) else compile(item)
+                for item in statement['value']
+            ]
+            # Whoever calls the function decides where its output goes
+            write = self.compiler.functions.write
+
+            def print_(values):
+                write([item if isinstance(item, str) else item(values) for item in items])
+            return print_
+
+        value = compile(statement['value'])
+
+        def eval_(values):
+            value(values)
+        return eval_
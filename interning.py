@@ -0,0 +1,176 @@
+from parsor import ast, Parsor
+from numeric import parse_literal
+from constants import (
+    single_len_symbols,
+    boolean_symbols,
+    double_len_symbols,
+    op_equals_symbols,
+    bool_equals_symbols,
+    assign_symbols,
+    keywords,
+    disj_symbols,
+    conj_symbols,
+    power_symbols,
+    neg_symbols,
+    incr_or_decr_symbols,
+    relational_symbols,
+)
+
+
+class InternTable(object):
+    """
+    Hash-consing table that keeps one ast per distinct subtree, so every
+    statement built through it shares its repeated subexpressions as a
+    DAG. A node is keyed on its type and the identities of its already
+    interned children, which the table keeps alive.
+
+    `shared` holds the id of every node that was asked for again after
+    it was first made, the ones worth remembering a value for.
+
+    >>> table = InternTable()
+    >>> a = table.parsor('(a * b + c) / 2').execute()
+    >>> b = table.parsor('x - (a * b + c)').execute()
+    >>> a.children[0] is b.children[1], a.children[0] is b.children[0]
+    (True, False)
+    >>> len(table.nodes), id(a.children[0]) in table.shared
+    (9, True)
+    """
+
+    def __init__(self):
+        self.nodes = {}
+        self.shared = set()
+
+    def parsor(self, s, exact=False):
+        return InterningParsor(s, self, exact)
+
+    def lookup(self, key, make):
+        node = self.nodes.get(key)
+        if node is None:
+            node = self.nodes[key] = make()
+        else:
+            self.shared.add(id(node))
+        return node
+
+    def node(self, typ: str, *children):
+        key = (typ, *map(id, children))
+        node = self.nodes.get(key)
+        if node is None:
+            node = self.nodes[key] = ast(typ, *children)
+        else:
+            self.shared.add(id(node))
+        return node
+
+    def var(self, name: str):
+        return self.lookup(('var', name), lambda: ast('var', name))
+
+    def const(self, typ: str, value):
+        """
+        1 and 1.0 are equal, and so are 0.0 and -0.0, but they print
+        differently, so constants are keyed on their repr.
+
+        >>> table = InternTable()
+        >>> table.const('fl', 0.0) is table.const('fl', -0.0), table.const('fl', -0.0).children
+        (False, (-0.0,))
+        >>> from statement_evaluator import StatementEvaluator
+        >>> StatementEvaluator(['print 0 * 1', 'print 0 * -1'], optimize=True, memoize=True).execute()
+        0.0
+        -0.0
+        """
+        return self.lookup((typ, type(value), repr(value)), lambda: ast(typ, value))
+
+    def post_op(self, name: str, op: str):
+        def make():
+            node = ast('var', name)
+            node.add_post_op(ast(op, ast('var', name)))
+            return node
+        return self.lookup(('var', name, op), make)
+
+    def call(self, name: str, args: list):
+        key = ('call', name, *map(id, args))
+        return self.lookup(key, lambda: ast('call', name, *args))
+
+    def intern_tree(self, a: ast) -> ast:
+        """
+        The interned equivalent of a tree built elsewhere, such as by the
+        optimizer or loaded from a cache.
+
+        >>> table = InternTable()
+        >>> x = table.parsor('x++ * (y + 1)').execute()
+        >>> table.intern_tree(Parsor('2 - x++ * (y + 1)').execute()).children[1] is x
+        True
+        """
+        interned = {}
+        stack = [a]
+        while stack:
+            node = stack[-1]
+            if id(node) in interned:
+                stack.pop()
+                continue
+
+            if node.typ == 'var':
+                if node.post_op:
+                    canonical = self.post_op(node.children[0], node.post_op.typ)
+                else:
+                    canonical = self.var(node.children[0])
+            elif node.typ in ['fl', 'bool']:
+                canonical = self.const(node.typ, node.children[0])
+            elif node.typ == 'call':
+                pending = [child for child in node.children[1:] if id(child) not in interned]
+                if pending:
+                    stack.extend(pending)
+                    continue
+                canonical = self.call(
+                    node.children[0], [interned[id(child)] for child in node.children[1:]]
+                )
+            else:
+                pending = [child for child in node.children if id(child) not in interned]
+                if pending:
+                    stack.extend(pending)
+                    continue
+                canonical = self.node(
+                    node.typ, *[interned[id(child)] for child in node.children]
+                )
+
+            interned[id(node)] = canonical
+            stack.pop()
+        return interned[id(a)]
+
+    def intern_statement(self, statement: dict) -> dict:
+        if statement['type'] == 'define':
+            # Bodies are compiled once per definition, not per statement
+            return statement
+        if statement['type'] == 'print':
+            value = [
+                self.intern_tree(item) if isinstance(item, ast) else item
+                for item in statement['value']
+            ]
+        else:
+            value = self.intern_tree(statement['value'])
+        return {**statement, 'value': value}
+
+
+class InterningParsor(Parsor):
+    """
+    Parsor that builds every node through an InternTable, so structurally
+    identical subtrees, within a statement or across statements parsed
+    with the same table, are the same ast object.
+    """
+
+    def __init__(self, s, table: InternTable, exact=False) -> None:
+        super().__init__(s, exact)
+        self.table = table
+
+    def make_node(self, typ: str, *children):
+        return self.table.node(typ, *children)
+
+    def make_var(self, name: str):
+        return self.table.var(name)
+
+    def make_const(self, literal: str):
+        return self.table.const('fl', parse_literal(literal, self.exact))
+
+    def make_post_op(self, name: str, op: str):
+        return self.table.post_op(name, op)
+
+    def make_call(self, name: str, args: list):
+        return self.table.call(name, args)
@@ -34,151 +34,247 @@ class Interpreter(object):
     -16.0
     """
 
-    def __init__(self, a: ast, variables) -> None:
+    def __init__(self, a: ast, variables, functions=None) -> None:
         self.a = a
         self.variables = variables
+        # A functions.FunctionTable holding the definitions calls run
+        self.functions = functions
 
     def execute(self) -> bool:
-        if self.a.typ in ['fl', 'bool']:
-            return self.a.children[0]
-        elif self.a.typ == 'var':
-            return self.interp_var()
-        elif self.a.typ == '=':
-            return self.interp_assign()
-        elif self.a.typ == '+':
-            return self.interp_plus()
-        elif self.a.typ == '-':
-            return self.interp_minus()
-        elif self.a.typ == '*':
-            return self.interp_times()
-        elif self.a.typ == '/':
-            return self.interp_divide()
-        elif self.a.typ == '%':
-            return self.interp_mod()
-        elif self.a.typ == '^':
-            return self.interp_pow()
-        elif self.a.typ == '==':
-            return self.interp_eq()
-        elif self.a.typ == '!=':
-            return self.interp_neq()
-        elif self.a.typ == '>':
-            return self.interp_gt()
-        elif self.a.typ == '<':
-            return self.interp_lt()
-        elif self.a.typ == '>=':
-            return self.interp_gte()
-        elif self.a.typ == '<=':
-            return self.interp_lte()
-        elif self.a.typ == '!':
-            return self.interp_not()
-        elif self.a.typ == '&&':
-            return self.interp_and()
-        elif self.a.typ == '||':
-            return self.interp_or()
-        elif self.a.typ in ['--', '++']:
-            return self.interp_incr_or_decr()
-
-        raise SyntaxError(f'unknown operation {self.a.typ}')
-
-    def interp_var(self):
-        if self.a.children[0] not in self.variables:
-            self.variables[self.a.children[0]] = float(0)
-
-        value = self.variables[self.a.children[0]]
-        if self.a.post_op:
-            Interpreter(self.a.post_op, self.variables).execute()
-        return value
-
-    def interp_plus(self):
-        return Interpreter(self.a.children[0], self.variables).execute() + Interpreter(self.a.children[1], self.variables).execute()
-
-    def interp_minus(self):
-        if len(self.a.children) == 1:
-            return -Interpreter(self.a.children[0], self.variables).execute()
-
-        return Interpreter(self.a.children[0], self.variables).execute() - Interpreter(self.a.children[1], self.variables).execute()
-
-    def interp_times(self):
-        return Interpreter(self.a.children[0], self.variables).execute() * Interpreter(self.a.children[1], self.variables).execute()
-
-    def interp_divide(self):
-        right = Interpreter(self.a.children[1], self.variables).execute()
-        if right in [0, None, 0.0]:
-            raise ZeroDivisionError('divide by zero')
-        return Interpreter(self.a.children[0], self.variables).execute() / right
-
-    def interp_mod(self):
-        right = Interpreter(self.a.children[1], self.variables).execute()
-        if right in [0, None, 0.0]:
-            raise ZeroDivisionError('divide by zero')
-        left = Interpreter(self.a.children[0], self.variables).execute()
-
-        return left - (right * int(left/right))
-        # return left % right
-
-    def interp_pow(self):
-        return Interpreter(self.a.children[0], self.variables).execute() ** Interpreter(self.a.children[1], self.variables).execute()
-
-    def interp_not(self):
-        return self.bool_to_int(not Interpreter(self.a.children[0], self.variables).execute())
-
-    def interp_and(self):
-        return self.bool_to_int(Interpreter(self.a.children[0], self.variables).execute() and Interpreter(self.a.children[1], self.variables).execute())
-
-    def interp_or(self):
-        return self.bool_to_int(Interpreter(self.a.children[0], self.variables).execute() or Interpreter(self.a.children[1], self.variables).execute())
-
-    def interp_incr_or_decr(self):
-        if len(self.a.children) != 1:
-            raise SyntaxError(f'expected 1 child, got {len(self.a.children)}')
-
-        if self.a.children[0].typ != 'var':
+        """
+        Walks the tree with an explicit stack of pending work instead of
+        recursing, so any depth of tree evaluates in bounded Python stack.
+        Items on the stack are either nodes to evaluate or (step, node)
+        pairs to run once the operands they need are on `results`.
+
+        Function calls run on the same stack: a call pushes a frame marker
+        and then the statements of the body, and a return drops whatever
+        is left of the body down to its frame, so recursion does not
+        recurse either. Pure functions use the FunctionTable's caches.
+
+        >>> Interpreter(Parsor('1' + ' + x++' * 10000).execute(), {}).execute()
+        49995001.0
+        >>> Interpreter(Parsor('0 && 1 / 0 || !(2 < 1)').execute(), {}).execute()
+        1
+        >>> variables = {}
+        >>> Interpreter(Parsor('x + 1').execute(), variables).execute(), variables
+        (1.0, {})
+        >>> from functions import FunctionTable
+        >>> from statement_parser import StatementParser, BlockCollector
+        >>> functions = FunctionTable(None)
+        >>> blocks = BlockCollector()
+        >>> for line in ['define count(n) {', 'if (n == 0) return 0', 'calls++', 'return count(n - 1) + 1', '}']:
+        ...     statement = blocks.add(StatementParser(line, False).parse())
+        >>> functions.define(statement)
+        >>> variables = {'n': 7.0}
+        >>> Interpreter(Parsor('count(5000)').execute(), variables, functions).execute()
+        5000.0
+        >>> variables
+        {'n': 7.0, 'calls': 5000.0}
+        """
+        variables = self.variables
+        results = []
+        push = results.append
+        pop = results.pop
+        tasks = [self.a]
+
+        while tasks:
+            a = tasks.pop()
+
+            if type(a) is tuple:
+                step, a = a
+                if step == 'apply':
+                    if len(a.children) == 1:
+                        results[-1] = -results[-1]
+                    else:
+                        # Operands were evaluated left first, except for / and %
+                        second = pop()
+                        first = results[-1]
+                        if a.typ in self.divisor_first:
+                            results[-1] = self.binary[a.typ](second, first)
+                        else:
+                            results[-1] = self.binary[a.typ](first, second)
+                elif step == 'divisor':
+                    if results[-1] in [0, None, 0.0]:
+                        raise ZeroDivisionError('divide by zero')
+                elif step == '&&' or step == '||':
+                    left = pop()
+                    if (step == '&&') != bool(left):
+                        push(0 if step == '&&' else 1)
+                    else:
+                        tasks.append(('bool', a))
+                        tasks.append(a.children[1])
+                elif step == 'bool':
+                    results[-1] = 1 if results[-1] else 0
+                elif step == '!':
+                    results[-1] = 0 if results[-1] else 1
+                elif step == 'assign':
+                    variables[a.children[0].children[0]] = results[-1]
+                elif step == 'call':
+                    self.call(a, tasks, results)
+                elif step == 'statement':
+                    self.statement(a, tasks)
+                elif step == 'store':
+                    variables[a['variable']] = pop()
+                elif step == 'print':
+                    self.print_items(a, results)
+                elif step == 'if':
+                    if pop():
+                        tasks.extend(('statement', statement) for statement in reversed(a['body']))
+                elif step == 'return':
+                    value = pop()
+                    while tasks[-1][0] != 'frame':
+                        tasks.pop()
+                    self.finish(tasks.pop()[1], value, results)
+                elif step == 'frame':
+                    self.finish(a, float(0), results)
+                else:
+                    # The value of a post increment is the one before it
+                    pop()
+                continue
+
+            typ = a.typ
+            if typ in ['fl', 'bool']:
+                push(a.children[0])
+            elif typ == 'var':
+                # Reading a variable never set gives zero, without setting it
+                push(variables.get(a.children[0], float(0)))
+                if a.post_op:
+                    tasks.append(('discard', a))
+                    tasks.append(a.post_op)
+            elif typ in incr_or_decr_symbols:
+                push(self.interp_incr_or_decr(a))
+            elif typ == 'call':
+                tasks.append(('call', a))
+                tasks.extend(reversed(a.children[1:]))
+            elif typ == '&&' or typ == '||' or typ == '!':
+                # A binary ! only looks at its left operand
+                tasks.append((typ, a))
+                tasks.append(a.children[0])
+            elif typ == '=':
+                if len(a.children) != 2 or a.children[0].typ != 'var':
+                    raise SyntaxError('Invalid assignment syntax')
+                tasks.append(('assign', a))
+                tasks.append(a.children[1])
+            elif typ in self.divisor_first:
+                tasks.append(('apply', a))
+                tasks.append(a.children[0])
+                tasks.append(('divisor', a))
+                tasks.append(a.children[1])
+            elif (typ in self.binary and len(a.children) == 2) or (typ == '-' and len(a.children) == 1):
+                tasks.append(('apply', a))
+                tasks.extend(reversed(a.children))
+            else:
+                raise SyntaxError(f'unknown operation {typ}')
+
+        return results[-1]
+
+    binary = {
+        '+': lambda left, right: left + right,
+        '-': lambda left, right: left - right,
+        '*': lambda left, right: left * right,
+        '/': lambda left, right: left / right,
+        '%': lambda left, right: left - (right * int(left/right)),
+        '^': lambda left, right: left ** right,
+        '==': lambda left, right: 1 if left == right else 0,
+        '!=': lambda left, right: 1 if left != right else 0,
+        '>': lambda left, right: 1 if left > right else 0,
+        '<': lambda left, right: 1 if left < right else 0,
+        '>=': lambda left, right: 1 if left >= right else 0,
+        '<=': lambda left, right: 1 if left <= right else 0,
+    }
+    # The divisor is evaluated, and checked for zero, before the dividend
+    divisor_first = ['/', '%']
+
+    def interp_incr_or_decr(self, a):
+        if len(a.children) != 1:
+            raise SyntaxError(f'expected 1 child, got {len(a.children)}')
+
+        if a.children[0].typ != 'var':
             raise SyntaxError(
-                f'expected variable, got {self.a.children[0].typ}'
+                f'expected variable, got {a.children[0].typ}'
             )
 
-        variable = self.a.children[0].children[0]
+        variable = a.children[0].children[0]
 
         if variable not in self.variables:
             self.variables[variable] = float(0)
 
-        if self.a.typ == '++':
+        if a.typ == '++':
             self.variables[variable] += 1
-        elif self.a.typ == '--':
+        elif a.typ == '--':
             self.variables[variable] -= 1
         else:
-            raise SyntaxError(f'unknown operation {self.a.children[1]}')
+            raise SyntaxError(f'unknown operation {a.children[1]}')
 
         return self.variables[variable]
 
-    def interp_eq(self):
-        return self.bool_to_int(Interpreter(self.a.children[0], self.variables).execute() == Interpreter(self.a.children[1], self.variables).execute())
-
-    def interp_neq(self):
-        return self.bool_to_int(Interpreter(self.a.children[0], self.variables).execute() != Interpreter(self.a.children[1], self.variables).execute())
-
-    def interp_gt(self):
-        return self.bool_to_int(Interpreter(self.a.children[0], self.variables).execute() > Interpreter(self.a.children[1], self.variables).execute())
-
-    def interp_lt(self):
-        return self.bool_to_int(Interpreter(self.a.children[0], self.variables).execute() < Interpreter(self.a.children[1], self.variables).execute())
-
-    def interp_gte(self):
-        return self.bool_to_int(Interpreter(self.a.children[0], self.variables).execute() >= Interpreter(self.a.children[1], self.variables).execute())
-
-    def interp_lte(self):
-        return self.bool_to_int(Interpreter(self.a.children[0], self.variables).execute() <= Interpreter(self.a.children[1], self.variables).execute())
-
-    def interp_assign(self):
-        if len(self.a.children) != 2 or self.a.children[0].typ != 'var':
-            raise SyntaxError('Invalid assignment syntax')
-
-        variable = self.a.children[0].children[0]
-        value = Interpreter(self.a.children[1], self.variables).execute()
+    def call(self, a, tasks, results):
+        name = a.children[0]
+        count = len(a.children) - 1
+        if self.functions is None:
+            raise RuntimeError(f'function {name} not defined')
+        function = self.functions.function(name, count)
+
+        args = results[len(results) - count:]
+        del results[len(results) - count:]
+        key = None
+        if name in self.functions.pure:
+            key = function.key(args)
+            cache = self.functions.caches[name]
+            if key in cache:
+                self.functions.hits += 1
+                cache.move_to_end(key)
+                results.append(cache[key])
+                return
+            self.functions.misses += 1
+
+        # Dynamic scope: the locals' old values come back on return
+        names = function.params + function.autos
+        saved = [(name, self.variables.get(name, missing)) for name in names]
+        for i, name in enumerate(names):
+            self.variables[name] = args[i] if i < count else float(0)
+
+        tasks.append(('frame', (function, key, saved)))
+        tasks.extend(('statement', statement) for statement in reversed(function.body))
+
+    def finish(self, frame, value, results):
+        function, key, saved = frame
+        for name, old in saved:
+            if old is missing:
+                del self.variables[name]
+            else:
+                self.variables[name] = old
+
+        if key is not None:
+            self.functions.remember(function.name, key, value)
+        results.append(value)
+
+    def statement(self, statement, tasks):
+        typ = statement['type']
+        if typ == 'print':
+            tasks.append(('print', statement))
+            tasks.extend(reversed([item for item in statement['value'] if isinstance(item, ast)]))
+        elif typ == 'if':
+            tasks.append(('if', statement))
+            tasks.append(statement['condition'])
+        elif typ == 'assign':
+            tasks.append(('store', statement))
+            tasks.append(statement['value'])
+        elif typ == 'return':
+            tasks.append(('return', statement))
+            tasks.append(statement['value'])
+        else:
+            tasks.append(('discard', statement))
+            tasks.append(statement['value'])
 
-        self.variables[variable] = value
+    def print_items(self, statement, results):
+        count = sum(1 for item in statement['value'] if isinstance(item, ast))
+        values = iter(results[len(results) - count:])
+        del results[len(results) - count:]
+        printed = [item if isinstance(item, str) else next(values) for item in statement['value']]
+        self.functions.write(printed)
 
-        return value
 
-    def bool_to_int(self, b):
-        return 1 if b else 0
+# A local that had no value before a call
+missing = object()
@@ -1,3 +1,4 @@
+import re
 from typing import Any
 from constants import (
     single_len_symbols,
@@ -16,7 +17,34 @@ from constants import (
 )
 
 
+# One alternative per token class. The scanner takes whichever group matched
+# instead of testing characters one by one.
+token_pattern = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<fl>\d[\d.]*)
+  | (?P<word>[^\W\d]\w*)
+  | (?P<sym>&&=?|\|\|=?|\+\+|--|==|<=|>=|[-+*/%^!]=|[-+*/%^()<>!=,{}])
+  | (?P<error>.)
+""", re.VERBOSE)
+
+# The same tokens in bytes-like text, such as a line of a mapped file. A
+# symbol maps back to its str, so only names and numbers are decoded.
+byte_token_pattern = re.compile(token_pattern.pattern.encode(), re.VERBOSE)
+byte_symbols = {
+    symbol.encode(): symbol
+    for symbol in [
+        '&&', '&&=', '||', '||=', '++', '--', '==', '<=', '>=',
+        *[op + '=' for op in '-+*/%^!'], *'-+*/%^()<>!=,{}',
+    ]
+}
+
+# ++ and -- may not directly follow one of these without whitespace in between
+incr_or_decr_blockers = frozenset(["-", "+", "--", "++"])
+
+
 class token():
+    __slots__ = ('typ', 'val')
+
     typ: str
     val: str
 
@@ -33,94 +61,76 @@ class token():
 
 
 class Lexer(object):
-    def __init__(self, s: str) -> None:
-        self.tokens = []
-        self.i = 0
+    def __init__(self, s) -> None:
+        # str, or bytes-like text with names and numbers in ASCII
         self.s = s
 
     def execute(self) -> list[token]:
-        while self.i < len(self.s):
-            if self.s[self.i].isspace():
-                self.evaluate_space()
-            elif self.s[self.i].isalpha():
-                self.evaluate_alpha()
-            elif self.s[self.i].isdigit():
-                self.evaluate_digit()
-            elif self.s[self.i:self.i+2] in boolean_symbols:
-                self.evaluate_boolean_symbol()
-            elif self.s[self.i] == '!':
-                self.evaluate_symbol()
-            elif self.s[self.i:self.i+2] in double_len_symbols:
-                self.evaluate_double_symbol()
-            elif self.s[self.i] in single_len_symbols:
-                self.evaluate_symbol()
-            else:
-                raise SyntaxError(f'unexpected character {self.s[self.i]}')
-
-        return [token for token in self.tokens if token.typ != 'space']
-
-    def evaluate_space(self):
         """
-        >>> lexer = Lexer('3 + 4')
-        >>> lexer.execute()
+        >>> Lexer('3 + 4').execute()
         [token('fl', '3'), token('sym', '+'), token('fl', '4')]
-        >>> lexer.tokens
-        [token('fl', '3'), token('space', ' '), token('sym', '+'), token('space', ' '), token('fl', '4')]
+        >>> Lexer('x++ && !--_y1').execute()
+        [token('var', 'x'), token('sym', '++'), token('sym', '&&'), token('sym', '!'), token('sym', '--'), token('var', '_y1')]
+        >>> [t.val for t in Lexer('x -= y == 1, b &&= c').execute()]
+        ['x', '-=', 'y', '==', '1', ',', 'b', '&&=', 'c']
+        """
+        return list(self.scan())
+
+    def scan(self):
+        """
+        Yields tokens lazily; whitespace separates tokens but is never
+        yielded. Identifiers are validated here, so a 'var' token is always
+        a legal variable name.
+
+        >>> tokens = Lexer('1 + __ + 2').scan()
+        >>> next(tokens), next(tokens)
+        (token('fl', '1'), token('sym', '+'))
+        >>> next(tokens)
+        Traceback (most recent call last):
+        ...
+        SyntaxError: parse error
+        >>> list(Lexer('1+--x').scan())
+        Traceback (most recent call last):
+        ...
+        SyntaxError: unexpected symbol --
+        >>> list(Lexer(memoryview(b'x1 &&= 2.5')).scan())
+        [token('var', 'x1'), token('sym', '&&='), token('fl', '2.5')]
         """
-        self.tokens.append(token('space', " "))
-        self.i += 1
-
-    def evaluate_alpha(self):
-        end = self.i + 1
-        while end < len(self.s) and (self.s[end].isalnum() or self.s[end] == '_'):
-            end += 1
-        assert end >= len(self.s) or not (
-            self.s[end].isalnum() or self.s[end] == '_')
-
-        word = self.s[self.i:end]
-
-        if word in keywords:
-            self.tokens.append(token('kw', word))
-        else:
-            self.tokens.append(token('var', word))
-
-        self.i = end
-
-    def evaluate_digit(self):
-        end = self.i + 1
-        while end < len(self.s) and (self.s[end] == '.' or self.s[end].isdigit()):
-            end += 1
-        assert end >= len(self.s) or not (
-            self.s[end] == '.' or self.s[end].isdigit())
-
-        self.tokens.append(token('fl', self.s[self.i:end]))
-
-        self.i = end
-
-    def evaluate_boolean_symbol(self):
-        self.tokens.append(token('sym', self.s[self.i:self.i+2]))
-        self.i += 2
-
-    def evaluate_symbol(self):
-        self.tokens.append(token('sym', self.s[self.i]))
-        self.i += 1
-
-    def evaluate_double_symbol(self):
-        if (self.s[self.i:self.i+2] == '++' or self.s[self.i:self.i+2] == '--'):
-            symbol = self.s[self.i:self.i+2]
-            if self.tokens and self.tokens[-1].typ == 'var':
-                # If the previous token is a variable, this is a post-sym operator
-                self.tokens.append(token('sym', symbol))
-                self.i += 2
-            elif not self.tokens or self.tokens[-1].typ == 'space' or self.tokens[-1].val not in ["-", "+", '--', '++']:
-                # If the previous token is a space, we can safely assume the next token is a variable
-                self.tokens.append(token('sym', symbol))
-                self.i += 2
+        previous = None
+        spaced = False
+        text = isinstance(self.s, str)
+
+        for match in (token_pattern if text else byte_token_pattern).finditer(self.s):
+            kind = match.lastgroup
+
+            if kind == 'space':
+                spaced = True
+                continue
+
+            val = match.group()
+            if not text:
+                val = byte_symbols[val] if kind == 'sym' else val.decode('latin-1')
+
+            if kind == 'sym':
+                if (
+                    val in incr_or_decr_symbols
+                    and previous is not None
+                    and not spaced
+                    and previous.val in incr_or_decr_blockers
+                ):
+                    raise SyntaxError(f'unexpected symbol {val}')
+                previous = token('sym', val)
+            elif kind == 'fl':
+                previous = token('fl', val)
+            elif kind == 'word':
+                if val in keywords:
+                    previous = token('kw', val)
+                elif val.isascii() and val.strip('_'):
+                    previous = token('var', val)
+                else:
+                    raise SyntaxError('parse error')
             else:
-                # Otherwise, we raise error?
-                raise SyntaxError(
-                    f'unexpected symbol {self.s[self.i:self.i+2]}'
-                )
-            return
-        self.tokens.append(token('sym', self.s[self.i:self.i+2]))
-        self.i += 2
+                raise SyntaxError(f'unexpected character {val}')
+
+            spaced = False
+            yield previous
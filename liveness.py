@@ -0,0 +1,123 @@
+from parsor import ast, Parsor
+from statement_parser import StatementParser
+from dataflow import accesses, barrier, trees
+from constants import (
+    single_len_symbols,
+    boolean_symbols,
+    double_len_symbols,
+    op_equals_symbols,
+    bool_equals_symbols,
+    assign_symbols,
+    keywords,
+    disj_symbols,
+    conj_symbols,
+    power_symbols,
+    neg_symbols,
+    incr_or_decr_symbols,
+    relational_symbols,
+)
+
+
+# Operators that cannot raise or write anything, whatever their operands
+harmless = ['!', '&&', '||']
+# And the ones that cannot when their operands are all floats or all
+# ints: an int too big for a float overflows when mixed with one, and
+# comparing complex numbers, which ^ can make, raises TypeError
+arithmetic = ['+', '-', '*', '==', '!=', '>', '<', '>=', '<=']
+
+
+def same_kind(types) -> bool:
+    # 0/1 mixes safely with either
+    types = set(types)
+    return None not in types and (types <= {'float', 'bool'} or types <= {'int', 'bool'})
+
+
+def quiet(a: ast, type_of) -> bool:
+    """
+    Whether evaluating a tree can only produce its value: it assigns
+    nothing, has no ++ or --, calls no function and cannot raise.
+    type_of(node) is the type the node is proven to have, 'float', 'int'
+    or 'bool', or None. + - * and comparisons are only quiet on operands
+    of one kind, / only by a nonzero constant and of a float, and % and
+    ^ never are, since they can divide by zero or overflow.
+
+    >>> from optimizer import Optimizer
+    >>> floats = Optimizer().type_of
+    >>> quiet(Parsor('-x < 2 && (y - 1) / 4').execute(), floats)
+    True
+    >>> [quiet(Parsor(text).execute(), floats) for text in ['x / y', 'x / 0', 'x++ + 1', 'x ^ 2', 'f(1)']]
+    [False, False, False, False, False]
+    >>> quiet(Parsor('x * 2').execute(), lambda a: None)
+    False
+    """
+    stack = [a]
+    while stack:
+        a = stack.pop()
+        if a.typ in ['fl', 'bool']:
+            continue
+        if a.typ == 'var':
+            if a.post_op:
+                return False
+            continue
+        if a.typ in harmless or (a.typ == '-' and len(a.children) == 1):
+            stack.extend(a.children)
+            continue
+        if a.typ in arithmetic and same_kind(map(type_of, a.children)):
+            stack.extend(a.children)
+            continue
+        if a.typ == '/' and type_of(a.children[0]) in ['float', 'bool']:
+            divisor = a.children[1]
+            if divisor.typ == 'fl' and divisor.children[0] not in [0, None, 0.0]:
+                stack.append(a.children[0])
+                continue
+        return False
+    return True
+
+
+def dead_statements(statements, quiet: list) -> list:
+    """
+    The indexes of the statements whose results are never observed: an
+    assignment to a variable that is assigned again before anything reads
+    it, or a bare expression, as long as evaluating it is quiet, which
+    quiet[i] says for statement i. Only what is read counts, so a
+    statement that cannot be observed is itself no reason to keep the
+    statements it reads from.
+
+    Every variable is live at the end of the program, so the values it
+    ends with are unchanged. A statement that calls a function keeps
+    every variable live before it, since the function may read any of
+    them. Statements are kept whenever they could raise, so a program
+    still stops at the same point.
+
+    >>> from optimizer import Optimizer
+    >>> def dead(lines):
+    ...     statements = [StatementParser(line, False).parse() for line in lines]
+    ...     return dead_statements(statements, Optimizer().quiet_statements(statements))
+    >>> dead(['x = 1', 'y = x * 2', 'x = 3', 'y = 5', 'z = y / w', 'x + 1', 'print x', 'z = 0'])
+    [0, 1, 5]
+    >>> dead(['x = 1', 'y = f(2)', 'x = 2', 'x = y++', 'x = 3'])
+    [2]
+    """
+    # Variables assigned again, after this point, before anything reads them
+    overwritten = set()
+    dead = []
+    for i in reversed(range(len(statements))):
+        statement = statements[i]
+        if statement['type'] == 'define':
+            continue
+        if barrier(statement):
+            overwritten = set()
+            continue
+
+        typ = statement['type']
+        unobserved = typ == 'eval' or (typ == 'assign' and statement['variable'] in overwritten)
+        if unobserved and quiet[i]:
+            dead.append(i)
+            continue
+
+        reads, _ = accesses(statement)
+        if typ == 'assign':
+            overwritten.add(statement['variable'])
+        overwritten -= reads
+    dead.reverse()
+    return dead
@@ -1,5 +1,12 @@
 import sys
+import argparse
 from statement_evaluator import StatementEvaluator
+from bytecode import disassemble
+from profiler import Profiler
+from dataflow import DataflowScheduler
+from cache import ParseCache
+from output import OutputWriter
+from mapped_file import MappedFile
 from constants import (
     single_len_symbols,
     boolean_symbols,
@@ -17,9 +24,161 @@ from constants import (
 )
 
 
+def main(argv=None):
+    argparser = argparse.ArgumentParser(description='Calculator Programming Language')
+    argparser.add_argument(
+        'file', nargs='?',
+        help='read the program from FILE through mmap instead of from stdin'
+    )
+    argparser.add_argument(
+        '--engine', choices=StatementEvaluator.engines, default='closure',
+        help='execution engine used to evaluate statements'
+    )
+    argparser.add_argument(
+        '-O', '--optimize', action='store_true',
+        help='fold constant subexpressions and simplify identities before '
+             'evaluating, and with the whole program parsed first, skip '
+             'statements whose results are never observed; the number of '
+             'eliminated nodes and statements goes to stderr'
+    )
+    argparser.add_argument(
+        '--memoize', action='store_true',
+        help='share repeated subexpressions between statements and reuse '
+             'the value of a pure one until a variable it reads is '
+             'assigned; hit and miss counts go to stderr'
+    )
+    argparser.add_argument(
+        '--parse-first', action='store_true',
+        help='parse the whole program before evaluating any of it, so a '
+             'parse error anywhere prints nothing but "parse error"'
+    )
+    argparser.add_argument(
+        '--exact', action='store_true',
+        help='keep literals without a decimal point as exact integers, '
+             'falling back to floats only when a result is not integral'
+    )
+    argparser.add_argument(
+        '--parallel', type=int, metavar='WORKERS',
+        help='parse the whole program first, then run independent, '
+             'expensive statements concurrently in WORKERS processes'
+    )
+    argparser.add_argument(
+        '--no-cache', action='store_true',
+        help='always parse; by default a whole-program parse (--parse-first, '
+             '--parallel) is reused from a cache keyed by the script\'s '
+             'content, unless --profile is given'
+    )
+    argparser.add_argument(
+        '--cache-dir',
+        help='where cached parses live (default: $BC_CACHE_DIR or ~/.cache/bc)'
+    )
+    argparser.add_argument(
+        '--disassemble', action='store_true',
+        help='print the bytecode of every statement instead of running it'
+    )
+    argparser.add_argument(
+        '--flush', choices=OutputWriter.policies,
+        help='when output is written: after every line, once 64KiB is '
+             'buffered, or only at the end of the run (default: line on a '
+             'terminal, size otherwise)'
+    )
+    argparser.add_argument(
+        '--profile', nargs='?', const='-', metavar='FILE',
+        help='time parsing and evaluation per phase, line and operator; a '
+             'summary goes to stderr and collapsed stacks for a flamegraph '
+             'go to FILE, or to stderr when no FILE is given'
+    )
+    args = argparser.parse_args(argv)
+    if args.memoize and args.engine != 'closure':
+        argparser.error('--memoize needs the closure engine')
+
+    if args.file:
+        try:
+            source = MappedFile(args.file)
+        except OSError as e:
+            argparser.error(str(e))
+        # A mapped file can be read again, so even a whole-program parse
+        # never holds its text
+        with source:
+            run(args, source)
+        return
+
+    if args.parse_first or args.disassemble or args.parallel:
+        statements = []
+        for line in sys.stdin:
+            if line:
+                statements.append(line.strip())
+    else:
+        statements = sys.stdin
+    run(args, statements)
+
+
+def run(args, statements):
+    flush = args.flush or ('line' if sys.stdout.isatty() else 'size')
+    evaluator = StatementEvaluator(
+        statements, engine=args.engine, optimize=args.optimize,
+        exact=args.exact, flush=flush, memoize=args.memoize
+    )
+
+    if args.disassemble:
+        try:
+            evaluator.parse()
+        except (SyntaxError, ValueError):
+            print("parse error")
+            return
+        assembler = evaluator.assembler
+        for i, statement in enumerate(evaluator.parsed_statements):
+            print(f'statement {i}:')
+            if statement['type'] == 'define':
+                # Function bodies always run as closures
+                print(f"define {statement['name']}({', '.join(statement['params'])})")
+                continue
+            print(disassemble(assembler.compile(statement)))
+        return
+
+    # A cached parse skips parse_statement, where the profiler learns
+    # which line each statement came from
+    if (args.parse_first or args.parallel) and not args.no_cache and not args.profile:
+        evaluator.cache = ParseCache(args.cache_dir)
+
+    if args.parallel:
+        evaluator.scheduler = DataflowScheduler(workers=args.parallel)
+
+    profiler = None
+    if args.profile:
+        profiler = Profiler()
+        profiler.install(evaluator)
+
+    try:
+        if args.parse_first or args.parallel:
+            evaluator.execute()
+        else:
+            evaluator.execute_streaming()
+    finally:
+        if profiler:
+            profiler.uninstall()
+
+    if profiler:
+        sys.stderr.write(profiler.report())
+        if args.profile == '-':
+            sys.stderr.write(profiler.collapsed())
+        else:
+            with open(args.profile, 'w') as f:
+                f.write(profiler.collapsed())
+
+    if evaluator.optimizer:
+        print(
+            f'optimizer: eliminated {evaluator.optimizer.eliminated} nodes, '
+            f'{evaluator.optimizer.dead_statements} dead statements',
+            file=sys.stderr
+        )
+
+    if evaluator.memo:
+        print(
+            f'memo: {evaluator.memo.hits} hits, {evaluator.memo.misses} misses',
+            file=sys.stderr
+        )
+
+
 if __name__ == '__main__':
-    statements = []
-    for line in sys.stdin:
-        if line:
-            statements.append(line.strip())
-    StatementEvaluator(statements).execute()
+    main()
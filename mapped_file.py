@@ -0,0 +1,104 @@
+import re
+import mmap
+from constants import (
+    single_len_symbols,
+    boolean_symbols,
+    double_len_symbols,
+    op_equals_symbols,
+    bool_equals_symbols,
+    assign_symbols,
+    keywords,
+    disj_symbols,
+    conj_symbols,
+    power_symbols,
+    neg_symbols,
+    incr_or_decr_symbols,
+    relational_symbols,
+)
+
+
+# A line without its surrounding whitespace, as group 1, and its newline
+line_pattern = re.compile(rb'[^\S\n]*([^\n]*?)\s*?(?:\n|\Z)')
+byte_content = re.compile(rb'\S(?:.*\S)?', re.DOTALL)
+
+
+def strip(line):
+    """
+    Like str.strip, but a memoryview comes back as a narrower view of the
+    same buffer instead of a copy.
+
+    >>> strip('  x = 1 '), bytes(strip(memoryview(b' print x\\t'))), bytes(strip(memoryview(b'  ')))
+    ('x = 1', b'print x', b'')
+    """
+    if not isinstance(line, memoryview):
+        return line.strip()
+    match = byte_content.search(line)
+    if match is None:
+        return line[:0]
+    return line[match.start():match.end()]
+
+
+class MappedFile(object):
+    """
+    The lines of a file, read through mmap. Iterating yields each line as
+    a memoryview slice of the mapping, without its surrounding whitespace,
+    so nothing is copied until the lexer turns a name or a number into a
+    string. The kernel pages the file in as it is read, and every
+    release_every bytes the pages already read are dropped from the
+    process, so a file of any size needs little resident memory. A slice
+    kept from before that point stays valid: reading it pages it back in.
+
+    Iterating again starts over from the first line.
+
+    >>> import tempfile
+    >>> with tempfile.NamedTemporaryFile(suffix='.bc') as f:
+    ...     _ = f.write(b'x = 1\\n\\n  print x  \\r\\nprint 2')
+    ...     f.flush()
+    ...     with MappedFile(f.name) as source:
+    ...         [bytes(line) for line in source]
+    [b'x = 1', b'', b'print x', b'print 2']
+    """
+
+    release_every = 64 * 2**20
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            try:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # An empty file cannot be mapped
+                self.map = b''
+        if hasattr(self.map, 'madvise'):
+            self.map.madvise(mmap.MADV_SEQUENTIAL)
+        self.view = memoryview(self.map)
+
+    def __iter__(self):
+        view = self.view
+        size = len(view)
+        release = hasattr(mmap, 'MADV_DONTNEED') and isinstance(self.map, mmap.mmap)
+        released = 0
+        for match in line_pattern.finditer(view):
+            start = match.start()
+            if start == size:
+                return
+            if release and start - released >= self.release_every:
+                end = start - start % mmap.PAGESIZE
+                self.map.madvise(mmap.MADV_DONTNEED, released, end - released)
+                released = end
+            yield view[match.start(1):match.end(1)]
+
+    def close(self):
+        self.view.release()
+        if isinstance(self.map, mmap.mmap):
+            try:
+                self.map.close()
+            except BufferError:
+                # A statement still holds a slice; the mapping goes with it
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
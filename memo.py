@@ -0,0 +1,135 @@
+from operator import itemgetter
+from parsor import ast
+from environment import Environment
+from constants import (
+    single_len_symbols,
+    boolean_symbols,
+    double_len_symbols,
+    op_equals_symbols,
+    bool_equals_symbols,
+    assign_symbols,
+    keywords,
+    disj_symbols,
+    conj_symbols,
+    power_symbols,
+    neg_symbols,
+    incr_or_decr_symbols,
+    relational_symbols,
+)
+
+
+class Memo(object):
+    """
+    Remembers the value of pure subexpressions, ones without ++, -- or an
+    assignment anywhere inside, between evaluations. An entry is keyed on
+    the node and on the versions of the variables the node reads, so it
+    stops matching as soon as one of them is assigned.
+
+    The Compiler asks for every node it compiles. Only nodes with at least
+    min_operations operators are remembered, and with an InternTable only
+    the ones that occur more than once, since nothing else can hit. The
+    closure of a node that occurs more than once is kept too, so the
+    Compiler does not build it again.
+
+    Every write to the environment must bump the slot's entry in
+    environment.versions, which the Compiler and StatementEvaluator do
+    while a memo is in use.
+
+    >>> from compiler import Compiler
+    >>> from interning import InternTable
+    >>> environment = Environment()
+    >>> table = InternTable()
+    >>> memo = Memo(environment, table)
+    >>> compiler = Compiler(environment, memo=memo)
+    >>> environment.update({'a': 2.0, 'b': 3.0})
+    >>> for line in ['a * b + 1', 'a * b + 1 + a', 'a * b + 1', 'a++ * (a * b + 1)', 'a * b + 1']:
+    ...     print(compiler.compile(table.parsor(line).execute())(environment.values))
+    7.0
+    9.0
+    7.0
+    20.0
+    10.0
+    >>> memo.hits, memo.misses
+    (2, 2)
+    """
+
+    min_operations = 2
+
+    def __init__(self, environment: Environment, table=None):
+        self.environment = environment
+        self.table = table
+        # id(node) -> (node, slots read or None if impure, operator count)
+        self.info = {}
+        # id(node) -> (versions of the slots read, value)
+        self.entries = {}
+        # id(node) -> its compiled closure
+        self.closures = {}
+        self.hits = 0
+        self.misses = 0
+
+    def describe(self, a: ast):
+        """
+        The slots a node reads, or None when it is not pure, and how many
+        operators it holds. Children are described before their parents
+        because the Compiler compiles them first.
+        """
+        described = self.info.get(id(a))
+        if described is not None:
+            return described[1], described[2]
+
+        if a.typ == 'var':
+            if a.post_op:
+                slots, operations = None, 0
+            else:
+                slots, operations = (self.environment.slot(a.children[0]),), 0
+        elif a.typ in ['fl', 'bool']:
+            slots, operations = (), 0
+        elif a.typ in incr_or_decr_symbols or a.typ in ['=', 'call']:
+            # A call may read or write any variable; pure functions keep
+            # their own cache of results
+            slots, operations = None, 0
+        else:
+            slots, operations = set(), 1
+            for child in a.children:
+                described = self.info.get(id(child))
+                if described is None or described[1] is None:
+                    # Impure, or compiled as bytecode without asking
+                    slots = None
+                    break
+                slots.update(described[1])
+                operations += described[2]
+            if slots is not None:
+                slots = tuple(sorted(slots))
+
+        self.info[id(a)] = (a, slots, operations)
+        return slots, operations
+
+    def memoize(self, a: ast, closure):
+        slots, operations = self.describe(a)
+        if self.table is not None and id(a) not in self.table.shared:
+            return closure
+        if slots is None or operations < self.min_operations:
+            self.closures[id(a)] = closure
+            return closure
+
+        memo = self
+        entries = self.entries
+        node = id(a)
+        versions = self.environment.versions
+        if not slots:
+            key_of = None
+        else:
+            key_of = itemgetter(*slots)
+
+        def memoized(values):
+            key = key_of(versions) if key_of else None
+            entry = entries.get(node)
+            if entry is not None and entry[0] == key:
+                memo.hits += 1
+                return entry[1]
+            memo.misses += 1
+            value = closure(values)
+            entries[node] = (key, value)
+            return value
+        self.closures[id(a)] = memoized
+        return memoized
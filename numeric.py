@@ -0,0 +1,98 @@
+"""
+Arithmetic for exact mode, where literals without a decimal point are
+Python ints and stay ints for as long as every operand is integral.
++, -, * and comparisons need nothing special; /, % and ^ pick a handler
+by the types of their operands and fall back to the float behaviour as
+soon as one of them is not an int.
+"""
+
+# Past this many result bits, int ^ int falls back to float and overflows
+# the same way it does in float mode instead of building a huge int.
+max_power_bits = 1 << 20
+
+
+def parse_literal(literal: str, exact: bool):
+    """
+    >>> parse_literal('12', True), parse_literal('12', False), parse_literal('1.5', True)
+    (12, 12.0, 1.5)
+    """
+    if exact and '.' not in literal:
+        return int(literal)
+    return float(literal)
+
+
+def float_divide(left, right):
+    return left / right
+
+
+def float_mod(left, right):
+    return left - (right * int(left/right))
+
+
+def float_power(left, right):
+    return left ** right
+
+
+def int_divide(left: int, right: int):
+    """
+    >>> int_divide(2 ** 70, 2), int_divide(7, 2)
+    (590295810358705651712, 3.5)
+    """
+    quotient, remainder = divmod(left, right)
+    if remainder:
+        return left / right
+    return quotient
+
+
+def int_mod(left: int, right: int) -> int:
+    """
+    Truncating remainder, like float_mod but without the round trip
+    through a float quotient.
+
+    >>> int_mod(-7, 3), float_mod(-7.0, 3.0), int_mod(10 ** 30 + 1, 7)
+    (-1, -1.0, 2)
+    """
+    if left >= 0 and right > 0:
+        return left % right
+    quotient = abs(left) // abs(right)
+    if (left < 0) != (right < 0):
+        quotient = -quotient
+    return left - right * quotient
+
+
+def int_power(left: int, right: int):
+    """
+    >>> int_power(2, 64), int_power(2, -1)
+    (18446744073709551616, 0.5)
+    """
+    if right < 0 or left in [0, 1, -1]:
+        return left ** right
+    if right * left.bit_length() > max_power_bits:
+        return float(left) ** float(right)
+    return left ** right
+
+
+divide_handlers = {(int, int): int_divide}
+mod_handlers = {(int, int): int_mod}
+power_handlers = {(int, int): int_power}
+
+
+def exact_divide(left, right):
+    return divide_handlers.get((type(left), type(right)), float_divide)(left, right)
+
+
+def exact_mod(left, right):
+    return mod_handlers.get((type(left), type(right)), float_mod)(left, right)
+
+
+def exact_power(left, right):
+    return power_handlers.get((type(left), type(right)), float_power)(left, right)
+
+
+def operators(exact: bool):
+    """
+    The divide, mod and power handlers for the chosen numeric mode.
+    """
+    if exact:
+        return exact_divide, exact_mod, exact_power
+    return float_divide, float_mod, float_power
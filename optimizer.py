@@ -0,0 +1,351 @@
+import math
+from parsor import ast, Parsor
+from compiler import Compiler
+from environment import Environment
+from statement_parser import StatementParser
+from functions import calls, statement_trees
+from liveness import dead_statements, quiet
+from constants import (
+    single_len_symbols,
+    boolean_symbols,
+    double_len_symbols,
+    op_equals_symbols,
+    bool_equals_symbols,
+    assign_symbols,
+    keywords,
+    disj_symbols,
+    conj_symbols,
+    power_symbols,
+    neg_symbols,
+    incr_or_decr_symbols,
+    relational_symbols,
+)
+
+
+class Optimizer(object):
+    """
+    Folds constant subtrees and applies identities that cannot change what
+    gets printed. Statements must be optimized in program order, because
+    the pass tracks the type each assignment leaves in its variable: an
+    identity like x * 1 -> x is only applied when x is known to hold a
+    float, since an int x would print differently once multiplied by 1.0.
+
+    Subtrees that raise when folded, such as 1/0, are left alone so they
+    still raise at the same point at run time.
+
+    >>> optimizer = Optimizer()
+    >>> optimizer.optimize(StatementParser('x = (2 ^ 10) * 3 - 1', False).parse())
+    {'type': 'assign', 'variable': 'x', 'value': ast('fl', 3071.0)}
+    >>> optimizer.optimize(StatementParser('print 1 * x - 0, 2 + y / 1, 1 / 0', False).parse())
+    {'type': 'print', 'value': [ast('var', 'x'), ast('+', ast('var', 'y'), ast('fl', 2.0)), ast('/', ast('fl', 1.0), ast('fl', 0.0))]}
+    >>> optimizer.optimize(StatementParser('b = x < 1', False).parse())['value']
+    ast('<', ast('var', 'x'), ast('fl', 1.0))
+    >>> optimizer.optimize(StatementParser('print b * 1', False).parse())['value']
+    [ast('*', ast('var', 'b'), ast('fl', 1.0))]
+    >>> optimizer.optimize(StatementParser('x -= 2 * 3', False).parse())['value']
+    ast('+', ast('var', 'x'), ast('fl', -6.0))
+    >>> optimizer.eliminated
+    14
+
+    x - 0 is x, but x - -0.0 is not, since it turns -0.0 into 0.0:
+
+    >>> optimizer.optimize(StatementParser('print x - 0, x - (0 * -1)', False).parse())['value']
+    [ast('var', 'x'), ast('+', ast('var', 'x'), ast('fl', 0.0))]
+
+    In exact mode variables hold ints until proven otherwise, and / and ^
+    can go either way, so x / 1 stays:
+
+    >>> optimizer = Optimizer(exact=True)
+    >>> optimizer.optimize(StatementParser('print 2 ^ 64 / 4, x * 1, x / 1', False, exact=True).parse())['value']
+    [ast('fl', 4611686018427387904), ast('var', 'x'), ast('/', ast('var', 'x'), ast('fl', 1))]
+    >>> optimizer.optimize(StatementParser('print f(1) - 0', False, exact=True).parse())['value']
+    [ast('-', ast('call', 'f', ast('fl', 1)), ast('fl', 0))]
+
+    A function can assign any variable, so from the first statement that
+    calls one, only types assigned since are known. Calls themselves are
+    never folded, and function bodies are left as they are:
+
+    >>> optimizer.optimize(StatementParser('y = f(2 * 3) * 1 + x * 1', False).parse())['value']
+    ast('+', ast('*', ast('call', 'f', ast('fl', 6.0)), ast('fl', 1.0)), ast('*', ast('var', 'x'), ast('fl', 1.0)))
+
+    Given a whole program, statements whose results are never observed
+    can be dropped as well; see liveness.dead_statements:
+
+    >>> optimizer = Optimizer()
+    >>> optimizer.remove_dead_statements([
+    ...     StatementParser(line, False).parse() for line in ['x = 2', 'x = 3', 'print x']
+    ... ])
+    [{'type': 'assign', 'variable': 'x', 'value': ast('fl', 3.0)}, {'type': 'print', 'value': [ast('var', 'x')]}]
+    >>> optimizer.dead_statements
+    1
+    """
+
+    commutative = ['+', '*']
+    comparisons = ['==', '!=', '>', '<', '>=', '<=', '!', '&&', '||']
+
+    def __init__(self, exact=False, inputs=False):
+        self.exact = exact
+        # Whether variables may start out holding values of any type from
+        # outside, as in Program.run, instead of the mode's zero
+        self.inputs = inputs
+        self.eliminated = 0
+        # Whole statements removed by remove_dead_statements
+        self.dead_statements = 0
+        self.types = {}
+        # Whether a call may have changed variables' types behind our back
+        self.called = False
+        self.compiler = Compiler(Environment(), exact)
+
+    def optimize(self, statement):
+        if statement['type'] == 'define':
+            return statement
+
+        self.learn(statement)
+
+        if statement['type'] == 'print':
+            return {
+                'type': 'print',
+                'value': [
+                    item if isinstance(item, str) else self.optimize_tree(item)
+                    for item in statement['value']
+                ]
+            }
+
+        value = self.optimize_tree(statement['value'])
+
+        if statement['type'] == 'assign':
+            self.types[statement['variable']] = self.type_of(value)
+            return {
+                'type': 'assign',
+                'variable': statement['variable'],
+                'value': value
+            }
+
+        return {'type': statement['type'], 'value': value}
+
+    def learn(self, statement):
+        """
+        Forgets the types a statement can change before its value is
+        known: all of them when it calls a function, and the ones its ++
+        and -- turn from a 0/1 variable into an arbitrary int.
+        """
+        if calls(statement_trees(statement)):
+            self.types = {}
+            self.called = True
+
+        for name in self.incremented(statement):
+            if self.types.get(name) == 'bool':
+                self.types[name] = 'int'
+
+    def quiet_statements(self, statements) -> list:
+        """
+        For each statement of a program, whether evaluating it is quiet,
+        as liveness.quiet decides from the types that can be proven for
+        its operands at that point. The types are worked out again from
+        the start of the program, on an optimizer of their own.
+        """
+        typer = Optimizer(self.exact, self.inputs)
+        flags = []
+        for statement in statements:
+            if statement['type'] == 'define':
+                flags.append(False)
+                continue
+
+            typer.learn(statement)
+            known = {}
+            flags.append(all(
+                quiet(a, lambda node: typer.type_of(node, known))
+                for a in statement_trees(statement)
+            ))
+            if statement['type'] == 'assign':
+                typer.types[statement['variable']] = typer.type_of(statement['value'], known)
+        return flags
+
+    def remove_dead_statements(self, statements):
+        dead = set(dead_statements(statements, self.quiet_statements(statements)))
+        self.dead_statements += len(dead)
+        return [statement for i, statement in enumerate(statements) if i not in dead]
+
+    def incremented(self, statement):
+        trees = statement['value']
+        if statement['type'] != 'print':
+            trees = [trees]
+
+        names = set()
+        stack = [a for a in trees if isinstance(a, ast)]
+        while stack:
+            a = stack.pop()
+            if a.typ in incr_or_decr_symbols:
+                names.add(a.children[0].children[0])
+            elif a.post_op:
+                names.add(a.children[0])
+            elif a.typ == 'call':
+                stack.extend(a.children[1:])
+            elif a.typ not in ['fl', 'bool', 'var']:
+                stack.extend(a.children)
+        return names
+
+    def optimize_tree(self, a: ast) -> ast:
+        optimized = self.simplify(a)
+        self.eliminated += self.size(a) - self.size(optimized)
+        return optimized
+
+    def size(self, a) -> int:
+        total = 0
+        stack = [a]
+        while stack:
+            a = stack.pop()
+            if isinstance(a, ast):
+                total += 1
+                stack.append(a.post_op)
+                stack.extend(a.children)
+        return total
+
+    def simplify(self, a: ast) -> ast:
+        """
+        Simplifies children before their parents, from an explicit stack.
+        """
+        # Types of the nodes built so far, shared by every rewrite in the tree
+        known = {}
+        results = []
+        stack = [(a, False)]
+        while stack:
+            a, expanded = stack.pop()
+            if a.typ in ['fl', 'bool', 'var'] or a.typ in incr_or_decr_symbols:
+                results.append(a)
+                continue
+
+            # A call's first child is the function's name
+            operands = a.children[1:] if a.typ == 'call' else a.children
+            if not expanded:
+                stack.append((a, True))
+                stack.extend((child, False) for child in reversed(operands))
+                continue
+
+            children = results[len(results) - len(operands):]
+            del results[len(results) - len(operands):]
+            if a.typ == 'call':
+                results.append(ast('call', a.children[0], *children))
+                continue
+            node = ast(a.typ, *children)
+
+            if all(child.typ == 'fl' for child in node.children):
+                try:
+                    results.append(ast('fl', self.compiler.compile(node)([])))
+                except (ArithmeticError, ValueError, TypeError):
+                    # Leave it to raise at run time, in order
+                    results.append(node)
+                continue
+
+            results.append(self.rewrite(node, known))
+        return results[0]
+
+    def rewrite(self, a: ast, known=None) -> ast:
+        if len(a.children) == 1:
+            child = a.children[0]
+            # - - x and ! ! (x < y)
+            if child.typ == a.typ and len(child.children) == 1:
+                inner = child.children[0]
+                if self.type_of(a, known) == self.type_of(inner, known) is not None:
+                    return inner
+            return a
+
+        left, right = a.children
+
+        # Constants go on the right: 2 + x -> x + 2
+        if a.typ in self.commutative and left.typ == 'fl':
+            left, right = right, left
+            a = ast(a.typ, left, right)
+
+        if right.typ != 'fl':
+            return a
+
+        c = right.children[0]
+        identity = (
+            (a.typ in ['*', '/', '^'] and c == 1)
+            or (a.typ == '-' and c == 0 and math.copysign(1, c) > 0)
+        )
+        # x + 0 is not an identity: -0.0 + 0 is 0.0, and neither is
+        # x - -0.0, which is 0.0 for x = -0.0
+        if identity and self.type_of(a, known) == self.type_of(left, known) is not None:
+            return left
+
+        # x - c -> x + -c, so x -= c and x += c share one form. An int 0
+        # has no sign to flip, and -0.0 - 0 is -0.0 but -0.0 + 0 is 0.0.
+        if a.typ == '-' and (c or isinstance(c, float)):
+            return ast('+', left, ast('fl', -c))
+
+        return a
+
+    def type_of(self, a: ast, known=None):
+        """
+        'float', 'int' or 'bool' when the value's type is certain, None when
+        it depends on run time values. `known` caches the types of nodes
+        already seen, mapping id(node) to (node, type).
+        """
+        if known is None:
+            known = {}
+
+        root = a
+        stack = [a]
+        while stack:
+            a = stack[-1]
+            if id(a) in known:
+                stack.pop()
+                continue
+
+            operands = self.typed_operands(a)
+            missing = [child for child in operands if id(child) not in known]
+            if missing:
+                stack.extend(missing)
+                continue
+
+            stack.pop()
+            known[id(a)] = (a, self.node_type(a, [known[id(child)][1] for child in operands]))
+        return known[id(root)][1]
+
+    def typed_operands(self, a: ast):
+        # The children whose types decide the type of a
+        if a.typ in ['fl', 'bool', 'var', 'call'] or a.typ in self.comparisons:
+            return ()
+        return a.children
+
+    def node_type(self, a: ast, types):
+        if a.typ in ['fl', 'bool']:
+            value = a.children[0]
+            if isinstance(value, bool):
+                return 'bool'
+            if isinstance(value, int):
+                return 'bool' if value in [0, 1] else 'int'
+            if isinstance(value, float):
+                return 'float'
+            return None
+        if a.typ == 'var':
+            if self.called or self.inputs:
+                return self.types.get(a.children[0])
+            return self.types.get(a.children[0], 'int' if self.exact else 'float')
+        if a.typ == 'call':
+            return None
+        if a.typ in incr_or_decr_symbols:
+            variable_type = types[0]
+            return 'int' if variable_type == 'bool' else variable_type
+        if a.typ in self.comparisons:
+            return 'bool'
+
+        if None in types:
+            return None
+
+        if len(types) == 1:
+            return 'int' if types[0] == 'bool' else types[0]
+        if a.typ in ['/', '^'] and self.exact and 'float' not in types:
+            # int / int is an int only when it divides evenly
+            return None
+        if a.typ == '/':
+            return 'float'
+        if a.typ == '^':
+            # float ** integral float stays real
+            right = a.children[1]
+            if types[0] == 'float' and right.typ == 'fl' and float(right.children[0]).is_integer():
+                return 'float'
+            return None
+        return 'float' if 'float' in types else 'int'
@@ -0,0 +1,74 @@
+import sys
+from constants import (
+    single_len_symbols,
+    boolean_symbols,
+    double_len_symbols,
+    op_equals_symbols,
+    bool_equals_symbols,
+    assign_symbols,
+    keywords,
+    disj_symbols,
+    conj_symbols,
+    power_symbols,
+    neg_symbols,
+    incr_or_decr_symbols,
+    relational_symbols,
+)
+
+
+class OutputWriter(object):
+    """
+    Formats print statements the way print() does, values separated by a
+    space, and keeps the text in a buffer that is written to the stream
+    in bulk. When it is written depends on the policy:
+
+    - 'line': after every line, and the stream is flushed too, for a
+      terminal or anything waiting on each answer
+    - 'size': once buffer_size characters are waiting
+    - 'end': only when flush() is called, at the end of the run
+
+    A stream of None is whatever sys.stdout is when the buffer is written.
+
+    >>> writer = OutputWriter(policy='size', buffer_size=12)
+    >>> writer.line([1.0, 'x'])
+    >>> writer.line([])
+    >>> writer.line([2, 3.5])
+    1.0 x
+    <BLANKLINE>
+    2 3.5
+    >>> writer.line([0])
+    >>> writer.flush()
+    0
+    """
+
+    policies = ['line', 'size', 'end']
+
+    def __init__(self, stream=None, policy: str = 'size', buffer_size: int = 2**16):
+        if policy not in self.policies:
+            raise ValueError(f'unknown flush policy {policy}')
+
+        self.stream = stream
+        self.policy = policy
+        self.buffer_size = buffer_size
+        self.pieces = []
+        self.buffered = 0
+
+    def line(self, values):
+        text = ' '.join(map(str, values)) + '\n'
+        self.pieces.append(text)
+        if self.policy == 'line':
+            self.flush()
+        elif self.policy == 'size':
+            self.buffered += len(text)
+            if self.buffered >= self.buffer_size:
+                self.flush()
+
+    def flush(self):
+        stream = self.stream or sys.stdout
+        if self.pieces:
+            text = ''.join(self.pieces)
+            self.pieces = []
+            self.buffered = 0
+            stream.write(text)
+        if self.policy == 'line':
+            stream.flush()
@@ -1,6 +1,7 @@
 from typing import Any
 from lexer import token, Lexer
 from variable_name_checker import VariableNameChecker
+from numeric import parse_literal
 from constants import (
     single_len_symbols,
     boolean_symbols,
@@ -18,6 +19,21 @@ from constants import (
 )
 
 
+assignment_symbols = assign_symbols | op_equals_symbols | bool_equals_symbols
+
+# Binding strength of binary operators; prefix ! and - sit in between
+boolean_precedence = 1
+prefix_not_precedence = 2
+prefix_neg_precedence = 7
+binary_precedence = {
+    **{symbol: boolean_precedence for symbol in boolean_symbols},
+    **{symbol: 3 for symbol in relational_symbols},
+    **{symbol: 4 for symbol in disj_symbols},
+    **{symbol: 5 for symbol in conj_symbols},
+    **{symbol: 6 for symbol in power_symbols},
+}
+
+
 class ast:
     typ: str
     children: tuple[Any, ...]
@@ -36,175 +52,413 @@ class ast:
 
 
 class Parsor(object):
-    def __init__(self, s) -> None:
+    def __init__(self, s, exact=False) -> None:
         self.s = s
+        self.exact = exact
         self.ts = []
+        self.tokens = None
 
     def execute(self):
-        self.ts = Lexer(self.s).execute()
-
-        a, i = self.bool_and_or(0)
+        self.ts = []
+        self.tokens = Lexer(self.s).scan()
 
-        if i != len(self.ts):
-            raise SyntaxError(f"expected EOF, found {self.ts[i:]!r}")
+        a, i = self.expression(0)
+        self.expect_end(i)
 
         return a
 
-    def bool_and_or(self, i: int) -> tuple[ast, int]:
+    def statement(self) -> dict:
         """
-        >>> Parsor('x && y').execute()
-        ast('&&', ast('var', 'x'), ast('var', 'y'))
-        >>> Parsor('!x').execute()
-        ast('!', ast('var', 'x'))
+        Parses one whole statement from a single pass over its tokens: a
+        print list, an assignment, a compound assignment or a bare
+        expression, or one of the lines that make up a function: define,
+        auto, return, if and the closing }. `s` must already be stripped
+        of comments and surrounding whitespace.
+
+        Compound assignment keeps its textual meaning: `x op= e` parses as
+        the expression `x op e`, so `x *= 2 + 3` is `x * 2 + 3`.
+
+        >>> Parsor('x *= 2 + y').statement()
+        {'type': 'assign', 'variable': 'x', 'value': ast('+', ast('*', ast('var', 'x'), ast('fl', 2.0)), ast('var', 'y'))}
+        >>> Parsor('print x, -1').statement()
+        {'type': 'print', 'value': [ast('var', 'x'), ast('-', ast('fl', 1.0))]}
+        >>> Parsor(memoryview(b'print x, 2')).statement()
+        {'type': 'print', 'value': [ast('var', 'x'), ast('fl', 2.0)]}
+        >>> Parsor('x == 1').statement()
+        Traceback (most recent call last):
+        ...
+        SyntaxError: unexpected == outside an assignment
         """
-        if i >= len(self.ts):
-            raise SyntaxError('expected boolean, found EOF')
-
-        lhs, i = self.boolean_neg(i)
-
-        while i < len(self.ts) and self.ts[i].typ == 'sym' and self.ts[i].val in boolean_symbols:
-            val = self.ts[i].val
-            rhs, i = self.boolean_neg(i+1)
-            lhs = ast(val, lhs, rhs)
-
-        return lhs, i
+        self.ts = []
+        self.tokens = Lexer(self.s).scan()
+
+        first = self.token_at(0)
+        if first is None:
+            raise SyntaxError('expected statement, found EOF')
+
+        # print is only a statement when a space follows it; s may be a
+        # bytes-like line of a mapped file
+        if first.typ == 'kw':
+            if first.val != 'print':
+                return getattr(self, first.val + '_statement')()
+            if self.s[5:6] in (' ', b' '):
+                return {'type': 'print', 'value': self.print_list(1)}
+
+        if first.typ == 'sym' and first.val == '}':
+            self.expect_end(1)
+            return {'type': 'end'}
+
+        second = self.token_at(1)
+        if (
+            first.typ == 'var'
+            and second is not None
+            and second.typ == 'sym'
+            and second.val in assignment_symbols
+        ):
+            return {
+                'type': 'assign',
+                'variable': first.val,
+                'value': self.assignment(first.val, second.val)
+            }
+
+        a, i = self.expression(0)
+        self.expect_end(i)
+
+        # Any = makes a statement an assignment, so == <= >= may only
+        # appear on the right hand side of one
+        for t in self.ts:
+            if t.typ == 'sym' and '=' in t.val:
+                raise SyntaxError(f'unexpected {t.val} outside an assignment')
+
+        return {'type': 'eval', 'value': a}
+
+    def define_statement(self) -> dict:
+        """
+        The first line of a function definition, `define f(a, b) {`. Its
+        body follows on the lines up to a lone `}`, which the caller
+        collects into the statement's body.
 
-    def boolean_neg(self, i: int) -> tuple[ast, int]:
+        >>> Parsor('define f(x, y) {').statement()
+        {'type': 'define', 'name': 'f', 'params': ['x', 'y'], 'autos': [], 'body': None}
         """
-        >>> Parsor('!x').execute()
-        ast('!', ast('var', 'x'))
+        name = self.token_at(1)
+        if name is None or name.typ != 'var':
+            raise SyntaxError(f'expected function name, found {name}')
+        self.expect_symbol(2, '(')
+
+        params = []
+        i = 3
+        t = self.token_at(i)
+        if t is not None and t.typ == 'var':
+            params.append(t.val)
+            i += 1
+            while self.symbol_at(i, ','):
+                t = self.token_at(i + 1)
+                if t is None or t.typ != 'var':
+                    raise SyntaxError(f'expected parameter name, found {t}')
+                params.append(t.val)
+                i += 2
+        if len(set(params)) != len(params):
+            raise SyntaxError(f'duplicate parameter in {name.val}')
+
+        self.expect_symbol(i, ')')
+        self.expect_symbol(i + 1, '{')
+        self.expect_end(i + 2)
+        return {'type': 'define', 'name': name.val, 'params': params, 'autos': [], 'body': None}
+
+    def auto_statement(self) -> dict:
         """
-        if i >= len(self.ts):
-            raise SyntaxError('expected boolean, found EOF')
-
-        if self.ts[i].typ == 'sym' and self.ts[i].val == '!':
-            a, i = self.boolean_neg(i+1)
-            return ast('!', a), i
-        else:
-            return self.relational(i)
-
-    def relational(self, i: int) -> tuple[ast, int]:
+        >>> Parsor('auto i, total').statement()
+        {'type': 'auto', 'names': ['i', 'total']}
         """
-        >>> Parsor('x < y').execute()
-        ast('<', ast('var', 'x'), ast('var', 'y'))
+        names = []
+        i = 1
+        while True:
+            t = self.token_at(i)
+            if t is None or t.typ != 'var':
+                raise SyntaxError(f'expected variable, found {t}')
+            names.append(t.val)
+            if not self.symbol_at(i + 1, ','):
+                self.expect_end(i + 1)
+                return {'type': 'auto', 'names': names}
+            i += 2
+
+    def return_statement(self) -> dict:
         """
-        if i >= len(self.ts):
-            raise SyntaxError('expected relational, found EOF')
+        A bare return returns 0.
 
-        lhs, i = self.plus_or_minus(i)
-
-        while i < len(self.ts) and self.ts[i].typ == 'sym' and self.ts[i].val in relational_symbols:
-            val = self.ts[i].val
-            rhs, i = self.plus_or_minus(i+1)
-            lhs = ast(val, lhs, rhs)
+        >>> Parsor('return').statement(), Parsor('return (n - 1) * 2').statement()
+        ({'type': 'return', 'value': ast('fl', 0.0)}, {'type': 'return', 'value': ast('*', ast('-', ast('var', 'n'), ast('fl', 1.0)), ast('fl', 2.0))})
+        """
+        if self.token_at(1) is None:
+            return {'type': 'return', 'value': self.make_const('0')}
+        a, i = self.expression(1)
+        self.expect_end(i)
+        return {'type': 'return', 'value': a}
 
-        return lhs, i
+    def if_statement(self) -> dict:
+        """
+        `if (condition) statement`, or `if (condition) {` to open a block
+        that runs up to a lone `}`. The statement after the condition is
+        parsed like a line of its own, so it is split off as text.
+
+        >>> Parsor('if (n < 2) return n').statement()
+        {'type': 'if', 'condition': ast('<', ast('var', 'n'), ast('fl', 2.0)), 'body': [{'type': 'return', 'value': ast('var', 'n')}]}
+        >>> Parsor('if ((a)) {').statement()['body'] is None
+        True
+        """
+        s = self.s if isinstance(self.s, str) else bytes(self.s).decode('latin-1')
+        start = s.find('(')
+        if start < 0 or s[2:start].strip():
+            raise SyntaxError('expected ( after if')
+
+        depth = 0
+        for end in range(start, len(s)):
+            if s[end] == '(':
+                depth += 1
+            elif s[end] == ')':
+                depth -= 1
+                if not depth:
+                    break
+        else:
+            raise SyntaxError('expected right paren, got EOF')
+
+        self.s = s[start + 1:end]
+        condition = self.execute()
+
+        rest = s[end + 1:].strip()
+        if rest == '{':
+            return {'type': 'if', 'condition': condition, 'body': None}
+
+        self.s = rest
+        statement = self.statement()
+        if statement['type'] in ['define', 'auto', 'end'] or statement.get('body', ()) is None:
+            raise SyntaxError(f"unexpected {statement['type']} after if")
+        return {'type': 'if', 'condition': condition, 'body': [statement]}
+
+    def assignment(self, name: str, op: str):
+        if op == '=':
+            a, i = self.expression(2)
+            self.expect_end(i)
+            return a
+
+        operator = op[:-1]
+        t = self.token_at(2)
+        if operator in disj_symbols and t is not None and t.val[0] in disj_symbols:
+            # x -= -1 reads as x--1: the operator and what follows it lex
+            # as one token, so lex the expanded text again
+            s = self.s if isinstance(self.s, str) else bytes(self.s).decode('latin-1')
+            rest = s[s.index(op) + len(op):].strip()
+            self.s = f'{name}{operator}{rest}'
+            self.ts = []
+            self.tokens = Lexer(self.s).scan()
+        else:
+            self.ts[1] = token('sym', operator)
 
-    def plus_or_minus(self, i: int) -> tuple[ast, int]:
-        if i >= len(self.ts):
-            raise SyntaxError('expected plus_or_minus, found EOF')
+        a, i = self.expression(0)
+        self.expect_end(i)
+        return a
 
-        lhs, i = self.mul_or_div(i)
+    def print_list(self, i: int) -> list:
+        items = []
+        while True:
+            a, i = self.expression(i)
+            items.append(a)
+
+            t = self.token_at(i)
+            if t is None:
+                return items
+            if not (t.typ == 'sym' and t.val == ','):
+                raise SyntaxError(f'expected comma, found {t!r}')
+            i += 1
+
+    def expect_end(self, i: int):
+        if self.token_at(i) is not None:
+            raise SyntaxError(f"expected EOF, found {self.ts[i:]!r}")
 
-        while i < len(self.ts) and self.ts[i].typ == 'sym' and self.ts[i].val in disj_symbols:
-            val = self.ts[i].val
-            rhs, i = self.mul_or_div(i+1)
-            lhs = ast(val, lhs, rhs)
+    def symbol_at(self, i: int, symbol: str) -> bool:
+        t = self.token_at(i)
+        return t is not None and t.typ == 'sym' and t.val == symbol
 
-        return lhs, i
+    def expect_symbol(self, i: int, symbol: str):
+        if not self.symbol_at(i, symbol):
+            raise SyntaxError(f'expected {symbol}, found {self.token_at(i)}')
 
-    def mul_or_div(self, i: int) -> tuple[ast, int]:
-        if i >= len(self.ts):
-            raise SyntaxError('expected mul_or_div, found EOF')
+    def make_node(self, typ: str, *children):
+        return ast(typ, *children)
 
-        lhs, i = self.power(i)
+    def make_var(self, name: str):
+        return ast('var', name)
 
-        while i < len(self.ts) and self.ts[i].typ == 'sym' and self.ts[i].val in conj_symbols:
-            val = self.ts[i].val
-            rhs, i = self.power(i+1)
-            lhs = ast(val, lhs, rhs)
+    def make_const(self, literal: str):
+        return ast('fl', parse_literal(literal, self.exact))
 
-        return lhs, i
+    def make_post_op(self, name: str, op: str):
+        node = ast('var', name)
+        node.add_post_op(ast(op, ast('var', name)))
+        return node
 
-    # Right associative power conjunction
+    def make_call(self, name: str, args: list):
+        return ast('call', name, *args)
 
-    def power(self, i: int) -> tuple[ast, int]:
+    def token_at(self, i: int):
         """
-        >>> Parsor('2 ^ 3').execute()
-        ast('^', ast('fl', 2.0), ast('fl', 3.0))
+        Returns the i-th token, pulling from the lexer only as far as the
+        parser has looked ahead, or None past the end of the input.
         """
-        if i >= len(self.ts):
-            raise SyntaxError('expected power conjunction, found EOF')
+        ts = self.ts
+        if i < len(ts):
+            return ts[i]
 
-        lhs, i = self.neg(i)
+        for t in self.tokens:
+            ts.append(t)
+            if i < len(ts):
+                return t
+        return None
 
-        if (i < len(self.ts) and self.ts[i].typ == 'sym' and self.ts[i].val == '^'):
-            rhs, i = self.power(i+1)
-            lhs = ast('^', lhs, rhs)
+    def expression(self, i: int) -> tuple[ast, int]:
+        """
+        Parses the longest expression starting at token i and returns it
+        with the index of the first token after it.
 
-        return lhs, i
+        Operator precedence parsing over explicit operand and operator
+        stacks, so neither nesting depth nor length reaches the Python
+        stack. From loosest to tightest: && || and binary !, prefix !,
+        comparisons, + -, * / %, right associative ^, prefix -. A prefix !
+        may only start an operand of && || ! or of a parenthesis.
 
-    def neg(self, i: int) -> tuple[ast, int]:
+        >>> Parsor('x && y').execute()
+        ast('&&', ast('var', 'x'), ast('var', 'y'))
+        >>> Parsor('!x < y || z').execute()
+        ast('||', ast('!', ast('<', ast('var', 'x'), ast('var', 'y'))), ast('var', 'z'))
+        >>> Parsor('-2 ^ 3 ^ -x * y').execute()
+        ast('*', ast('^', ast('-', ast('fl', 2.0)), ast('^', ast('fl', 3.0), ast('-', ast('var', 'x')))), ast('var', 'y'))
+        >>> Parsor('(1 - ++x) % (y--)').execute()
+        ast('%', ast('-', ast('fl', 1.0), ast('++', ast('var', 'x'))), ast('var', 'y'))
+        >>> Parsor('1 + !x').execute()
+        Traceback (most recent call last):
+        ...
+        SyntaxError: expected operand, got "token('sym', '!')"
+        >>> Parsor('(' * 100000 + 'x' + ')' * 100000).execute()
+        ast('var', 'x')
         """
-        >>> Parsor('-1').execute()
-        ast('-', ast('fl', 1.0))
+        token_at = self.token_at
+        make_node = self.make_node
+        operands = []
+        # (precedence, symbol, arity), or None for an open parenthesis
+        operators = []
+        parens = 0
+        # Whether a prefix ! may start the next operand
+        boolean = True
+
+        while True:
+            t = token_at(i)
+            if t is None:
+                raise SyntaxError('expected operand, found EOF')
+
+            if t.typ == 'var':
+                op = token_at(i + 1)
+                if op is not None and op.typ == 'sym' and op.val in incr_or_decr_symbols:
+                    operands.append(self.make_post_op(t.val, op.val))
+                    i += 2
+                elif op is not None and op.typ == 'sym' and op.val == '(':
+                    call, i = self.call(i)
+                    operands.append(call)
+                else:
+                    operands.append(self.make_var(t.val))
+                    i += 1
+            elif t.typ == 'fl':
+                operands.append(self.make_const(t.val))
+                i += 1
+            elif t.typ == 'sym' and t.val == '(':
+                operators.append(None)
+                parens += 1
+                boolean = True
+                i += 1
+                continue
+            elif t.typ == 'sym' and t.val == '!' and boolean:
+                operators.append((prefix_not_precedence, '!', 1))
+                i += 1
+                continue
+            elif t.typ == 'sym' and t.val in neg_symbols:
+                operators.append((prefix_neg_precedence, t.val, 1))
+                boolean = False
+                i += 1
+                continue
+            elif t.typ == 'sym' and t.val in incr_or_decr_symbols:
+                operand = token_at(i + 1)
+                if operand is None or operand.typ != 'var':
+                    raise SyntaxError(
+                        f'expected variable, found {operand.typ if operand else "EOF"}'
+                    )
+                operands.append(make_node(t.val, self.make_var(operand.val)))
+                i += 2
+            else:
+                raise SyntaxError(f'expected operand, got "{t}"')
+
+            # After an operand: binary operators and closing parentheses
+            precedence = None
+            while True:
+                t = token_at(i)
+                if t is None or t.typ != 'sym':
+                    break
+
+                precedence = binary_precedence.get(t.val)
+                if precedence is not None:
+                    # Equal precedence binds left, except for ^
+                    bound = precedence + 1 if t.val in power_symbols else precedence
+                    while operators and operators[-1] is not None and operators[-1][0] >= bound:
+                        self.reduce(operands, operators.pop())
+                    operators.append((precedence, t.val, 2))
+                    boolean = precedence == boolean_precedence
+                    i += 1
+                    break
+
+                if t.val != ')' or not parens:
+                    break
+                while operators[-1] is not None:
+                    self.reduce(operands, operators.pop())
+                operators.pop()
+                parens -= 1
+                i += 1
+
+            if precedence is None:
+                break
+
+        if parens:
+            raise SyntaxError(f'expected right paren, got {"EOF" if t is None else t}')
+        while operators:
+            self.reduce(operands, operators.pop())
+        return operands[0], i
+
+    def call(self, i: int) -> tuple[Any, int]:
         """
+        Parses `name(arg, ...)` starting at token i. Each argument is a
+        whole expression of its own, so only calls nested inside
+        arguments reach the Python stack.
 
-        if i >= len(self.ts):
-            raise SyntaxError('expected negation, found EOF')
-
-        if self.ts[i].typ == 'sym' and self.ts[i].val in neg_symbols:
-            val = self.ts[i].val
-            a, i = self.neg(i+1)
-            return ast(val, a), i
+        >>> Parsor('f(x, g(), 2) + 1').execute()
+        ast('+', ast('call', 'f', ast('var', 'x'), ast('call', 'g'), ast('fl', 2.0)), ast('fl', 1.0))
+        """
+        name = self.token_at(i).val
+        args = []
+        i += 2
+        if self.symbol_at(i, ')'):
+            return self.make_call(name, args), i + 1
+
+        while True:
+            a, i = self.expression(i)
+            args.append(a)
+            if self.symbol_at(i, ')'):
+                return self.make_call(name, args), i + 1
+            if not self.symbol_at(i, ','):
+                raise SyntaxError(f'expected comma, found {self.token_at(i)}')
+            i += 1
+
+    def reduce(self, operands, operator):
+        _, symbol, arity = operator
+        if arity == 1:
+            operands[-1] = self.make_node(symbol, operands[-1])
         else:
-            return self.incr_and_decr(i)
-
-    def incr_and_decr(self, i: int) -> tuple[ast, int]:
-        # pre and post incr and decr implemented
-        # They are non-associative
-
-        if i >= len(self.ts):
-            raise SyntaxError('expected incr/decr, found EOF')
-
-        if self.ts[i].typ == 'sym' and self.ts[i].val in incr_or_decr_symbols:
-            val = self.ts[i].val
-            if self.ts[i+1].typ != 'var':
-                raise SyntaxError(
-                    f'expected variable, found {self.ts[i+1].typ}'
-                )
-            a, i = self.atom(i+1)
-            return ast(val, a), i
-
-        if self.ts[i].typ == 'var' and i+1 < len(self.ts) and self.ts[i+1].typ == 'sym' and self.ts[i+1].val in incr_or_decr_symbols:
-            op = self.ts[i+1].val
-            var = self.ts[i].val
-            ast_node = ast('var', var)
-            ast_node.add_post_op(ast(op, ast('var', var)))
-            return ast_node, i+2
-
-        return self.atom(i)
-
-    def atom(self, i: int) -> tuple[ast, int]:
-        if i >= len(self.ts):
-            raise SyntaxError('expected negation, found EOF')
-
-        t = self.ts[i]
-
-        if t.typ == 'var':
-            VariableNameChecker(t.val).validate()
-            return ast('var', t.val), i+1
-        elif t.typ == 'fl':
-            return ast('fl', float(t.val)), i+1
-        elif t.typ == 'sym' and t.val == '(':
-            a, i = self.bool_and_or(i + 1)
-
-            if i >= len(self.ts):
-                raise SyntaxError(f'expected right paren, got EOF')
-
-            if not (self.ts[i].typ == 'sym' and self.ts[i].val == ')'):
-                raise SyntaxError(f'expected right paren, got "{self.ts[i]}"')
-
-            return a, i + 1
-
-        raise SyntaxError(f'expected atom, got "{self.ts[i]}"')
+            rhs = operands.pop()
+            operands[-1] = self.make_node(symbol, operands[-1], rhs)
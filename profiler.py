@@ -0,0 +1,229 @@
+import time
+from lexer import Lexer
+from parsor import Parsor
+from statement_parser import StatementParser
+from comments import CommentStripper
+from output import OutputWriter
+from compiler import Compiler
+from constants import (
+    single_len_symbols,
+    boolean_symbols,
+    double_len_symbols,
+    op_equals_symbols,
+    bool_equals_symbols,
+    assign_symbols,
+    keywords,
+    disj_symbols,
+    conj_symbols,
+    power_symbols,
+    neg_symbols,
+    incr_or_decr_symbols,
+    relational_symbols,
+)
+
+
+class Profiler(object):
+    """
+    Records wall time and call counts under a stack of frame names, such as
+    `line 3;evaluate;interp_plus;interp_pow` or
+    `line 2;statement_parser;parsor;lexer`. Nothing is instrumented until
+    install() wraps the phases of a StatementEvaluator, and uninstall()
+    puts everything back, so a run without a profiler pays nothing.
+
+    >>> ticks = iter(range(100))
+    >>> profiler = Profiler(clock=lambda: next(ticks))
+    >>> square = profiler.wrap('interp_pow', lambda x: x * x)
+    >>> add = profiler.wrap('interp_plus', lambda x: square(x) + 1)
+    >>> add(3), add(4)
+    (10, 17)
+    >>> print(profiler.collapsed(), end='')
+    interp_plus 4000000
+    interp_plus;interp_pow 2000000
+    >>> profiler.summary()
+    [('interp_plus', 2, 4.0, 6.0), ('interp_pow', 2, 2.0, 2.0)]
+    """
+
+    phases = [
+        (StatementParser, 'parse', 'statement_parser'),
+        (CommentStripper, 'strip', 'comments'),
+        (Parsor, 'statement', 'parsor'),
+        (OutputWriter, 'flush', 'output'),
+    ]
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.stack = []
+        # stack of frame names -> [seconds including callees, calls]
+        self.totals = {}
+        self.installed = []
+        self.lines = 0
+        self.statement_lines = {}
+
+    def wrap(self, label: str, function):
+        stack = self.stack
+        clock = self.clock
+        record = self.record
+
+        def timed(*args):
+            stack.append(label)
+            start = clock()
+            try:
+                return function(*args)
+            finally:
+                record(clock() - start)
+        return timed
+
+    def wrap_generator(self, label: str, function):
+        """
+        Like wrap, but times each item a generator produces, so a lazily
+        pulled lexer shows up under whatever is pulling from it.
+        """
+        stack = self.stack
+        clock = self.clock
+        record = self.record
+
+        def timed(*args):
+            items = function(*args)
+            while True:
+                stack.append(label)
+                start = clock()
+                try:
+                    item = next(items)
+                except StopIteration:
+                    return
+                finally:
+                    record(clock() - start)
+                yield item
+        return timed
+
+    def record(self, elapsed):
+        key = tuple(self.stack)
+        entry = self.totals.get(key)
+        if entry is None:
+            self.totals[key] = [elapsed, 1]
+        else:
+            entry[0] += elapsed
+            entry[1] += 1
+        self.stack.pop()
+
+    def install(self, evaluator):
+        """
+        Wraps the parsing phases for every instance, and the line handling
+        and compiler of this evaluator, until uninstall().
+        """
+        for cls, name, label in self.phases:
+            original = cls.__dict__[name]
+            self.installed.append((cls, name, original))
+            setattr(cls, name, self.wrap(label, original))
+
+        # Parsor pulls tokens from Lexer.scan one at a time
+        self.installed.append((Lexer, 'scan', Lexer.__dict__['scan']))
+        Lexer.scan = self.wrap_generator('lexer', Lexer.__dict__['scan'])
+
+        parse_statement = evaluator.parse_statement
+        evaluate_statement = evaluator.evaluate_statement
+        evaluate = self.wrap('evaluate', evaluate_statement)
+
+        def profiled_parse_statement(statement):
+            self.lines += 1
+            line = f'line {self.lines}'
+            self.stack.append(line)
+            start = self.clock()
+            try:
+                parsed_statement = parse_statement(statement)
+            finally:
+                self.record(self.clock() - start)
+            if parsed_statement is not None:
+                self.statement_lines[id(parsed_statement)] = line
+            return parsed_statement
+
+        def profiled_evaluate_statement(statement):
+            line = self.statement_lines.pop(id(statement), 'unknown line')
+            self.stack.append(line)
+            start = self.clock()
+            try:
+                return evaluate(statement)
+            finally:
+                self.record(self.clock() - start)
+
+        evaluator.parse_statement = profiled_parse_statement
+        evaluator.evaluate_statement = profiled_evaluate_statement
+        evaluator.compiler = ProfilingCompiler(
+            evaluator.environment, evaluator.exact, self, evaluator.memo, evaluator.functions
+        )
+        evaluator.functions.compiler = evaluator.compiler
+
+    def uninstall(self):
+        for cls, name, original in reversed(self.installed):
+            setattr(cls, name, original)
+        self.installed = []
+
+    def self_times(self):
+        """
+        Time spent in each stack itself, without the stacks it called.
+        """
+        times = {key: entry[0] for key, entry in self.totals.items()}
+        for key, entry in self.totals.items():
+            if key[:-1] in times:
+                times[key[:-1]] -= entry[0]
+        return times
+
+    def collapsed(self) -> str:
+        """
+        One `frame;frame;frame microseconds` line per stack, the input
+        format of flamegraph.pl and speedscope.
+        """
+        return ''.join(
+            f'{";".join(key)} {max(0, round(seconds * 1e6))}\n'
+            for key, seconds in sorted(self.self_times().items())
+        )
+
+    def summary(self):
+        """
+        (frame, calls, self seconds, total seconds) for every frame name,
+        busiest first. Recursive frames count towards total only once.
+        """
+        rows = {}
+        self_times = self.self_times()
+        for key, (seconds, calls) in self.totals.items():
+            row = rows.setdefault(key[-1], [0, 0.0, 0.0])
+            row[0] += calls
+            row[1] += self_times[key]
+            if key[-1] not in key[:-1]:
+                row[2] += seconds
+        return sorted(
+            ((name, *row) for name, row in rows.items()),
+            key=lambda row: (-row[3], row[0])
+        )
+
+    def report(self, limit: int = 20) -> str:
+        rows = self.summary()
+        lines = [f'{"frame":<24}{"calls":>10}{"self ms":>12}{"total ms":>12}']
+        for name, calls, own, total in rows[:limit]:
+            lines.append(f'{name:<24}{calls:>10}{own * 1000:>12.2f}{total * 1000:>12.2f}')
+        return '\n'.join(lines) + '\n'
+
+
+class ProfilingCompiler(Compiler):
+    """
+    Compiler whose closures record a frame per operator, labelled with
+    the name of the Compiler handler for it after an interp_ prefix
+    (interp_plus, interp_pow, ...).
+    Constants are not worth a frame and are timed as part of their parent.
+    """
+
+    def __init__(self, environment, exact, profiler: Profiler, memo=None, functions=None):
+        super().__init__(environment, exact, memo, functions)
+        self.dispatch = {
+            typ: self.instrumented('interp_' + self.handlers[typ], handler)
+            for typ, handler in self.dispatch.items()
+        }
+        self.profiler = profiler
+
+    def instrumented(self, label, handler):
+        if label == 'interp_const':
+            return handler
+
+        def compile(a):
+            return self.profiler.wrap(label, handler(a))
+        return compile
@@ -0,0 +1,204 @@
+import threading
+from statement_evaluator import StatementEvaluator, error_message
+from compiler import Compiler
+from environment import Environment
+from functions import Function, FunctionTable
+from optimizer import Optimizer
+from constants import (
+    single_len_symbols,
+    boolean_symbols,
+    double_len_symbols,
+    op_equals_symbols,
+    bool_equals_symbols,
+    assign_symbols,
+    keywords,
+    disj_symbols,
+    conj_symbols,
+    power_symbols,
+    neg_symbols,
+    incr_or_decr_symbols,
+    relational_symbols,
+)
+
+
+class Lines(object):
+    """
+    An output sink that keeps each printed line as the list of its values.
+    """
+
+    def __init__(self):
+        self.lines = []
+
+    def line(self, values):
+        self.lines.append(list(values))
+
+
+class Dispatcher(object):
+    """
+    Stands in for a FunctionTable in code compiled for a Program. Calls
+    and prints from function bodies go to the table of the run in
+    progress on the calling thread, so the compiled code itself holds no
+    state of any run.
+    """
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def call(self, name: str, args: list, values: list):
+        return self.local.table.call(name, args, values)
+
+    def write(self, printed: list):
+        self.local.table.write(printed)
+
+
+class Result(object):
+    """
+    What a run of a Program produced: the lines it printed, as lists of
+    values, the variables it ended with, and the message of the runtime
+    error that stopped it, or None. As on the command line, that message
+    is also the end of the last line printed.
+    """
+
+    def __init__(self, output: list, variables: dict, error=None):
+        self.output = output
+        self.variables = variables
+        self.error = error
+
+    @property
+    def text(self) -> str:
+        return ''.join(' '.join(map(str, values)) + '\n' for values in self.output)
+
+    def __repr__(self):
+        return f'Result(output={self.output!r}, variables={self.variables!r}, error={self.error!r})'
+
+
+class Program(object):
+    """
+    A program parsed, resolved and compiled once, for embedding. Source is
+    a string or an iterable of lines, and a parse error raises SyntaxError
+    or ValueError here rather than being printed.
+
+    Nothing is left to do lazily: every statement and function body is
+    compiled when the Program is built, and the Program is not changed by
+    running it. Each run starts from its own copy of the variables and
+    has its own output and its own FunctionTable, with its own caches of
+    pure function results, so one Program can run on many threads at
+    once without locks.
+
+    >>> program = Program('''
+    ... define sq(x) {
+    ...     return x * x
+    ... }
+    ... y = sq(n) + 1
+    ... print n, y
+    ... print 10 / n
+    ... ''')
+    >>> program.run({'n': 3.0})
+    Result(output=[[3.0, 10.0], [3.3333333333333335]], variables={'x': 0.0, 'y': 10.0, 'n': 3.0}, error=None)
+    >>> result = program.run()
+    >>> print(result.text, end='')
+    0.0 1.0
+    divide by zero
+    >>> result.error
+    'divide by zero'
+    >>> from concurrent.futures import ThreadPoolExecutor
+    >>> with ThreadPoolExecutor(4) as pool:
+    ...     results = list(pool.map(lambda n: program.run({'n': float(n)}), range(1, 101)))
+    >>> [result.variables['y'] for result in results[:5]], results[-1].output[0]
+    ([2.0, 5.0, 10.0, 17.0, 26.0], [100.0, 10001.0])
+
+    Optimizing does not change results, whatever the types of the values
+    passed in:
+
+    >>> source = 'print n * 1, n / 1, n - 0'
+    >>> Program(source).run({'n': 3}).output, Program(source, optimize=True).run({'n': 3}).output
+    ([[3.0, 3.0, 3.0]], [[3.0, 3.0, 3.0]])
+    >>> Program(['y = n - 1', 'y = 2', 'print y'], optimize=True).run({'n': 10 ** 400})
+    Traceback (most recent call last):
+    ...
+    OverflowError: int too large to convert to float
+    """
+
+    def __init__(self, source, exact=False, optimize=False):
+        if isinstance(source, str):
+            source = source.splitlines()
+
+        parser = StatementEvaluator(source, exact=exact)
+        if optimize:
+            # Values passed to run() can be of any type, so the optimizer
+            # knows nothing about a variable until the program assigns it
+            parser.optimizer = Optimizer(exact, inputs=True)
+        parser.parse()
+
+        self.exact = exact
+        self.environment = Environment(zero=0 if exact else 0.0)
+        self.environment.resolve(parser.parsed_statements)
+        self.dispatcher = Dispatcher()
+        self.compiler = Compiler(self.environment, exact, functions=self.dispatcher)
+        # Prepares function bodies; runs get tables of their own
+        self.functions = FunctionTable(self.environment)
+        self.functions.compiler = self.compiler
+        self.steps = [self.compile_statement(statement) for statement in parser.parsed_statements]
+        self.zeros = tuple(self.environment.values)
+
+    def compile_statement(self, statement):
+        typ = statement['type']
+        if typ == 'define':
+            function = Function(
+                statement['name'], statement['params'], statement['autos'], statement['body']
+            )
+            self.functions.prepare(function)
+            return typ, function
+
+        if typ == 'print':
+            return typ, [
+                item if isinstance(item, str) else self.compiler.compile(item)
+                for item in statement['value']
+            ]
+
+        value = self.compiler.compile(statement['value'])
+        if typ == 'assign':
+            return typ, (self.environment.slot(statement['variable']), value)
+        return typ, value
+
+    def run(self, variables=None) -> Result:
+        """
+        Runs the program once, from variables given as a dict of names to
+        values. Names the program never mentions are ignored.
+        """
+        values = list(self.zeros)
+        slots = self.environment.slots
+        for name, value in (variables or {}).items():
+            slot = slots.get(name)
+            if slot is not None:
+                values[slot] = value
+
+        output = Lines()
+        table = FunctionTable(self.environment, output)
+        local = self.dispatcher.local
+        outer = getattr(local, 'table', None)
+        local.table = table
+        printed = []
+        error = None
+        try:
+            for typ, step in self.steps:
+                if typ == 'define':
+                    table.install(step)
+                elif typ == 'print':
+                    printed = []
+                    for item in step:
+                        printed.append(item if isinstance(item, str) else item(values))
+                    output.line(printed)
+                    printed = []
+                elif typ == 'assign':
+                    slot, value = step
+                    values[slot] = value(values)
+                else:
+                    step(values)
+        except (ZeroDivisionError, RuntimeError) as e:
+            error = error_message(e)
+            output.line(printed + [error])
+        finally:
+            local.table = outer
+
+        return Result(output.lines, dict(zip(self.environment.names, values)), error)
@@ -0,0 +1,177 @@
+import io
+import sys
+import asyncio
+import argparse
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from statement_evaluator import StatementEvaluator
+from constants import (
+    single_len_symbols,
+    boolean_symbols,
+    double_len_symbols,
+    op_equals_symbols,
+    bool_equals_symbols,
+    assign_symbols,
+    keywords,
+    disj_symbols,
+    conj_symbols,
+    power_symbols,
+    neg_symbols,
+    incr_or_decr_symbols,
+    relational_symbols,
+)
+
+
+# The protocol: the client sends one line of program per request. The
+# server answers with whatever that line printed, one output line at a
+# time, then a line holding a single '.'. Output lines that start with '.'
+# get another '.' in front, as in SMTP. When a line stops the program
+# (parse error, divide by zero) the server closes the connection after
+# its answer, just as main.py would exit.
+TERMINATOR = b'.\n'
+
+
+def frame(text: str) -> bytes:
+    """
+    >>> frame('1.0\\n.5 x\\n')
+    b'1.0\\n..5 x\\n.\\n'
+    >>> frame('')
+    b'.\\n'
+    """
+    lines = [
+        '.' + line if line.startswith('.') else line
+        for line in text.splitlines(keepends=True)
+    ]
+    return ''.join(lines).encode() + TERMINATOR
+
+
+async def read_answer(reader):
+    """
+    The output for one request, or None when the server has closed the
+    connection.
+    """
+    lines = []
+    while True:
+        line = await reader.readline()
+        if not line:
+            return None
+        if line == TERMINATOR:
+            return ''.join(lines)
+        line = line.decode()
+        lines.append(line[1:] if line.startswith('.') else line)
+
+
+class EvaluationServer(object):
+    """
+    Serves the line protocol over TCP or a Unix socket. Every connection
+    gets its own StatementEvaluator, so variables and an open block comment
+    carry over between its lines but never between connections.
+
+    Lines run on a thread pool so the event loop keeps accepting and
+    answering while a long statement evaluates. At most `concurrency`
+    statements run at once. A connection's next line is not read until
+    its previous answer has been written and drained, so a slow client
+    holds back only itself.
+    """
+
+    def __init__(self, concurrency: int = 4, engine='closure', exact=False,
+                 max_line: int = 2**20):
+        self.concurrency = concurrency
+        self.engine = engine
+        self.exact = exact
+        self.max_line = max_line
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.semaphore = None
+        self.connections = 0
+
+    async def handle(self, reader, writer):
+        evaluator = StatementEvaluator(
+            [], engine=self.engine, exact=self.exact, flush='end'
+        )
+        loop = asyncio.get_running_loop()
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # Longer than max_line
+                    break
+                if not line:
+                    break
+
+                async with self.semaphore:
+                    answer, running = await loop.run_in_executor(
+                        self.executor, self.execute, evaluator, line.decode()
+                    )
+                writer.write(frame(answer))
+                await writer.drain()
+                if not running:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    def execute(self, evaluator, line):
+        out = evaluator.output.stream = io.StringIO()
+        try:
+            running = evaluator.execute_line(line)
+        except Exception:
+            # What would have crashed main.py ends only this connection
+            traceback.print_exc()
+            running = False
+        finally:
+            evaluator.output.flush()
+        return out.getvalue(), running
+
+    async def start(self, host=None, port=None, path=None):
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        if path:
+            return await asyncio.start_unix_server(self.handle, path, limit=self.max_line)
+        return await asyncio.start_server(self.handle, host, port, limit=self.max_line)
+
+
+async def serve(args):
+    server = EvaluationServer(
+        concurrency=args.concurrency, engine=args.engine, exact=args.exact
+    )
+    listener = await server.start(args.host, args.port, args.unix)
+    where = args.unix or ', '.join(
+        str(sock.getsockname()) for sock in listener.sockets
+    )
+    print(f'listening on {where}', file=sys.stderr)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(
+        description='Evaluate programs sent line by line over a socket'
+    )
+    argparser.add_argument('--host', default='127.0.0.1')
+    argparser.add_argument('--port', type=int, default=7070)
+    argparser.add_argument('--unix', metavar='PATH', help='listen on a Unix socket instead')
+    argparser.add_argument(
+        '--concurrency', type=int, default=4,
+        help='statements evaluated at the same time across all connections'
+    )
+    argparser.add_argument(
+        '--engine', choices=StatementEvaluator.engines, default='closure'
+    )
+    argparser.add_argument('--exact', action='store_true')
+    args = argparser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
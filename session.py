@@ -0,0 +1,335 @@
+import heapq
+from bisect import bisect_left, bisect_right, insort
+from compiler import Compiler
+from dataflow import accesses, barrier
+from statement_evaluator import StatementEvaluator
+from constants import (
+    single_len_symbols,
+    boolean_symbols,
+    double_len_symbols,
+    op_equals_symbols,
+    bool_equals_symbols,
+    assign_symbols,
+    keywords,
+    disj_symbols,
+    conj_symbols,
+    power_symbols,
+    neg_symbols,
+    incr_or_decr_symbols,
+    relational_symbols,
+)
+
+
+def same(a, b) -> bool:
+    # 0.0 == -0.0 and 1 == 1.0, but they print differently
+    if type(a) is not type(b):
+        return False
+    if type(a) is float:
+        return repr(a) == repr(b)
+    return a == b
+
+
+class Session(object):
+    """
+    Keeps a parsed program, what every statement wrote and printed on the
+    last run, and which statements read and write each variable. After a
+    line is edited or a variable is overridden, only the statements whose
+    inputs actually changed are evaluated again, and the prints whose
+    output changed are reported as (line, old, new).
+
+    Lines are numbered from 1 and there is one statement per line. A run
+    that ends in a divide by zero, or an edit that touches a comment
+    marker, falls back to evaluating the whole program again. Functions
+    are not supported, since a call's reads and writes are not known
+    until it runs.
+
+    >>> session = Session(['rate = 5', 'total = rate * 12', 'print total', 'print rate + 1'])
+    >>> print(session.output(), end='')
+    60.0
+    6.0
+    >>> session.edit(1, 'rate = 7')
+    [(3, '60.0\\n', '84.0\\n'), (4, '6.0\\n', '8.0\\n')]
+    >>> session.reevaluated
+    4
+    >>> session.override('total', 1)
+    []
+    >>> session.edit(4, 'print 1 / (rate - 7)')
+    [(4, '8.0\\n', 'divide by zero\\n')]
+    >>> session.variables
+    {'rate': 7.0, 'total': 84.0}
+    >>> session = Session(['tmp = 3', 'print tmp'])
+    >>> session.edit(1, 'x = 4'), session.edit(2, 'print x')
+    ([(2, '3.0\\n', '0.0\\n')], [(2, '0.0\\n', '4.0\\n')])
+    >>> session.variables
+    {'x': 4.0}
+    """
+
+    def __init__(self, lines, exact=False):
+        self.exact = exact
+        self.initial = {}
+        self.lines = [line.strip() for line in lines]
+        self.reevaluated = 0
+        self.install(self.parse(self.lines))
+        self.run_all()
+
+    def parse(self, lines):
+        evaluator = StatementEvaluator([], exact=self.exact)
+        statements = []
+        # Lines that start inside a block comment belong to a statement
+        # further down, so editing them means parsing again
+        commented = set()
+        for i, line in enumerate(lines):
+            if evaluator.in_block_comment:
+                commented.add(i)
+            statements.append(self.parse_line(evaluator, line))
+        return statements, commented, evaluator.environment
+
+    def parse_line(self, evaluator, line):
+        statement = evaluator.parse_statement(line)
+        if evaluator.blocks.in_block or (statement is not None and barrier(statement)):
+            raise SyntaxError('functions are not supported in a session')
+        return statement
+
+    def install(self, parsed):
+        self.statements, self.commented, self.environment = parsed
+        self.compiler = Compiler(self.environment, self.exact)
+        self.code = [self.compile(statement) for statement in self.statements]
+        self.accesses = [self.accesses_of(statement) for statement in self.statements]
+        self.readers = {}
+        self.writers = {}
+        for i, (reads, writes) in enumerate(self.accesses):
+            for name in reads:
+                self.readers.setdefault(name, []).append(i)
+            for name in writes:
+                self.writers.setdefault(name, []).append(i)
+
+    def accesses_of(self, statement):
+        if statement is None:
+            return set(), set()
+        return accesses(statement)
+
+    def compile(self, statement):
+        if statement is None:
+            return None
+        if statement['type'] == 'print':
+            return [
+                item if isinstance(item, str) else self.compiler.compile(item)
+                for item in statement['value']
+            ]
+        return self.compiler.compile(statement['value'])
+
+    def execute(self, i):
+        """
+        Runs statement i against the environment and returns what it
+        printed and whether it divided by zero.
+        """
+        statement = self.statements[i]
+        if statement is None:
+            return '', False
+
+        values = self.environment.values
+        if statement['type'] == 'print':
+            printed = []
+            try:
+                for item in self.code[i]:
+                    printed.append(item if isinstance(item, str) else item(values))
+            except ZeroDivisionError:
+                return ' '.join(map(str, printed + ['divide by zero'])) + '\n', True
+            return ' '.join(map(str, printed)) + '\n', False
+
+        try:
+            value = self.code[i](values)
+        except ZeroDivisionError:
+            return 'divide by zero\n', True
+        if statement['type'] == 'assign':
+            values[self.environment.slot(statement['variable'])] = value
+        return '', False
+
+    def record(self, i):
+        values = self.environment.values
+        slot = self.environment.slot
+        return {name: values[slot(name)] for name in self.accesses[i][1]}
+
+    def run_all(self):
+        """
+        Evaluates the whole program in order and returns the prints whose
+        output differs from the previous run.
+        """
+        old = getattr(self, 'texts', None)
+
+        environment = self.environment
+        environment.values[:] = [environment.zero] * len(environment.values)
+        environment.update(self.initial)
+
+        self.texts = [''] * len(self.statements)
+        self.outputs = [{} for _ in self.statements]
+        self.aborted = None
+        for i in range(len(self.statements)):
+            self.texts[i], aborted = self.execute(i)
+            self.outputs[i] = self.record(i)
+            if aborted:
+                self.aborted = i
+                break
+        self.reevaluated = len(self.statements) if self.aborted is None else self.aborted + 1
+
+        if old is None:
+            return []
+        return [
+            (i + 1, old_text, new_text)
+            for i, (old_text, new_text) in enumerate(zip(old, self.texts))
+            if old_text != new_text
+        ]
+
+    def value_at(self, name, i):
+        """
+        The value name holds just before statement i runs.
+        """
+        writers = self.writers.get(name, ())
+        w = bisect_left(writers, i) - 1
+        if w >= 0:
+            return self.outputs[writers[w]][name]
+        return self.initial.get(name, self.environment.zero)
+
+    def output(self) -> str:
+        return ''.join(self.texts)
+
+    @property
+    def variables(self):
+        """
+        What the variables the program reads or writes held at the end of
+        the last run. Names only lines since edited away mentioned are left
+        out, though the environment keeps their slots.
+        """
+        end = len(self.statements) if self.aborted is None else self.aborted + 1
+        return {
+            name: self.value_at(name, end)
+            for name in self.environment.names
+            if self.readers.get(name) or self.writers.get(name)
+        }
+
+    def edit(self, line: int, text: str):
+        """
+        Replaces a line and returns the prints whose output changed. Raises
+        SyntaxError or ValueError, and changes nothing, when the new line
+        does not parse.
+        """
+        i = line - 1
+        text = text.strip()
+        markers = ('/*', '*/')
+        if i in self.commented or any(
+            marker in line_text for marker in markers for line_text in (self.lines[i], text)
+        ):
+            lines = self.lines[:i] + [text] + self.lines[i + 1:]
+            parsed = self.parse(lines)
+            self.lines = lines
+            self.install(parsed)
+            return self.run_all()
+
+        statement = self.parse_line(StatementEvaluator([], exact=self.exact), text)
+        self.lines[i] = text
+
+        old_reads, old_writes = self.accesses[i]
+        old_outputs = self.outputs[i]
+        for name in old_reads:
+            self.readers[name].remove(i)
+        for name in old_writes:
+            self.writers[name].remove(i)
+
+        self.statements[i] = statement
+        self.code[i] = self.compile(statement)
+        self.accesses[i] = reads, writes = self.accesses_of(statement)
+        for name in reads:
+            insort(self.readers.setdefault(name, []), i)
+        for name in writes:
+            insort(self.writers.setdefault(name, []), i)
+
+        if self.aborted is not None:
+            return self.run_all()
+
+        # What the edited statement used to leave behind, for comparison
+        before = {
+            name: old_outputs[name] if name in old_outputs else self.value_at(name, i)
+            for name in old_writes | writes
+        }
+        return self.propagate([i], set(), {i: before})
+
+    def override(self, name: str, value):
+        """
+        Sets the value name holds before the program starts, as if it came
+        from outside, and returns the prints whose output changed.
+        """
+        before = self.initial.get(name, self.environment.zero)
+        self.initial[name] = value
+        self.environment.slot(name)
+        if self.aborted is not None:
+            return self.run_all()
+        if same(before, value):
+            return []
+
+        queue = []
+        self.invalidate(name, -1, queue)
+        return self.propagate(queue, {name}, {})
+
+    def invalidate(self, name, i, queue):
+        """
+        Queues every statement that reads name's value as it stands after
+        statement i, up to and including the next statement that writes it.
+        """
+        writers = self.writers.get(name, ())
+        w = bisect_right(writers, i)
+        end = writers[w] if w < len(writers) else len(self.statements)
+
+        readers = self.readers.get(name, ())
+        for r in readers[bisect_right(readers, i):bisect_right(readers, end)]:
+            heapq.heappush(queue, r)
+        if end < len(self.statements):
+            heapq.heappush(queue, end)
+
+    def propagate(self, queue, dirty, edited):
+        """
+        Visits queued statements in program order. One is evaluated again
+        when it was edited or reads a variable in `dirty`, whose value
+        differs from the last run at that point. `edited` maps edited
+        statements to what they wrote before the edit.
+        """
+        heapq.heapify(queue)
+        changes = []
+        self.reevaluated = 0
+        visited = -1
+
+        environment = self.environment
+        values = environment.values
+        while queue:
+            i = heapq.heappop(queue)
+            if i == visited:
+                continue
+            visited = i
+
+            reads, writes = self.accesses[i]
+            if i not in edited and not reads & dirty:
+                # Same inputs as last time, so the same outputs
+                dirty.difference_update(writes)
+                continue
+
+            for name in reads | writes:
+                values[environment.slot(name)] = self.value_at(name, i)
+            text, aborted = self.execute(i)
+            self.reevaluated += 1
+            if aborted:
+                return self.run_all()
+
+            if text != self.texts[i]:
+                changes.append((i + 1, self.texts[i], text))
+                self.texts[i] = text
+
+            old_outputs = edited[i] if i in edited else self.outputs[i]
+            self.outputs[i] = outputs = self.record(i)
+            for name in old_outputs.keys() | outputs.keys():
+                old = old_outputs.get(name, None)
+                new = outputs[name] if name in outputs else self.value_at(name, i)
+                if name in old_outputs and same(old, new):
+                    dirty.discard(name)
+                else:
+                    dirty.add(name)
+                    self.invalidate(name, i, queue)
+        return changes
@@ -1,7 +1,17 @@
 import re
 from parsor import ast, Parsor
-from statement_parser import StatementParser
+from statement_parser import StatementParser, BlockCollector
+from comments import CommentStripper
 from interpreter import Interpreter
+from compiler import Compiler
+from bytecode import Assembler, VM
+from optimizer import Optimizer
+from environment import Environment
+from output import OutputWriter
+from mapped_file import strip
+from interning import InternTable
+from memo import Memo
+from functions import FunctionTable
 from constants import (
     single_len_symbols,
     boolean_symbols,
@@ -19,57 +29,213 @@ from constants import (
 )
 
 
+def error_message(e: Exception) -> str:
+    # A runtime error stops the program, after what it has printed
+    if isinstance(e, ZeroDivisionError):
+        return "divide by zero"
+    if isinstance(e, RecursionError):
+        return "recursion too deep"
+    return str(e)
+
+
 class StatementEvaluator(object):
-    def __init__(self, statements):
+    engines = ['closure', 'vm']
+
+    def __init__(self, statements, engine='closure', optimize=False, exact=False,
+                 out=None, flush='size', memoize=False):
+        if engine not in self.engines:
+            raise ValueError(f'unknown engine {engine}')
+        if memoize and engine != 'closure':
+            raise ValueError('memoize needs the closure engine')
+
         self.statements = statements
-        self.variables = {}
+        self.engine = engine
+        self.exact = exact
+        # Where output goes; None is whatever sys.stdout is at the time
+        self.output = OutputWriter(out, flush)
+        # Exact mode auto-zeroes to an int so x++ counts in ints
+        self.environment = Environment(zero=0 if exact else 0.0)
         self.parsed_statements = []
-        self.parse_paused_statement = None
         self.printlist = []
-        self.in_block_comment = False
+        self.comments = CommentStripper()
+        self.blocks = BlockCollector()
+        # With memoize, statements share repeated subtrees and the values
+        # of pure ones are reused until a variable they read changes
+        self.table = InternTable() if memoize else None
+        self.memo = Memo(self.environment, self.table) if memoize else None
+        self.functions = FunctionTable(self.environment, self.output)
+        self.compiler = Compiler(self.environment, exact, self.memo, self.functions)
+        self.functions.compiler = self.compiler
+        self.parsor = self.table.parsor if memoize else Parsor
+        self.assembler = Assembler(self.environment)
+        self.vm = VM(exact, self.functions)
+        self.optimizer = Optimizer(exact) if optimize else None
+        # Set to a dataflow.DataflowScheduler to evaluate in parallel
+        self.scheduler = None
+        # Set to a cache.ParseCache to reuse the parse of an unchanged script
+        self.cache = None
 
     def execute(self):
         try:
             self.parse()
         except (SyntaxError, ValueError):
-            print("parse error")
+            self.output.line(["parse error"])
+            self.output.flush()
             return
 
+        self.environment.resolve(self.parsed_statements)
+
         try:
             self.evaluate()
-        except ZeroDivisionError:
-            print(*(self.printlist + ["divide by zero"]))
-            return
+        except (ZeroDivisionError, RuntimeError) as e:
+            self.output.line(self.printlist + [error_message(e)])
+        finally:
+            self.output.flush()
+
+    @property
+    def variables(self):
+        return self.environment.as_dict()
+
+    @property
+    def in_block_comment(self):
+        return self.comments.in_block_comment
+
+    def execute_streaming(self):
+        """
+        Parses and evaluates one statement at a time, so output appears as
+        soon as its line is read and nothing is kept once it has run.
+        Statements before a parse error have already been evaluated.
+
+        >>> StatementEvaluator(['x = 2', 'print x ^ 3', 'print x +']).execute_streaming()
+        8.0
+        parse error
+        >>> StatementEvaluator(['x = 2', 'print x ^ 3', 'print x +']).execute()
+        parse error
+        >>> StatementEvaluator(['x = 2', 'print x ^ 64 + 1, x / 4, x++ % 3']).execute_streaming()
+        1.8446744073709552e+19 0.5 2.0
+        >>> StatementEvaluator(['x = 2', 'print x ^ 64 + 1, x / 4, x++ % 3'], exact=True).execute_streaming()
+        18446744073709551617 0.5 2
+
+        A function's lines are only evaluated, as a definition, once its
+        closing } is read. Calling a function that does not exist stops
+        the program like a divide by zero:
+
+        >>> StatementEvaluator(['define sq(x) {', 'return x * x', '}', 'print sq(3), g(1)', 'print 1']).execute_streaming()
+        9.0 function g not defined
+        """
+        try:
+            for statement in self.statements:
+                if not self.execute_line(statement):
+                    return
+            if self.blocks.in_block:
+                self.output.line(["parse error"])
+        finally:
+            self.output.flush()
+
+    def execute_line(self, statement) -> bool:
+        """
+        Parses and evaluates one line of a streamed program. Returns False
+        once the program has stopped on a parse error or divide by zero.
+        What it prints may still be in the output buffer.
+        """
+        try:
+            parsed_statement = self.parse_statement(statement)
+        except (SyntaxError, ValueError):
+            self.output.line(["parse error"])
+            return False
+
+        if parsed_statement is None:
+            return True
+
+        try:
+            self.evaluate_statement(parsed_statement)
+        except (ZeroDivisionError, RuntimeError) as e:
+            self.output.line(self.printlist + [error_message(e)])
+            return False
+        return True
 
     def parse(self):
+        if self.cache:
+            key = self.cache.key(
+                self.statements, exact=self.exact, optimize=bool(self.optimizer)
+            )
+            cached = self.cache.load(key)
+            if cached is not None:
+                self.parsed_statements, eliminated = cached
+                if self.table:
+                    self.parsed_statements = [
+                        self.table.intern_statement(statement)
+                        for statement in self.parsed_statements
+                    ]
+                if self.optimizer:
+                    self.optimizer.eliminated = eliminated
+                    self.remove_dead_statements()
+                return
+
         for statement in self.statements:
-            self.parse_statement(statement)
+            parsed_statement = self.parse_statement(statement)
+            if parsed_statement is not None:
+                self.parsed_statements.append(parsed_statement)
+        if self.blocks.in_block:
+            raise SyntaxError('expected }, found EOF')
+
+        if self.cache:
+            eliminated = self.optimizer.eliminated if self.optimizer else 0
+            self.cache.store(key, (self.parsed_statements, eliminated))
+        if self.optimizer:
+            self.remove_dead_statements()
+
+    def remove_dead_statements(self):
+        """
+        With the whole program parsed, drops the statements whose results
+        nothing observes. Streaming never sees the statements after the
+        current one, so it keeps them all. Variables only the dropped
+        statements mention still get their slots, and read as zero.
+
+        >>> evaluator = StatementEvaluator(['x = 1', 'y = x + 1', 'y = 2', 'print y'], optimize=True)
+        >>> evaluator.execute()
+        2.0
+        >>> len(evaluator.parsed_statements), evaluator.optimizer.dead_statements
+        (3, 1)
+        """
+        self.environment.resolve(self.parsed_statements)
+        self.parsed_statements = self.optimizer.remove_dead_statements(self.parsed_statements)
 
     def parse_statement(self, statement):
-        statement = statement.strip()
+        """
+        Returns the parsed statement, or None when the line holds nothing to
+        evaluate yet (blank, fully commented, inside a block comment, or
+        part of a function definition that is still open).
+
+        >>> evaluator = StatementEvaluator([])
+        >>> evaluator.parse_statement('x = 1 /* spans')
+        >>> evaluator.parse_statement('lines */ + 2')
+        {'type': 'assign', 'variable': 'x', 'value': ast('+', ast('fl', 1.0), ast('fl', 2.0))}
+        """
+        statement = self.comments.strip(strip(statement))
+        if statement is None:
+            return None
+
+        statement = strip(statement)
         if not statement:
-            return
+            return None
 
         parsed_statement = StatementParser(
-            statement, self.in_block_comment
+            statement, False, self.exact, self.parsor
         ).parse()
-        if parsed_statement.get('block_comment', False):
-            self.in_block_comment = True
-            if not self.parse_paused_statement:
-                self.parse_paused_statement = ''
-            self.parse_paused_statement += parsed_statement['statement']
-            return
-        else:
-            if self.in_block_comment:
-                self.in_block_comment = False
-                self.parse_paused_statement += parsed_statement['statement']
-                # Start parsing again from the beginning
-                self.parse_statement(self.parse_paused_statement)
-                # Reset the paused statement
-                self.parse_paused_statement = None
-                return
+        if parsed_statement is None:
+            return None
+        parsed_statement = self.blocks.add(parsed_statement)
+        if parsed_statement is None:
+            return None
+
+        if self.optimizer:
+            parsed_statement = self.optimizer.optimize(parsed_statement)
+            if self.table:
+                # The optimizer builds new nodes outside the table
+                parsed_statement = self.table.intern_statement(parsed_statement)
 
-        self.parsed_statements.append(parsed_statement)
+        return parsed_statement
 
     def evaluate(self):
         """
@@ -79,27 +245,42 @@ class StatementEvaluator(object):
         if not self.parsed_statements:
             return
 
+        if self.scheduler:
+            self.scheduler.evaluate(self)
+            return
+
         for statement in self.parsed_statements:
-            if statement['type'] == 'print':
-                self.printlist = []
-                if not statement['value']:
-                    print()
-                    continue
-
-                for item in statement['value']:
-                    if isinstance(item, str):
-                        self.printlist.append(item)
-                    else:
-                        val = Interpreter(item, self.variables)
-                        result = val.execute()
-                        self.printlist.append(result)
-                print(*self.printlist, sep=' ')
-                self.printlist = []
-            elif statement['type'] == 'assign':
-                self.variables[statement['variable']] = Interpreter(
-                    statement['value'], self.variables
-                ).execute()
-            else:
-                Interpreter(
-                    statement['value'], self.variables
-                ).execute()
+            self.evaluate_statement(statement)
+
+    def evaluate_statement(self, statement):
+        if statement['type'] == 'define':
+            self.functions.define(statement)
+        elif self.engine == 'vm':
+            self.printlist = []
+            self.vm.run(
+                self.assembler.compile(statement),
+                self.environment.values,
+                self.printlist,
+                self.output
+            )
+        elif statement['type'] == 'print':
+            self.printlist = []
+            if not statement['value']:
+                self.output.line([])
+                return
+
+            for item in statement['value']:
+                if isinstance(item, str):
+                    self.printlist.append(item)
+                else:
+                    result = self.compiler.compile(item)(self.environment.values)
+                    self.printlist.append(result)
+            self.output.line(self.printlist)
+            self.printlist = []
+        elif statement['type'] == 'assign':
+            value = self.compiler.compile(statement['value'])
+            slot = self.environment.slot(statement['variable'])
+            self.environment.values[slot] = value(self.environment.values)
+            self.environment.versions[slot] += 1
+        else:
+            self.compiler.compile(statement['value'])(self.environment.values)
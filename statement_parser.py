@@ -1,5 +1,6 @@
 from parsor import ast, Parsor
-from variable_name_checker import VariableNameChecker
+from comments import CommentStripper, markers, byte_markers
+from mapped_file import strip
 from constants import (
     single_len_symbols,
     boolean_symbols,
@@ -18,181 +19,97 @@ from constants import (
 
 
 class StatementParser(object):
-    def __init__(self, statement, block_comment):
+    def __init__(self, statement, block_comment, exact=False, parsor=Parsor):
         self.statement = statement
-        self.index = 0
+        self.exact = exact
         self.block_comment = block_comment
-        self.block_comment_ended = False
+        # Called with the statement and exact, such as InternTable.parsor
+        self.parsor = parsor
 
     def parse(self):
         # Remove commented code from statement
-        self.sanitize_statement()
-
-        if self.block_comment:
-            return {'statement': self.statement, 'block_comment': True}
-
-        if self.block_comment_ended:
-            return {'statement': self.statement, 'block_comment': False}
-
-        while self.index < len(self.statement):
-            if self.index == 0 and self.statement.startswith('print'):
-                if len(self.statement) > 5 and self.statement[5] != ' ':
-                    self.index = 5
-                    continue
-                linestatement = self.statement[6:].strip()
-                linestatement = linestatement.split(',')
-                if not linestatement:
-                    return self.print_eval_dict_builder('print', [])
-                else:
-                    printlist = [Parsor(i).execute() for i in linestatement]
-                    return self.print_eval_dict_builder('print', printlist)
-
-            if self.statement[self.index] == ' ':
-                self.index += 1
-                continue
-
-            if self.statement[self.index:self.index + 2] in op_equals_symbols:
-                return self.parse_op_equate()
-
-            if self.statement[self.index:self.index + 3] in bool_equals_symbols:
-                return self.parse_op_bool_equate()
-
-            if self.statement[self.index] == '=':
-                return self.parse_equate()
-
-            self.index += 1
-
-        self.statement = self.statement.strip()
-
-        if self.statement:
-            return self.print_eval_dict_builder('eval', Parsor(self.statement).execute())
-
-    def sanitize_statement(self):
-        if self.block_comment:
-            comment_type = '*/'
-            comment_idx = self.find_comment_type(self.statement, comment_type)
-
-            if comment_idx is None:
-                self.statement = ''
-                return
-        else:
-            comment_type, comment_idx = self.find_any_comment(
-                self.statement
-            )
-
-        if not comment_type:
-            return True
-
-        if comment_type == '#':
-            self.statement = self.statement[:comment_idx]
-            return True
-
-        if comment_type == '/*':
-            new_statement = self.statement[:comment_idx]
-            end_comment_idx = self.find_comment_type(
-                self.statement[comment_idx:], '*/'
-            )
-            if end_comment_idx:
-                new_statement += self.statement[
-                    comment_idx + end_comment_idx + 2:
-                ]
-                self.statement = new_statement
-                self.block_comment = False
-                self.block_comment_ended = True
-                # Calling sanitize statement again to check for any other comments
-                self.sanitize_statement()
-            else:
-                self.statement = new_statement
-                self.block_comment = True
-                self.block_comment_ended = False
-
-        if comment_type == '*/':
-            if not self.block_comment:
-                raise SyntaxError('Unexpected */')
-
-            new_statement = self.statement[comment_idx + 2:]
-            self.statement = new_statement
-            self.block_comment = False
-            self.block_comment_ended = True
-            # Calling sanitize statement again to check for any other comments
-            self.sanitize_statement()
-
-    def find_any_comment(self, statement):
-        comment_idxs = [
-            statement.index(i)
-            for i in ('#', '/*', '*/')
-            if i in statement
-        ]
-        idx = min(comment_idxs) if len(comment_idxs) > 0 else None
-
-        if idx is None:
-            return (None, statement)
-
-        return ('#' if statement[idx] == '#' else statement[idx:idx+2], idx)
-
-    def find_comment_type(self, statement, type):
-        if not type or not statement:
+        marks = markers if isinstance(self.statement, str) else byte_markers
+        if self.block_comment or marks.search(self.statement):
+            stripper = CommentStripper(self.block_comment)
+            statement = stripper.strip(self.statement)
+            if statement is None:
+                return {'statement': stripper.pending, 'block_comment': True}
+            self.statement = strip(statement)
+
+            if self.block_comment:
+                # The caller joins this to the text before the comment
+                return {'statement': self.statement, 'block_comment': False}
+
+        self.statement = strip(self.statement)
+        if not self.statement:
             return None
 
-        if type == '#':
-            return statement.index('#') if '#' in statement else None
-
-        if type == '/*':
-            return statement.index('/*') if '/*' in statement else None
-
-        if type == '*/':
-            return statement.index('*/') if '*/' in statement else None
+        return self.parsor(self.statement, self.exact).statement()
+
+
+class BlockCollector(object):
+    """
+    Gathers the lines of a function definition, which span several lines,
+    into one define statement, the way CommentStripper gathers a statement
+    split by a block comment. Statements outside a definition pass
+    straight through; auto, return, if and } are only allowed inside one.
+
+    >>> blocks = BlockCollector()
+    >>> for line in ['define f(n) {', 'auto t', 'if (n < 2) {', 'return n', '}', 't = n', '}']:
+    ...     statement = blocks.add(Parsor(line).statement())
+    >>> statement['name'], statement['params'], statement['autos'], [s['type'] for s in statement['body']]
+    ('f', ['n'], ['t'], ['if', 'assign'])
+    >>> blocks.add(Parsor('return 1').statement())
+    Traceback (most recent call last):
+    ...
+    SyntaxError: return outside a function
+    """
+
+    def __init__(self):
+        # The define statement, then every if block, still waiting for }
+        self.open = []
+
+    @property
+    def in_block(self) -> bool:
+        return bool(self.open)
+
+    def add(self, statement):
+        """
+        Returns the statement to evaluate, or None while a definition is
+        still open.
+        """
+        typ = statement['type']
+        if not self.open:
+            if typ == 'define':
+                statement['body'] = []
+                self.open.append(statement)
+                return None
+            if typ in ['auto', 'return', 'if', 'end']:
+                name = '}' if typ == 'end' else typ
+                raise SyntaxError(f'{name} outside a function')
+            return statement
+
+        body = self.open[-1]['body']
+        if typ == 'define':
+            self.open = []
+            raise SyntaxError('define inside a function')
+        if typ == 'end':
+            block = self.open.pop()
+            return None if self.open else block
+        if typ == 'auto':
+            if len(self.open) > 1 or body:
+                self.open = []
+                raise SyntaxError('auto must come first in a function')
+            function = self.open[0]
+            names = function['params'] + function['autos'] + statement['names']
+            if len(set(names)) != len(names):
+                self.open = []
+                raise SyntaxError(f"duplicate local in {function['name']}")
+            function['autos'].extend(statement['names'])
+            return None
 
+        body.append(statement)
+        if typ == 'if' and statement['body'] is None:
+            statement['body'] = []
+            self.open.append(statement)
         return None
-
-    def parse_equate(self):
-        variable = self.statement[:self.index].strip()
-        expression = self.statement[self.index+1:].strip()
-        if not expression or not variable:
-            raise SyntaxError('parse error')
-
-        VariableNameChecker(variable).validate()
-
-        return self.assign_dict_builder(
-            variable,
-            Parsor(expression).execute()
-        )
-
-    def parse_op_equate(self):
-        if self.statement[self.index:self.index+2] not in op_equals_symbols:
-            raise SyntaxError('parse error')
-        return self.parse_op_equate_helper(2)
-
-    def parse_op_bool_equate(self):
-        if self.statement[self.index:self.index+3] not in bool_equals_symbols:
-            raise SyntaxError('parse error')
-        return self.parse_op_equate_helper(3)
-
-    def parse_op_equate_helper(self, length):
-        variable = self.statement[:self.index].strip()
-        operation = self.statement[self.index:self.index+length]
-        expression = self.statement[self.index+length:].strip()
-        if not expression or not variable:
-            raise SyntaxError('parse error')
-
-        VariableNameChecker(variable).validate()
-
-        return self.assign_dict_builder(
-            variable,
-            Parsor(
-                f'{variable}{operation.replace("=", "")}{expression}'
-            ).execute()
-        )
-
-    def assign_dict_builder(self, key, value):
-        return {
-            'type': 'assign',
-            'variable': key,
-            'value': value
-        }
-
-    def print_eval_dict_builder(self, typ, value):
-        return {
-            'type': typ,
-            'value': value
-        }
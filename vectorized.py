@@ -0,0 +1,161 @@
+from parsor import ast, Parsor
+from constants import (
+    single_len_symbols,
+    boolean_symbols,
+    double_len_symbols,
+    op_equals_symbols,
+    bool_equals_symbols,
+    assign_symbols,
+    keywords,
+    disj_symbols,
+    conj_symbols,
+    power_symbols,
+    neg_symbols,
+    incr_or_decr_symbols,
+    relational_symbols,
+)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class VectorizedInterpreter(object):
+    """
+    Evaluates one ast over a whole batch of variable bindings at once.
+    Every binding is a NumPy array (or scalar) and row i of the result is
+    what Interpreter would return for row i of the bindings.
+
+    Instead of raising, rows that would divide by zero are flagged in the
+    returned mask and their value is nan. Side effects (++, --) and
+    divide-by-zero checks only apply to rows that actually evaluate the
+    subexpression, so short-circuiting && and || behaves per row. Rows
+    where Interpreter would return a complex number, such as (-8) ^ 0.5,
+    get nan.
+
+    >>> values, divide_by_zero = VectorizedInterpreter(
+    ...     Parsor('x / y + (x % 3 > 1 && z++)').execute(),
+    ...     {'x': np.array([7.0, -7.0, 5.0, 1.0]), 'y': np.array([2.0, 1.0, 0.0, 4.0])},
+    ... ).execute()
+    >>> values.tolist(), divide_by_zero.tolist()
+    ([3.5, -7.0, nan, 0.25], [False, False, True, False])
+    """
+
+    def __init__(self, a: ast, bindings, size=None) -> None:
+        if np is None:
+            raise ImportError('VectorizedInterpreter requires numpy')
+
+        self.a = a
+        arrays = {name: np.asarray(value) for name, value in bindings.items()}
+        if size is None:
+            size = np.broadcast_shapes(
+                *[value.shape for value in arrays.values()]
+            ) if arrays else ()
+            size = size[0] if size else 1
+
+        self.size = size
+        self.variables = {
+            name: np.broadcast_to(value, (size,)).astype(
+                np.result_type(value, np.float64)
+            )
+            for name, value in arrays.items()
+        }
+        self.divide_by_zero = np.zeros(size, dtype=bool)
+
+    def execute(self):
+        with np.errstate(all='ignore'):
+            values = self.evaluate(self.a, np.ones(self.size, dtype=bool))
+            values = np.where(self.divide_by_zero, np.nan, values)
+        return values, self.divide_by_zero
+
+    def evaluate(self, a: ast, live):
+        if a.typ in ['fl', 'bool']:
+            return np.full(self.size, a.children[0])
+        elif a.typ == 'var':
+            return self.interp_var(a, live)
+        elif a.typ in ['--', '++']:
+            return self.interp_incr_or_decr(a, live)
+        elif a.typ == '-' and len(a.children) == 1:
+            return -self.evaluate(a.children[0], live)
+        elif a.typ == '!':
+            return self.bool_to_int(self.evaluate(a.children[0], live) == 0)
+        elif a.typ == '&&':
+            left = self.evaluate(a.children[0], live) != 0
+            right = self.evaluate(a.children[1], live & left) != 0
+            return self.bool_to_int(left & right)
+        elif a.typ == '||':
+            left = self.evaluate(a.children[0], live) != 0
+            right = self.evaluate(a.children[1], live & ~left) != 0
+            return self.bool_to_int(left | right)
+        elif a.typ in ['/', '%']:
+            return self.interp_divide_or_mod(a, live)
+
+        left = self.evaluate(a.children[0], live)
+        right = self.evaluate(a.children[1], live)
+
+        if a.typ == '+':
+            return left + right
+        elif a.typ == '-':
+            return left - right
+        elif a.typ == '*':
+            return left * right
+        elif a.typ == '^':
+            # 0 ^ negative raises ZeroDivisionError in Interpreter too
+            self.flag_divide_by_zero(live & (left == 0) & (right < 0))
+            return np.power(left.astype(np.float64), right)
+        elif a.typ == '==':
+            return self.bool_to_int(left == right)
+        elif a.typ == '!=':
+            return self.bool_to_int(left != right)
+        elif a.typ == '>':
+            return self.bool_to_int(left > right)
+        elif a.typ == '<':
+            return self.bool_to_int(left < right)
+        elif a.typ == '>=':
+            return self.bool_to_int(left >= right)
+        elif a.typ == '<=':
+            return self.bool_to_int(left <= right)
+
+        raise SyntaxError(f'unknown operation {a.typ}')
+
+    def interp_var(self, a, live):
+        name = a.children[0]
+        if name not in self.variables:
+            self.variables[name] = np.zeros(self.size)
+
+        value = self.variables[name]
+        if a.post_op:
+            self.interp_incr_or_decr(a.post_op, live)
+        return value
+
+    def interp_incr_or_decr(self, a, live):
+        if len(a.children) != 1 or a.children[0].typ != 'var':
+            raise SyntaxError(f'expected variable, got {a.children[0].typ}')
+
+        name = a.children[0].children[0]
+        if name not in self.variables:
+            self.variables[name] = np.zeros(self.size)
+
+        step = 1 if a.typ == '++' else -1
+        live = live & ~self.divide_by_zero
+        self.variables[name] = np.where(
+            live, self.variables[name] + step, self.variables[name]
+        )
+        return self.variables[name]
+
+    def interp_divide_or_mod(self, a, live):
+        right = self.evaluate(a.children[1], live)
+        self.flag_divide_by_zero(live & (right == 0))
+        left = self.evaluate(a.children[0], live)
+
+        divisor = np.where(right == 0, np.nan, right)
+        if a.typ == '/':
+            return left / divisor
+        return left - (divisor * np.trunc(left / divisor))
+
+    def flag_divide_by_zero(self, rows):
+        self.divide_by_zero |= rows
+
+    def bool_to_int(self, b):
+        return b.astype(np.int64)